@@ -0,0 +1,522 @@
+"""
+Precomputed aggregates for RupeeTrack pages.
+
+The chart series, budget history table and profile statistics are computed
+here in single passes over the ledger columns, summing integer paise and
+converting to rupees only in the returned values. ``AggregateCache`` keeps the
+latest results as a snapshot tagged with the data version, recomputes it on
+a background thread after mutations (debounced) and at day rollover, and
+falls back to computing synchronously when the snapshot is missing, from an
+earlier day, or older than the request's data version. Only callers that
+opt in with ``allow_stale`` (the polling endpoints) may be served the
+previous snapshot while a refresh is pending, within the configured bound.
+"""
+
+import bisect
+import concurrent.futures
+import datetime
+import math
+import threading
+import time
+
+try:
+    from . import archive
+    from . import ledger as ledger_module
+except ImportError:
+    import archive
+    import ledger as ledger_module
+
+SECONDS_PER_DAY = 86400
+
+DAYS_PER_MONTH = 30
+
+# Goal saving pace is measured over contributions made in this many days.
+GOAL_VELOCITY_WINDOW_DAYS = 90
+
+from_paise = ledger_module.from_paise
+to_paise = ledger_module.to_paise
+
+
+def _epoch(dt):
+    return ledger_module.datetime_to_epoch(dt)
+
+
+def _type_code(transactions, name):
+    return transactions.type_codes.codes.get(name, -1)
+
+
+def monthly_summary(transactions, now=None):
+    """Income, expense and net flow for the months covering the last ~12 months."""
+    now = now or datetime.datetime.now()
+    month_keys = sorted({(now - datetime.timedelta(days=30 * i)).strftime("%Y-%m") for i in range(12)})
+    income = [0] * len(month_keys)
+    expense = [0] * len(month_keys)
+    starts = []
+    ends = []
+    for key in month_keys:
+        start = datetime.datetime.strptime(key, "%Y-%m")
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        starts.append(_epoch(start))
+        ends.append(_epoch(end))
+
+    income_code = _type_code(transactions, 'income')
+    expense_code = _type_code(transactions, 'expense')
+    first = starts[0]
+    for ts, amount, tx_type in zip(transactions.timestamps, transactions.amounts, transactions.types):
+        if ts < first:
+            continue
+        index = bisect.bisect_right(starts, ts) - 1
+        if ts >= ends[index]:
+            continue
+        if tx_type == income_code:
+            income[index] += amount
+        elif tx_type == expense_code:
+            expense[index] += amount
+
+    return {key: {"income": from_paise(income[i]),
+                  "expense": from_paise(expense[i]),
+                  "net_flow": from_paise(income[i] - expense[i])}
+            for i, key in enumerate(month_keys)}
+
+
+def daily_summary(transactions, now=None):
+    """Income and expense per day for the last 30 days."""
+    now = now or datetime.datetime.now()
+    today = _epoch(now.replace(hour=0, minute=0, second=0)) // SECONDS_PER_DAY
+    first_day = today - 29
+    income = [0] * 30
+    expense = [0] * 30
+
+    income_code = _type_code(transactions, 'income')
+    expense_code = _type_code(transactions, 'expense')
+    for ts, amount, tx_type in zip(transactions.timestamps, transactions.amounts, transactions.types):
+        index = ts // SECONDS_PER_DAY - first_day
+        if 0 <= index < 30:
+            if tx_type == income_code:
+                income[index] += amount
+            elif tx_type == expense_code:
+                expense[index] += amount
+
+    start_date = now.date() - datetime.timedelta(days=29)
+    return {(start_date + datetime.timedelta(days=i)).strftime("%Y-%m-%d"):
+            {"income": from_paise(income[i]), "expense": from_paise(expense[i])}
+            for i in range(30)}
+
+
+def monthly_expense_totals(transactions):
+    """Total expense paise keyed by (year, month) across the whole ledger."""
+    expense_code = _type_code(transactions, 'expense')
+    day_months = {}
+    totals = {}
+    for ts, amount, tx_type in zip(transactions.timestamps, transactions.amounts, transactions.types):
+        if tx_type != expense_code or ts == ledger_module.NO_TIMESTAMP:
+            continue
+        day = ts // SECONDS_PER_DAY
+        month = day_months.get(day)
+        if month is None:
+            dt = ledger_module.epoch_to_datetime(day * SECONDS_PER_DAY)
+            month = day_months[day] = (dt.year, dt.month)
+        totals[month] = totals.get(month, 0) + amount
+    return totals
+
+
+def budget_schedule(budget):
+    """(initial monthly budget, [(change date, new amount), ...] oldest first) from ``budget.history``."""
+    if not isinstance(budget, dict):
+        budget = {'monthly': budget if isinstance(budget, int) else 0}
+    budget_changes = sorted(budget.get('history', []), key=lambda x: datetime.datetime.fromisoformat(x['date']))
+    initial_budget = budget.get('monthly', 0)
+    if budget_changes:
+        initial_budget = budget_changes[0]['previous_amount']
+    return initial_budget, [(datetime.datetime.fromisoformat(change['date']), change['new_amount'])
+                            for change in budget_changes]
+
+
+def budget_for_month(schedule, month_start):
+    """The monthly budget in effect for the month starting at ``month_start``."""
+    effective_budget, changes = schedule
+    for change_date, new_amount in changes:
+        if change_date <= month_start:
+            effective_budget = new_amount
+        else:
+            break
+    return effective_budget
+
+
+def budget_history(user, now=None):
+    """Per-month budget, expenses and usage for every closed month, newest first."""
+    now = now or datetime.datetime.now()
+    transactions = user.get('transactions', [])
+    schedule = budget_schedule(user.get('budget'))
+    budget_changes = schedule[1]
+
+    earliest_date = None
+    stamps = [ts for ts in transactions.timestamps if ts != ledger_module.NO_TIMESTAMP]
+    archived_earliest = archive.earliest_timestamp(user)
+    if archived_earliest is not None:
+        stamps.append(archived_earliest)
+    if stamps:
+        earliest_date = ledger_module.epoch_to_datetime(min(stamps))
+    if budget_changes:
+        earliest_change_date = budget_changes[0][0]
+        if earliest_date is None or earliest_change_date < earliest_date:
+            earliest_date = earliest_change_date
+
+    if earliest_date is None:
+        return []
+
+    expense_totals = monthly_expense_totals(transactions)
+    for month, amount in archive.monthly_expense_totals(user).items():
+        expense_totals[month] = expense_totals.get(month, 0) + amount
+
+    processed_budget_history = []
+    month_start_dt = earliest_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month_start_dt < end_month:
+        effective_budget_for_month = budget_for_month(schedule, month_start_dt)
+        budget_paise = to_paise(effective_budget_for_month)
+        expenses_paise = expense_totals.get((month_start_dt.year, month_start_dt.month), 0)
+        usage_percentage = (expenses_paise / budget_paise * 100) if budget_paise > 0 else 0
+
+        processed_budget_history.append({
+            'month': month_start_dt.strftime("%B %Y"),
+            'budget': effective_budget_for_month,
+            'expenses': from_paise(expenses_paise),
+            'remaining': from_paise(budget_paise - expenses_paise),
+            'usage_percentage': usage_percentage
+        })
+        month_start_dt = (month_start_dt + datetime.timedelta(days=32)).replace(day=1)
+
+    processed_budget_history.reverse()
+    return processed_budget_history
+
+
+def profile_stats(transactions, archived=None):
+    """Lifetime totals, counts, largest transactions and top expense category.
+
+    ``archived`` is the ``archive.summaries`` of years moved out of the ledger.
+    """
+    income_code = _type_code(transactions, 'income')
+    expense_code = _type_code(transactions, 'expense')
+    category_names = transactions.category_codes.names
+
+    total_income = 0
+    total_expenses = 0
+    income_count = 0
+    expense_count = 0
+    largest_income_pos = largest_expense_pos = -1
+    largest_income = largest_expense = None
+    category_code_totals = {}
+
+    for pos, (amount, tx_type, category) in enumerate(zip(transactions.amounts, transactions.types, transactions.categories)):
+        if tx_type == income_code:
+            total_income += amount
+            income_count += 1
+            if largest_income is None or amount > largest_income:
+                largest_income, largest_income_pos = amount, pos
+        elif tx_type == expense_code:
+            total_expenses += amount
+            expense_count += 1
+            if largest_expense is None or amount > largest_expense:
+                largest_expense, largest_expense_pos = amount, pos
+            category_code_totals[category] = category_code_totals.get(category, 0) + amount
+
+    category_totals = {}
+    for code, amount in category_code_totals.items():
+        name = category_names[code]
+        name = 'Other' if name is None else name
+        category_totals[name] = category_totals.get(name, 0) + amount
+
+    largest_income_tx = transactions[largest_income_pos].to_dict() if largest_income_pos >= 0 else None
+    largest_expense_tx = transactions[largest_expense_pos].to_dict() if largest_expense_pos >= 0 else None
+    archived_count = 0
+    for summary in (archived or {}).values():
+        archived_count += summary.get('count', 0)
+        total_income += summary.get('income', 0)
+        total_expenses += summary.get('expense', 0)
+        income_count += summary.get('income_count', 0)
+        expense_count += summary.get('expense_count', 0)
+        for name, amount in summary.get('categories', {}).items():
+            category_totals[name] = category_totals.get(name, 0) + amount
+        candidate = summary.get('largest_income')
+        if candidate and (largest_income_tx is None or to_paise(candidate['amount']) > largest_income):
+            largest_income, largest_income_tx = to_paise(candidate['amount']), candidate
+        candidate = summary.get('largest_expense')
+        if candidate and (largest_expense_tx is None or to_paise(candidate['amount']) > largest_expense):
+            largest_expense, largest_expense_tx = to_paise(candidate['amount']), candidate
+
+    top_category = ('None', 0)
+    if category_totals:
+        name, amount = max(category_totals.items(), key=lambda x: x[1])
+        top_category = (name, from_paise(amount))
+
+    return {
+        'total_income': from_paise(total_income),
+        'total_expenses': from_paise(total_expenses),
+        'balance': from_paise(total_income - total_expenses),
+        'income_count': income_count,
+        'expense_count': expense_count,
+        'total_transactions': len(transactions) + archived_count,
+        'largest_income': largest_income_tx,
+        'largest_expense': largest_expense_tx,
+        'top_category': top_category,
+    }
+
+
+def goal_projections(user, monthly, now=None):
+    """Saving pace, projected completion and required monthly saving per goal id.
+
+    ``monthly`` is a ``monthly_summary`` result; the average net flow of its
+    closed months is what the user can realistically put aside each month.
+    """
+    now = now or datetime.datetime.now()
+    today = now.date()
+    current_key = now.strftime("%Y-%m")
+    closed_flows = [to_paise(summary['net_flow']) for key, summary in monthly.items() if key != current_key]
+    average_net_flow = sum(closed_flows) // len(closed_flows) if closed_flows else 0
+
+    window_start = (now - datetime.timedelta(days=GOAL_VELOCITY_WINDOW_DAYS)).strftime(ledger_module.TIMESTAMP_FORMAT)
+    histories = user.get('goal_transactions', {})
+    projections = {}
+    for goal in user.get('goals', []):
+        history = histories.get(goal['id'], [])
+        start = bisect.bisect_left(history, window_start, key=lambda entry: entry.get('date', ''))
+        recent = sum(to_paise(entry.get('amount', 0)) for entry in history[start:])
+        velocity = recent * DAYS_PER_MONTH // GOAL_VELOCITY_WINDOW_DAYS
+        remaining = max(to_paise(goal.get('target_amount', 0)) - to_paise(goal.get('saved_amount', 0)), 0)
+
+        deadline = None
+        if goal.get('deadline'):
+            try:
+                deadline = datetime.datetime.strptime(goal['deadline'], '%Y-%m-%d').date()
+            except ValueError:
+                pass
+
+        projected_date = None
+        if remaining and velocity > 0:
+            try:
+                projected_date = today + datetime.timedelta(days=math.ceil(remaining * DAYS_PER_MONTH / velocity))
+            except OverflowError:
+                pass
+
+        required_monthly = None
+        if remaining and deadline is not None:
+            months_left = max((deadline - today).days, 1) / DAYS_PER_MONTH
+            required_monthly = math.ceil(remaining / months_left)
+
+        if not remaining:
+            status = 'completed'
+        elif projected_date is not None and (deadline is None or projected_date <= deadline):
+            status = 'on_track'
+        elif required_monthly is not None and required_monthly <= average_net_flow:
+            status = 'achievable'
+        elif deadline is None:
+            status = 'stalled'
+        else:
+            status = 'at_risk'
+
+        projections[goal['id']] = {
+            'monthly_velocity': from_paise(velocity),
+            'projected_date': projected_date.isoformat() if projected_date else None,
+            'required_monthly': from_paise(required_monthly) if required_monthly is not None else None,
+            'average_net_flow': from_paise(average_net_flow),
+            'status': status,
+        }
+    return projections
+
+
+def compute_snapshot(user, version, now=None):
+    now = now or datetime.datetime.now()
+    transactions = user.get('transactions', [])
+    monthly = monthly_summary(transactions, now)
+    return {
+        'version': version,
+        'day': now.date(),
+        'computed_at': time.time(),
+        'monthly_summary': monthly,
+        'daily_summary': daily_summary(transactions, now),
+        'budget_history': budget_history(user, now),
+        'profile_stats': profile_stats(transactions, archive.summaries(user)),
+        'goal_projections': goal_projections(user, monthly, now),
+    }
+
+
+class AggregateCache:
+    """Latest aggregate snapshot plus the background worker that refreshes it.
+
+    ``loader`` returns the current user document and ``version_fn`` a value
+    that changes whenever the stored data does. ``on_refresh``, if set, is
+    called with each snapshot the background worker computes.
+    """
+
+    def __init__(self, loader, version_fn, debounce=0.25, max_staleness=2.0, on_refresh=None):
+        self.loader = loader
+        self.version_fn = version_fn
+        self.on_refresh = on_refresh
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._dirty_since = None
+        self._timer = None
+        self._rollover_timer = None
+        self._executor = None
+
+    def _submit(self):
+        with self._lock:
+            self._timer = None
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='rupeetrack-aggregates')
+            executor = self._executor
+        executor.submit(self._refresh)
+
+    def _refresh(self):
+        try:
+            version = self.version_fn()
+            snapshot = compute_snapshot(self.loader(), version)
+        except Exception as e:
+            print(f"Aggregate refresh error: {e}")
+            return
+        self._store(snapshot)
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh(snapshot)
+            except Exception as e:
+                print(f"Aggregate refresh callback error: {e}")
+
+    def _store(self, snapshot):
+        with self._lock:
+            current = self._snapshot
+            if current is None or snapshot['computed_at'] >= current['computed_at']:
+                self._snapshot = snapshot
+            if self._dirty_since is not None and snapshot['version'] == self.version_fn():
+                self._dirty_since = None
+
+    def _schedule_rollover(self):
+        now = datetime.datetime.now()
+        next_midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        delay = (next_midnight - now).total_seconds() + 1
+        timer = threading.Timer(delay, self._on_rollover)
+        timer.daemon = True
+        with self._lock:
+            self._rollover_timer = timer
+        timer.start()
+
+    def _on_rollover(self):
+        self._submit()
+        self._schedule_rollover()
+
+    def notify_mutation(self):
+        """Mark the snapshot dirty and schedule a debounced recompute."""
+        with self._lock:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._submit)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def get(self, user, version, allow_stale=False):
+        """Snapshot for the request's ``user`` document loaded at ``version``.
+
+        Pages must reflect the user's own last write, so by default a
+        snapshot for another version is never returned. With ``allow_stale``
+        the previous one is served for up to ``max_staleness`` seconds after
+        a mutation, while the background refresh catches up.
+        """
+        if self._rollover_timer is None:
+            self._schedule_rollover()
+        today = datetime.date.today()
+        with self._lock:
+            snapshot = self._snapshot
+            dirty_since = self._dirty_since
+        if snapshot is not None and snapshot['day'] == today:
+            if snapshot['version'] == version:
+                return snapshot
+            if (allow_stale and dirty_since is not None
+                    and time.monotonic() - dirty_since <= self.max_staleness):
+                return snapshot
+        snapshot = compute_snapshot(user, version)
+        self._store(snapshot)
+        return snapshot
+
+    def shutdown(self):
+        with self._lock:
+            timers = [self._timer, self._rollover_timer]
+            executor, self._executor = self._executor, None
+        for timer in timers:
+            if timer is not None:
+                timer.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class BalanceCache:
+    """Running income, expense and goal-allocation totals in paise.
+
+    Like the search index it is tagged with the data version it reflects;
+    routes apply their own changes as they save and anything else triggers a
+    rebuild on the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.income = 0
+        self.expenses = 0
+        self.allocated = 0
+
+    def _rebuild(self, user, version):
+        self.income, self.expenses = user.get('transactions', ledger_module.TransactionLedger()).totals()
+        archived_income, archived_expenses = archive.totals(user)
+        self.income += archived_income
+        self.expenses += archived_expenses
+        self.allocated = sum(to_paise(goal.get('saved_amount', 0)) for goal in user.get('goals', []))
+        self.version = version
+
+    def available(self, user, version):
+        """Income minus expenses minus goal allocations, in paise."""
+        with self._lock:
+            if self.version is None or self.version != version:
+                self._rebuild(user, version)
+            return self.income - self.expenses - self.allocated
+
+    def totals(self, user, version):
+        """(income, expenses, allocated) in paise."""
+        with self._lock:
+            if self.version is None or self.version != version:
+                self._rebuild(user, version)
+            return self.income, self.expenses, self.allocated
+
+    def apply_transaction(self, base_version, tx, sign=1):
+        """Count (``sign=1``) or uncount (``sign=-1``) one transaction."""
+        try:
+            amount = to_paise(tx.get('amount', 0)) * sign
+        except (TypeError, ValueError):
+            amount = 0
+        with self._lock:
+            if self.version is None or self.version != base_version:
+                return
+            if tx.get('type') == 'income':
+                self.income += amount
+            elif tx.get('type') == 'expense':
+                self.expenses += amount
+
+    def apply_allocation(self, base_version, paise):
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.allocated += paise
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+
+    def advance(self, base_version, new_version):
+        """Move to ``new_version`` after a save; invalidate if we were not at ``base_version``."""
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.version = new_version
+            else:
+                self.version = None
@@ -0,0 +1,236 @@
+"""
+Cold storage for closed years of RupeeTrack transactions.
+
+Pages only chart the last twelve months, and budget history and profile
+statistics need older years only as totals. ``archive_closed_years`` moves
+the transactions of every year that ended more than a year ago into one
+gzip-compressed JSON segment per year, next to ``user_data.json`` under
+``user_data.archive/<year>.json.gz``, and leaves a precomputed summary of
+each year under ``archive`` in the hot document: income and expense totals
+and counts, per-month totals, expense per category and the largest income
+and expense. Amounts in summaries are integer paise.
+
+Segments are only opened when a date filter reaches into an archived year,
+and at most ``MAX_CACHED_SEGMENTS`` of them are kept in memory. Archiving a
+year that already has a segment merges into it, and a transaction id present
+in both keeps its hot version, so an interrupted run can simply be repeated.
+"""
+
+import collections
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+
+try:
+    from . import ledger as ledger_module
+except ImportError:
+    import ledger as ledger_module
+
+# The current and previous year always stay in the hot document.
+HOT_YEARS = 2
+
+MAX_CACHED_SEGMENTS = 4
+
+SECONDS_PER_DAY = 86400
+
+_segments = collections.OrderedDict()
+_segments_lock = threading.Lock()
+
+
+def archive_dir(data_path):
+    return os.path.splitext(data_path)[0] + '.archive'
+
+
+def segment_path(data_path, year):
+    return os.path.join(archive_dir(data_path), f'{year}.json.gz')
+
+
+def _year_of(seconds):
+    return ledger_module.epoch_to_datetime(seconds).year
+
+
+def _category_name(category):
+    return 'Other' if category is None else category
+
+
+def summarize(transactions):
+    """Yearly summary of a segment's ledger."""
+    income_code = transactions.type_codes.codes.get('income', -1)
+    expense_code = transactions.type_codes.codes.get('expense', -1)
+    category_names = transactions.category_codes.names
+    summary = {
+        'count': len(transactions),
+        'income': 0,
+        'expense': 0,
+        'income_count': 0,
+        'expense_count': 0,
+        'earliest': None,
+        'months': {},
+        'categories': {},
+        'largest_income': None,
+        'largest_expense': None,
+    }
+    earliest = None
+    largest = {}
+    month_keys = {}
+    for pos, (ts, amount, tx_type, category) in enumerate(zip(transactions.timestamps, transactions.amounts,
+                                                              transactions.types, transactions.categories)):
+        if tx_type == income_code:
+            kind = 'income'
+        elif tx_type == expense_code:
+            kind = 'expense'
+            name = _category_name(category_names[category])
+            summary['categories'][name] = summary['categories'].get(name, 0) + amount
+        else:
+            continue
+        summary[kind] += amount
+        summary[kind + '_count'] += 1
+        if kind not in largest or amount > largest[kind][0]:
+            largest[kind] = (amount, pos)
+        if ts == ledger_module.NO_TIMESTAMP:
+            continue
+        if earliest is None or ts < earliest:
+            earliest = ts
+        day = ts // SECONDS_PER_DAY
+        key = month_keys.get(day)
+        if key is None:
+            key = month_keys[day] = ledger_module.epoch_to_datetime(ts).strftime('%Y-%m')
+        month = summary['months'].setdefault(key, {'income': 0, 'expense': 0})
+        month[kind] += amount
+
+    if earliest is not None:
+        summary['earliest'] = ledger_module.epoch_to_datetime(earliest).strftime(ledger_module.TIMESTAMP_FORMAT)
+    for kind, (_, pos) in largest.items():
+        summary['largest_' + kind] = transactions[pos].to_dict()
+    return summary
+
+
+def summaries(user):
+    """``{year: summary}`` for every archived year, oldest first."""
+    archived = user.get('archive')
+    if not isinstance(archived, dict):
+        return {}
+    return {int(year): archived[year] for year in sorted(archived, key=int)}
+
+
+def totals(user):
+    """Archived (income, expense) in paise."""
+    income = expense = 0
+    for summary in summaries(user).values():
+        income += summary.get('income', 0)
+        expense += summary.get('expense', 0)
+    return income, expense
+
+
+def monthly_expense_totals(user):
+    """Archived expense paise keyed by (year, month)."""
+    result = {}
+    for summary in summaries(user).values():
+        for key, month in summary.get('months', {}).items():
+            year, month_number = key.split('-')
+            result[(int(year), int(month_number))] = month.get('expense', 0)
+    return result
+
+
+def earliest_timestamp(user):
+    """Epoch seconds of the oldest archived transaction, or None."""
+    for summary in summaries(user).values():
+        seconds = ledger_module.parse_timestamp(summary.get('earliest'))
+        if seconds != ledger_module.NO_TIMESTAMP:
+            return seconds
+    return None
+
+
+def _read_segment(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return ledger_module.TransactionLedger(json.load(f).get('transactions', []))
+
+
+def load_segment(data_path, year):
+    """The archived ledger for ``year`` (empty if there is none), cached while unchanged."""
+    path = segment_path(data_path, year)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ledger_module.TransactionLedger()
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _segments_lock:
+        cached = _segments.get(path)
+        if cached is not None and cached[0] == key:
+            _segments.move_to_end(path)
+            return cached[1]
+    segment = _read_segment(path)
+    with _segments_lock:
+        _segments[path] = (key, segment)
+        _segments.move_to_end(path)
+        while len(_segments) > MAX_CACHED_SEGMENTS:
+            _segments.popitem(last=False)
+    return segment
+
+
+def years_in_range(user, start=None, end=None):
+    """Archived years overlapping the inclusive ``start``/``end`` dates (either may be None)."""
+    return [year for year in summaries(user)
+            if (start is None or year >= start.year) and (end is None or year <= end.year)]
+
+
+def load_range(data_path, user, start=None, end=None):
+    """Ledgers of the archived years a date filter reaches into; none without a filter."""
+    if start is None and end is None:
+        return []
+    return [load_segment(data_path, year) for year in years_in_range(user, start, end)]
+
+
+def _write_segment(path, year, transactions):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+            json.dump({'year': year, 'transactions': list(transactions.to_dicts())}, f)
+        os.chmod(tmp_path, ledger_module.replacement_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def archive_closed_years(user, data_path, now=None):
+    """Move closed years out of ``user``'s ledger into segments; returns the years archived.
+
+    ``user`` is changed in place and has to be saved by the caller. Segments
+    are written first, so a failure before that save leaves the transactions
+    in both places, which the next run merges.
+    """
+    now = now or datetime.datetime.now()
+    transactions = user.get('transactions', ledger_module.TransactionLedger())
+    cutoff = ledger_module.datetime_to_epoch(datetime.datetime(now.year - HOT_YEARS + 1, 1, 1))
+    by_year = {}
+    keep = []
+    for pos, ts in enumerate(transactions.timestamps):
+        closed = ts != ledger_module.NO_TIMESTAMP and ts < cutoff
+        keep.append(not closed)
+        if closed:
+            by_year.setdefault(_year_of(ts), []).append(pos)
+    if not by_year:
+        return []
+
+    archived = user.get('archive')
+    if not isinstance(archived, dict):
+        archived = user['archive'] = {}
+    for year in sorted(by_year):
+        segment = ledger_module.TransactionLedger(transactions[pos] for pos in by_year[year])
+        moved = {segment.ids[pos] for pos in range(len(segment))}
+        previous = load_segment(data_path, year)
+        segment.extend(previous[pos] for pos in range(len(previous)) if previous.ids[pos] not in moved)
+        _write_segment(segment_path(data_path, year), year, segment)
+        archived[str(year)] = summarize(segment)
+
+    transactions.retain(keep)
+    return sorted(by_year)
@@ -0,0 +1,307 @@
+"""
+ASGI entry point: async read-only JSON API in front of the Flask app.
+
+Dashboard widgets poll summary data far more often than anyone writes it. On
+the WSGI app every poll holds a worker thread while the user document is
+loaded and the response built. Here ``/api/...`` read-only endpoints are
+served by coroutines on the event loop. The blocking parts (stat, document
+load, aggregate computation) run in a bounded thread pool of
+``RUPEETRACK_ASYNC_THREADS`` threads, and the loaded document is shared by
+every request at the same data version, so a burst of thousands of polls
+costs one load. ``/events`` is streamed from the event loop as well, so an
+open tab holds no thread. All other paths are passed to the Flask app on
+its own thread pool, so one ASGI worker serves the whole site::
+
+    uvicorn Project.asgi:application
+
+Endpoints return the same JSON as their Flask counterparts and read through
+the same storage layer and derived indexes in ``main``.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime
+import io
+import json
+import os
+import queue
+import re
+import sys
+import urllib.parse
+
+try:
+    from . import main
+except ImportError:
+    import main
+
+READ_THREADS = int(os.environ.get('RUPEETRACK_ASYNC_THREADS', 8))
+
+WSGI_THREADS = int(os.environ.get('RUPEETRACK_WSGI_THREADS', 8))
+
+
+class DocumentCache:
+    """The user document at the latest data version, loaded once per version.
+
+    Responses derived from it are memoised per version and day as well, so
+    repeated polls of an unchanged document only cost a stat.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.version = None
+        self.document = None
+        self._derived = {}
+        self._lock = None
+
+    async def get(self):
+        """(version, document); the document is shared and must not be mutated."""
+        version = await self.run(main.current_data_version)
+        if self.document is not None and self.version == version:
+            return self.version, self.document
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            version = await self.run(main.current_data_version)
+            if self.document is None or self.version != version:
+                self.document = await self.run(main.load_user_data_from_json)
+                self.version = version
+                self._derived = {}
+            return self.version, self.document
+
+    async def derived(self, name, fn):
+        """Result of ``fn(user, version)``, computed once per version and day.
+
+        ``fn`` returns ``(result, version it reflects)``; a result built from a
+        still-refreshing aggregate snapshot is served but not kept.
+        """
+        version, user = await self.get()
+        key = (version, datetime.date.today())
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        result, result_version = await self.run(fn, user, version)
+        if self.version == version and result_version == version:
+            self._derived[name] = (key, result)
+        return result
+
+
+def _summary(user, version):
+    snapshot = main.aggregate_cache.get(user, version, allow_stale=True)
+    income, expenses = main.total_income_and_expenses(user)
+    return {
+        'total_income': main.ledger.from_paise(income),
+        'total_expenses': main.ledger.from_paise(expenses),
+        'current_balance': main.ledger.from_paise(income - expenses),
+        'available_balance': main.ledger.from_paise(main.balance_cache.available(user, version)),
+        'monthly_summary': snapshot['monthly_summary'],
+        'daily_summary': snapshot['daily_summary'],
+    }, snapshot['version']
+
+
+def _budget_forecast(user, version):
+    return main.budget_forecast.report(user, version), version
+
+
+def _goal_projections(user, version):
+    snapshot = main.aggregate_cache.get(user, version, allow_stale=True)
+    return snapshot['goal_projections'], snapshot['version']
+
+
+class AsyncApi:
+    """ASGI app serving ``ROUTES`` itself and everything else through ``wsgi_app``."""
+
+    ROUTES = (
+        (re.compile(r'/api/summary'), 'summary'),
+        (re.compile(r'/api/budget_forecast'), 'budget_forecast'),
+        (re.compile(r'/api/goal_projections'), 'goal_projections'),
+        (re.compile(r'/api/goal_transactions/(?P<goal_id>[^/]+)'), 'goal_transactions'),
+    )
+
+    def __init__(self, wsgi_app, read_threads=READ_THREADS, wsgi_threads=WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=read_threads, thread_name_prefix='rupeetrack-api')
+        self.wsgi_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=wsgi_threads, thread_name_prefix='rupeetrack-wsgi')
+        self.documents = DocumentCache(self.run)
+
+    async def run(self, fn, *args):
+        """Run blocking ``fn`` in the read pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.read_executor, fn, *args)
+
+    async def summary(self, query):
+        return 200, await self.documents.derived('summary', _summary)
+
+    async def budget_forecast(self, query):
+        return 200, await self.documents.derived('budget_forecast', _budget_forecast)
+
+    async def goal_projections(self, query):
+        return 200, await self.documents.derived('goal_projections', _goal_projections)
+
+    async def goal_transactions(self, query, goal_id):
+        version, user = await self.documents.get()
+        limit = main.parse_page_limit(query.get('limit'), main.GOAL_TRANSACTIONS_PAGE_SIZE, 100)
+        page = main.goal_transactions_page(user, goal_id, query.get('cursor'), limit)
+        if page is None:
+            return 404, {'error': 'Goal not found.'}
+        return 200, page
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if scope['path'] == '/events' and scope['method'] == 'GET':
+            await self._events(scope, receive, send)
+            return
+        for pattern, name in self.ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match is not None:
+                await self._api(scope, send, getattr(self, name), match.groupdict())
+                return
+        await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                main.recurring_scheduler.start()
+                if main.app.config.get('BACKUP_INTERVAL'):
+                    main.backup_scheduler.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                main.recurring_scheduler.shutdown()
+                main.backup_scheduler.shutdown()
+                self.read_executor.shutdown(wait=False)
+                self.wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _api(self, scope, send, handler, params):
+        if scope['method'] not in ('GET', 'HEAD'):
+            status, payload = 405, {'error': 'Method not allowed.'}
+        else:
+            query = dict(urllib.parse.parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            try:
+                status, payload = await handler(query, **params)
+            except Exception as e:
+                print(f"Async API error on {scope['path']}: {e}")
+                status, payload = 500, {'error': 'Internal server error.'}
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode('latin-1'))]})
+        await send({'type': 'http.response.body', 'body': body if scope['method'] != 'HEAD' else b''})
+
+    async def _events(self, scope, receive, send, heartbeat=main.events.HEARTBEAT_INTERVAL):
+        """Stream ``main.event_broker`` like Flask's ``/events``, without holding a thread.
+
+        The WSGI bridge buffers a whole response, so a stream served through
+        it would never send its headers.
+        """
+        try:
+            last_event_id = int(dict(scope.get('headers', [])).get(b'last-event-id', b''))
+        except ValueError:
+            last_event_id = None
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscription = main.event_broker.subscribe(
+            last_event_id, notify=lambda: loop.call_soon_threadsafe(wakeup.set))
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                    (b'cache-control', b'no-cache'),
+                                    (b'x-accel-buffering', b'no')]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while not disconnected.done():
+                # Clear before reading, so a publish after the read still wakes us.
+                wakeup.clear()
+                try:
+                    chunk = main.events.format_event(*subscription.queue.get_nowait())
+                except queue.Empty:
+                    if subscription.closed:
+                        break
+                    waiter = asyncio.ensure_future(wakeup.wait())
+                    done, _ = await asyncio.wait((waiter, disconnected), timeout=heartbeat,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                    if done:
+                        continue
+                    # Comment line; keeps proxies from closing an idle stream.
+                    chunk = ": keep-alive\n\n"
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            main.event_broker.unsubscribe(subscription)
+            disconnected.cancel()
+
+    async def _wsgi(self, scope, receive, send):
+        body = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            body.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        environ = _wsgi_environ(scope, b''.join(body))
+        status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+            self.wsgi_executor, self._call_wsgi, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    def _call_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = 'HTTP_' + name
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            environ[key] = environ[key] + separator + value if key in environ else value
+    return environ
+
+
+application = AsyncApi(main.app)
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Incremental, deduplicated backups of the RupeeTrack data store.
+
+A snapshot is a small JSON manifest under ``user_data.backups/snapshots``
+that names content-addressed chunks under ``user_data.backups/chunks``.
+Each chunk is stored zlib-compressed under the SHA-256 of its contents, so
+a chunk is written once and shared by every snapshot that contains it.
+
+The transaction ledger is cut into chunks at content-defined boundaries:
+a chunk ends after any transaction whose id hashes to a multiple of
+``CHUNK_BOUNDARY``. The boundaries depend only on the ids around them, so
+adding, editing or deleting a transaction changes only the chunk holding
+it, and every other chunk is deduplicated. The rest of the document, the
+journal and each archive segment are chunked the same way or stored whole.
+A snapshot of an unchanged store is skipped, so snapshots are cheap enough
+to take every few minutes.
+
+Each snapshot also stores the change log lines (see ``changes``) written
+since the previous snapshot. ``restore`` rebuilds the store as it was at
+any moment: it starts from the last snapshot taken before that moment and
+replays the logged changes up to it, the stored ones and then the live log.
+``verify`` re-hashes every chunk that a snapshot references and checks
+that the stored change log covers every sequence number.
+
+    python backups.py snapshot
+    python backups.py list
+    python backups.py verify
+    python backups.py restore --at "2026-10-19 09:30" --output restored/user_data.json
+"""
+
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    from . import archive, changes, journal, ledger
+except ImportError:
+    import archive
+    import changes
+    import journal
+    import ledger
+
+# A chunk ends after a transaction whose id hashes to a multiple of this,
+# i.e. chunks hold about this many transactions.
+CHUNK_BOUNDARY = 256
+
+MAX_CHUNK_ITEMS = 4 * CHUNK_BOUNDARY
+
+LOG_CHUNK_ITEMS = 1000
+
+DEFAULT_INTERVAL = 300
+
+
+class BackupError(Exception):
+    """A snapshot cannot be read, or a restore cannot reach the requested time."""
+
+
+def backup_dir(data_path):
+    return os.path.splitext(data_path)[0] + '.backups'
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _is_boundary(record_id):
+    digest = hashlib.blake2b(str(record_id).encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % CHUNK_BOUNDARY == 0
+
+
+def split_records(records):
+    """Lists of records, cut after each boundary id (or every ``MAX_CHUNK_ITEMS``)."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if _is_boundary(record.get('id')) or len(chunk) >= MAX_CHUNK_ITEMS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_atomic(path, data, mode=None):
+    # Without ``mode`` the file stays 0600, as mkstemp created it: right for
+    # the backup store, not for restored data files.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BackupStore:
+    """Chunks and snapshot manifests under one backup directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.chunk_dir = os.path.join(root, 'chunks')
+        self.snapshot_dir = os.path.join(root, 'snapshots')
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def has_chunk(self, digest):
+        return os.path.exists(self._chunk_path(digest))
+
+    def put_chunk(self, data):
+        """Store ``data`` unless an identical chunk exists; returns (digest, written)."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has_chunk(digest):
+            return digest, False
+        _write_atomic(self._chunk_path(digest), zlib.compress(data, 6))
+        return digest, True
+
+    def get_chunk(self, digest):
+        """The chunk's bytes; raises BackupError if it is missing or corrupt."""
+        try:
+            with open(self._chunk_path(digest), 'rb') as f:
+                decompressor = zlib.decompressobj()
+                data = decompressor.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise BackupError(f"Chunk {digest} is unreadable: {e}")
+        if not decompressor.eof or decompressor.unused_data or hashlib.sha256(data).hexdigest() != digest:
+            raise BackupError(f"Chunk {digest} does not match its hash.")
+        return data
+
+    def get_records(self, digest):
+        return json.loads(self.get_chunk(digest))
+
+    def chunk_digests(self):
+        if not os.path.isdir(self.chunk_dir):
+            return set()
+        return {name for prefix in os.listdir(self.chunk_dir)
+                for name in os.listdir(os.path.join(self.chunk_dir, prefix)) if not name.endswith('.tmp')}
+
+    def snapshot_ids(self):
+        """Snapshot ids, oldest first."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.snapshot_dir) if name.endswith('.json'))
+
+    def load_manifest(self, snapshot_id):
+        try:
+            with open(os.path.join(self.snapshot_dir, snapshot_id + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise BackupError(f"Snapshot {snapshot_id} is unreadable: {e}")
+
+    def manifests(self):
+        return [self.load_manifest(snapshot_id) for snapshot_id in self.snapshot_ids()]
+
+    def latest(self):
+        ids = self.snapshot_ids()
+        return self.load_manifest(ids[-1]) if ids else None
+
+    def write_manifest(self, manifest):
+        _write_atomic(os.path.join(self.snapshot_dir, manifest['id'] + '.json'),
+                      json.dumps(manifest, indent=1).encode('utf-8'))
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def source_state(data_path):
+    """Stat of every file a snapshot reads; equal states mean nothing changed."""
+    segments = {}
+    directory = archive.archive_dir(data_path)
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.json.gz'):
+                segments[name] = _file_stat(os.path.join(directory, name))
+    return {
+        'document': _file_stat(data_path),
+        'journal': _file_stat(journal.journal_path(data_path)),
+        'changes': _file_stat(changes.changes_path(data_path)),
+        'archive': segments,
+    }
+
+
+def snapshot(data_path, sidecar=None, store=None, now=None):
+    """Take a snapshot of the store at ``data_path``; returns its manifest, or None if nothing changed."""
+    store = store or BackupStore(backup_dir(data_path))
+    state = source_state(data_path)
+    previous = store.latest()
+    if previous is not None and previous.get('source') == state:
+        return None
+
+    # Read the log position before the data. A write that lands in between
+    # is then in the document and replayed from the log again on restore,
+    # which is harmless since every change carries the whole record.
+    log = changes.log_for(data_path)
+    seq = log.last_seq()
+    stats = {'chunks': 0, 'new_chunks': 0, 'new_bytes': 0}
+
+    def put(records):
+        data = _canonical(records)
+        digest, written = store.put_chunk(data)
+        stats['chunks'] += 1
+        if written:
+            stats['new_chunks'] += 1
+            stats['new_bytes'] += len(data)
+        return digest
+
+    document = ledger.load_document(data_path, sidecar=sidecar) if os.path.exists(data_path) else {}
+    transactions = document.pop('transactions', ledger.TransactionLedger())
+    manifest = {
+        'created': round((now or time.time()), 3),
+        'seq': seq,
+        'document': put(document),
+        'transactions': [put(chunk) for chunk in split_records(transactions.to_dicts())],
+        'transaction_count': len(transactions),
+        'journal': [put(chunk) for chunk in split_records(journal.JournalStore(journal.journal_path(data_path)).entries())],
+        'archive': {},
+    }
+    directory = archive.archive_dir(data_path)
+    for name in state['archive']:
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest, written = store.put_chunk(f.read())
+        stats['chunks'] += 1
+        stats['new_chunks'] += written
+        manifest['archive'][name] = digest
+
+    # The change log lines since the previous snapshot, kept for point-in-time restore.
+    previous_seq = previous['seq'] if previous is not None else 0
+    if seq < previous_seq:
+        previous_seq = 0  # the change log was reset
+    entries = log.entries(previous_seq, seq)
+    manifest['log_after'] = previous_seq
+    manifest['log'] = [put(entries[start:start + LOG_CHUNK_ITEMS])
+                       for start in range(0, len(entries), LOG_CHUNK_ITEMS)]
+    manifest['log_complete'] = [change['seq'] for change in entries] == list(range(previous_seq + 1, seq + 1))
+    manifest['source'] = state
+    manifest['stats'] = stats
+    stamp = datetime.datetime.fromtimestamp(manifest['created'], datetime.timezone.utc)
+    manifest['id'] = stamp.strftime('%Y%m%dT%H%M%S.%fZ') + f'-{seq}'
+    store.write_manifest(manifest)
+    return manifest
+
+
+class Restored:
+    """A data store rebuilt in memory from a snapshot, ready for logged changes."""
+
+    def __init__(self, store, manifest):
+        self.document = store.get_records(manifest['document'])
+        self.transactions = {}
+        for digest in manifest['transactions']:
+            for tx in store.get_records(digest):
+                self.transactions[tx['id']] = tx
+        self.journal = {}
+        for digest in manifest['journal']:
+            for entry in store.get_records(digest):
+                self.journal[entry.get('id')] = entry
+        self.archive = {name: store.get_chunk(digest) for name, digest in manifest['archive'].items()}
+        self.seq = manifest['seq']
+
+    def _replace_in_list(self, key, record_id, record):
+        items = [item for item in self.document.get(key, []) if item.get('id') != record_id]
+        if record is not None:
+            existing = [item.get('id') for item in self.document.get(key, [])]
+            position = existing.index(record_id) if record_id in existing else len(items)
+            items.insert(position, record)
+        self.document[key] = items
+
+    def apply(self, change):
+        """Replay one change log entry."""
+        kind, record_id, record = change['kind'], change['id'], change.get('record')
+        if kind == 'transaction':
+            if record is None:
+                self.transactions.pop(record_id, None)
+            else:
+                self.transactions[record_id] = record
+        elif kind == 'journal_entry':
+            if record is None:
+                self.journal.pop(record_id, None)
+            else:
+                self.journal[record_id] = record
+        elif kind == 'goal':
+            self._replace_in_list('goals', record_id, record)
+            if record is None:
+                self.document.get('goal_transactions', {}).pop(record_id, None)
+        elif kind == 'recurring_rule':
+            self._replace_in_list('recurring_transactions', record_id, record)
+        elif kind in ('budget', 'settings'):
+            if record is None:
+                self.document.pop(kind, None)
+            else:
+                self.document[kind] = record
+        elif kind == 'goal_transaction' and record is not None:
+            record = dict(record)
+            goal_id = record.pop('goal_id')
+            history = [entry for entry in self.document.setdefault('goal_transactions', {}).get(goal_id, [])
+                       if entry.get('id') != record_id]
+            bisect.insort(history, record, key=lambda entry: (entry.get('date', ''), entry.get('id', '')))
+            self.document['goal_transactions'][goal_id] = history
+        self.seq = change['seq']
+
+    def write(self, output_path):
+        """Write the document, journal and archive segments next to ``output_path``."""
+        document = dict(self.document)
+        document['transactions'] = ledger.TransactionLedger(self.transactions.values())
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        ledger.dump_document(document, output_path)
+        lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.journal.values())
+        journal_path = journal.journal_path(output_path)
+        _write_atomic(journal_path, lines.encode('utf-8'), ledger.replacement_mode(journal_path))
+        for name, data in self.archive.items():
+            segment_path = os.path.join(archive.archive_dir(output_path), name)
+            _write_atomic(segment_path, data, ledger.replacement_mode(segment_path))
+
+
+def _logged_changes(store, manifests, data_path, after, at):
+    """Logged changes after seq ``after`` up to time ``at``, from stored snapshots, then the live log."""
+    expected = after + 1
+    for manifest in manifests:
+        if manifest['seq'] <= after:
+            continue
+        for digest in manifest['log']:
+            for change in store.get_records(digest):
+                if change['seq'] <= after:
+                    continue
+                if change.get('at', 0) > at:
+                    return
+                if change['seq'] != expected:
+                    raise BackupError(f"Changes {expected}-{change['seq'] - 1} are missing from the backup log.")
+                expected += 1
+                yield change
+    for change in changes.log_for(data_path).entries(expected - 1):
+        if change.get('at', 0) > at:
+            return
+        if change['seq'] != expected:
+            raise BackupError(f"Changes {expected}-{change['seq'] - 1} were compacted out of the live "
+                              "change log; restore to a snapshot time instead.")
+        expected += 1
+        yield change
+
+
+def restore(data_path, output_path, at=None, store=None):
+    """Rebuild the store as of Unix time ``at`` (default: now) at ``output_path``; returns a summary."""
+    store = store or BackupStore(backup_dir(data_path))
+    at = time.time() if at is None else at
+    if os.path.abspath(output_path) == os.path.abspath(data_path):
+        raise BackupError("Restore to a new path, then move the files into place.")
+    manifests = store.manifests()
+    base = None
+    for manifest in manifests:
+        if manifest['created'] <= at:
+            base = manifest
+    if base is None:
+        raise BackupError("There is no snapshot from before that time.")
+    restored = Restored(store, base)
+    replayed = 0
+    later = [manifest for manifest in manifests if manifest['created'] > base['created']]
+    for change in _logged_changes(store, later, data_path, base['seq'], at):
+        restored.apply(change)
+        replayed += 1
+    restored.write(output_path)
+    return {'snapshot': base['id'], 'seq': restored.seq, 'replayed': replayed,
+            'transactions': len(restored.transactions)}
+
+
+def verify(data_path, store=None):
+    """Check every snapshot's chunks and log coverage; returns a report with a list of problems."""
+    store = store or BackupStore(backup_dir(data_path))
+    problems = []
+    checked = {}
+    manifests = []
+    for snapshot_id in store.snapshot_ids():
+        try:
+            manifests.append(store.load_manifest(snapshot_id))
+        except BackupError as e:
+            problems.append(str(e))
+
+    def check(digest):
+        if digest not in checked:
+            try:
+                checked[digest] = store.get_chunk(digest)
+            except BackupError as e:
+                checked[digest] = None
+                problems.append(str(e))
+        return checked[digest]
+
+    for manifest in manifests:
+        for digest in manifest['archive'].values():
+            check(digest)
+        for digest in [manifest['document']] + manifest['journal']:
+            check(digest)
+        chunks = [check(digest) for digest in manifest['transactions']]
+        count = sum(len(json.loads(data)) for data in chunks if data is not None)
+        if None not in chunks and count != manifest['transaction_count']:
+            problems.append(f"Snapshot {manifest['id']} holds {count} transactions, "
+                            f"its manifest says {manifest['transaction_count']}.")
+        seqs = []
+        for digest in manifest['log']:
+            data = check(digest)
+            if data is not None:
+                seqs.extend(change['seq'] for change in json.loads(data))
+        if seqs != list(range(manifest['log_after'] + 1, manifest['seq'] + 1)):
+            problems.append(f"Snapshot {manifest['id']} does not log every change from "
+                            f"{manifest['log_after'] + 1} to {manifest['seq']}; point-in-time restore "
+                            "before it is approximate.")
+    stored = store.chunk_digests()
+    return {
+        'snapshots': len(manifests),
+        'chunks_checked': len(checked),
+        'chunks_stored': len(stored),
+        'unreferenced_chunks': len(stored - set(checked)),
+        'problems': problems,
+    }
+
+
+class BackupScheduler:
+    """Takes a snapshot every ``interval`` seconds from a timer thread."""
+
+    def __init__(self, take_snapshot, interval=DEFAULT_INTERVAL):
+        self.take_snapshot = take_snapshot
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.take_snapshot()
+            except Exception as e:
+                print(f"Backup snapshot error: {e}")
+
+    def start(self):
+        """Start the background timer (no-op if already running)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='rupeetrack-backup', daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot, verify and restore RupeeTrack data.")
+    parser.add_argument('--data', default='user_data.json',
+                        help="Path of user_data.json")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('snapshot', help="Take a snapshot now")
+    commands.add_parser('list', help="List snapshots")
+    commands.add_parser('verify', help="Check every chunk and the stored change log")
+    restore_parser = commands.add_parser('restore', help="Rebuild the data as of a point in time")
+    restore_parser.add_argument('--at', type=_parse_time,
+                                help="Local ISO time or Unix time to restore to (default: now)")
+    restore_parser.add_argument('--output', required=True, help="Path for the restored user_data.json")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    """Entry point for the backup command"""
+
+    args = parse_args(argv)
+    try:
+        if args.command == 'snapshot':
+            manifest = snapshot(args.data)
+            result = {'snapshot': None} if manifest is None else {'snapshot': manifest['id'], **manifest['stats']}
+        elif args.command == 'list':
+            result = [{'id': manifest['id'], 'seq': manifest['seq'],
+                       'transactions': manifest['transaction_count'], **manifest['stats']}
+                      for manifest in BackupStore(backup_dir(args.data)).manifests()]
+        elif args.command == 'verify':
+            result = verify(args.data)
+        else:
+            result = restore(args.data, args.output, args.at)
+    except BackupError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    sys.stdout.write(json.dumps(result, indent=4) + "\n")
+    return 1 if args.command == 'verify' and result['problems'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+RupeeTrack Benchmark Script
+Generates synthetic user_data.json ledgers and drives every route through the
+Flask test client, reporting latency, throughput and peak memory as JSON.
+
+Usage:
+    python benchmark.py --sizes 1000 10000 --requests 20 --output bench.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import main
+
+DESCRIPTIONS = {
+    "Food": ["Groceries", "Restaurant", "Swiggy order", "Zomato order", "Vegetables", "Milk"],
+    "Transport": ["Uber ride", "Ola ride", "Metro card", "Petrol", "Bus pass", "Parking"],
+    "Salary": ["Monthly Salary", "Income", "Part-time", "Bonus", "Freelance"],
+    "Bills": ["Internet", "Electricity", "Mobile recharge", "Water bill", "Gas cylinder"],
+    "Entertainment": ["Movie tickets", "Netflix", "Concert", "Spotify", "Games"],
+    "Housing": ["Rent", "Maintenance", "Repairs", "Furniture"],
+}
+
+GOAL_CATEGORIES = ['Emergency', 'Travel', 'Education', 'Technology', 'Health', 'Home', 'Investment', 'Entertainment', 'Vehicle', 'Other']
+
+READ_ROUTES = ['/dashboard', '/transactions', '/budgets', '/goals', '/profile']
+
+WRITE_ROUTES = ['add_transaction', 'edit_transaction', 'delete_transaction']
+
+
+def _uuid(rng):
+    """Deterministic uuid4-shaped id drawn from the seeded generator"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_ledger(num_transactions, num_goals=5, budget_changes=6, journal_entries=20,
+                    seed=42, anchor_date=None, span_days=730):
+    """Build a synthetic user data document using the same schema as user_data.json"""
+
+    rng = random.Random(seed)
+    anchor = anchor_date or datetime.date.today()
+    end = datetime.datetime.combine(anchor, datetime.time(23, 59, 59))
+    start = end - datetime.timedelta(days=span_days)
+    span_seconds = int((end - start).total_seconds())
+
+    transactions = []
+    for _ in range(num_transactions):
+        if rng.random() < 0.15:
+            tx_type, category = 'income', 'Salary'
+            amount = round(rng.uniform(1000, 60000), 2)
+        else:
+            tx_type = 'expense'
+            category = rng.choice(["Food", "Transport", "Bills", "Entertainment", "Housing"])
+            amount = round(rng.uniform(20, 5000), 2)
+        timestamp = start + datetime.timedelta(seconds=rng.randrange(span_seconds))
+        transactions.append({
+            "id": _uuid(rng),
+            "description": rng.choice(DESCRIPTIONS[category]),
+            "amount": amount,
+            "type": tx_type,
+            "category": category,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        })
+
+    history = []
+    previous_amount = 20000.0
+    for i in range(budget_changes):
+        change_date = start + datetime.timedelta(days=(span_days * (i + 1)) // (budget_changes + 1))
+        new_amount = float(rng.randrange(15000, 80000, 500))
+        history.append({
+            "date": change_date.isoformat(),
+            "previous_amount": previous_amount,
+            "new_amount": new_amount,
+            "change_reason": "Manual update"
+        })
+        previous_amount = new_amount
+
+    goals = []
+    goal_history = {}
+    for i in range(num_goals):
+        target_amount = float(rng.randrange(10000, 500000, 1000))
+        created = start + datetime.timedelta(days=rng.randrange(span_days))
+        saved_amount = 0.0
+        goal_transactions = []
+        for _ in range(rng.randrange(0, 24)):
+            contribution = float(rng.randrange(500, 5000, 100))
+            if saved_amount + contribution > target_amount:
+                break
+            saved_amount += contribution
+            goal_transactions.append({
+                "id": _uuid(rng),
+                "amount": contribution,
+                "date": (created + datetime.timedelta(days=rng.randrange(max(1, (end - created).days)))).strftime('%Y-%m-%d %H:%M:%S'),
+                "type": "add_money_to_goal"
+            })
+        goal_id = _uuid(rng)
+        goal_transactions.sort(key=lambda entry: (entry["date"], entry["id"]))
+        running_total = 0.0
+        for entry in goal_transactions:
+            running_total += entry["amount"]
+            entry["balance_after"] = running_total
+        goal_history[goal_id] = goal_transactions
+        goals.append({
+            "id": goal_id,
+            "title": f"Goal {i + 1}",
+            "target_amount": target_amount,
+            "saved_amount": saved_amount,
+            "category": rng.choice(GOAL_CATEGORIES),
+            "deadline": (anchor + datetime.timedelta(days=rng.randrange(30, 900))).strftime('%Y-%m-%d'),
+            "status": "Completed" if saved_amount >= target_amount else "In Progress",
+            "created_date": created.strftime('%Y-%m-%d')
+        })
+
+    journal = [{
+        "id": _uuid(rng),
+        "content": f"Journal entry {i + 1}: reviewed spending for the week.",
+        "date": (end - datetime.timedelta(days=i * 3)).isoformat()
+    } for i in range(journal_entries)]
+
+    return {
+        "name": "Benchmark User",
+        "email": "bench@rupeetrack.com",
+        "transactions": transactions,
+        "budget": {
+            "monthly": history[-1]["new_amount"] * 4 if history else 0,
+            "categories": {"Food": 40000.0, "Transport": 15000.0, "Entertainment": 20000.0},
+            "history": history,
+            "last_updated": history[-1]["date"] if history else None,
+            "change_history": []
+        },
+        "settings": {
+            "show_presets": False,
+            "smart_suggestions": True,
+            "show_confirmations": True
+        },
+        "journal_entries": journal,
+        "goals": goals,
+        "goal_transactions": goal_history
+    }
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _summarise(samples, elapsed):
+    return {
+        "requests": len(samples),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def _write_request(client, route, ledger, rng, today):
+    """Issue one mutation request against the test client"""
+
+    tx_date = (today - datetime.timedelta(days=rng.randrange(0, 60))).strftime("%Y-%m-%d")
+    if route == 'add_transaction':
+        return client.post('/add_transaction', data={
+            'transaction_date': tx_date,
+            'description': 'Bench expense',
+            'amount': '12.50',
+            'type': rng.choice(['income', 'expense']),
+            'category': rng.choice(main.CATEGORIES)
+        })
+    target = rng.choice(ledger['transactions'])
+    if route == 'edit_transaction':
+        return client.post(f"/edit_transaction/{target['id']}", data={
+            'transaction_date': tx_date,
+            'description': target['description'],
+            'amount': str(target['amount']),
+            'type': target['type'],
+            'category': target['category']
+        })
+    ledger['transactions'].remove(target)
+    return client.get(f"/delete_transaction/{target['id']}")
+
+
+def _measure(client, route, iterations, ledger, rng, today):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        if route in WRITE_ROUTES:
+            response = _write_request(client, route, ledger, rng, today)
+        else:
+            response = client.get(route)
+        samples.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{route} returned HTTP {response.status_code}")
+    return samples, time.perf_counter() - started
+
+
+def _peak_memory(client, route, ledger, rng, today):
+    """Peak traced allocation (bytes) for a single request"""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        if route in WRITE_ROUTES:
+            _write_request(client, route, ledger, rng, today)
+        else:
+            client.get(route)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark_size(size, args, workdir):
+    """Benchmark every route against a ledger of the given size"""
+
+    rng = random.Random(args.seed)
+    today = datetime.date.today()
+    ledger = generate_ledger(size, num_goals=args.goals, budget_changes=args.budget_changes,
+                             journal_entries=args.journal_entries, seed=args.seed)
+    data_file = os.path.join(workdir, f"user_data_{size}.json")
+    main.USER_DATA_FILE = data_file
+    main.save_user_data_to_json(ledger)
+    file_bytes = os.path.getsize(data_file)
+    pristine = data_file + ".orig"
+    shutil.copyfile(data_file, pristine)
+
+    client = main.app.test_client()
+    results = {}
+    for route in READ_ROUTES + WRITE_ROUTES:
+        shutil.copyfile(pristine, data_file)
+        working = {"transactions": list(ledger["transactions"])}
+        for _ in range(args.warmup):
+            _measure(client, route, 1, working, rng, today)
+        samples, elapsed = _measure(client, route, args.requests, working, rng, today)
+        stats = _summarise(samples, elapsed)
+        stats["peak_memory_bytes"] = _peak_memory(client, route, working, rng, today)
+        results[route] = stats
+
+    return {
+        "transactions": size,
+        "goals": args.goals,
+        "file_bytes": file_bytes,
+        "routes": results
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark RupeeTrack routes against synthetic ledgers.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="Transaction counts to generate (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument('--requests', type=int, default=20, help="Measured requests per route")
+    parser.add_argument('--warmup', type=int, default=2, help="Unmeasured warm-up requests per route")
+    parser.add_argument('--goals', type=int, default=5, help="Number of savings goals")
+    parser.add_argument('--budget-changes', type=int, default=6, help="Entries in budget history")
+    parser.add_argument('--journal-entries', type=int, default=20, help="Number of journal entries")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the ledger generator")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--generate-only', metavar='PATH',
+                        help="Only write a ledger of the first size to PATH and exit")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    """Entry point for the benchmark command"""
+
+    args = parse_args(argv)
+
+    if args.generate_only:
+        ledger = generate_ledger(args.sizes[0], num_goals=args.goals, budget_changes=args.budget_changes,
+                                 journal_entries=args.journal_entries, seed=args.seed)
+        with open(args.generate_only, 'w') as f:
+            json.dump(ledger, f, indent=4)
+        return
+
+    main.app.config['TESTING'] = True
+    original_data_file = main.USER_DATA_FILE
+    workdir = tempfile.mkdtemp(prefix="rupeetrack-bench-")
+    report = {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "requests_per_route": args.requests,
+        "runs": []
+    }
+    try:
+        # Route handlers print debug lines; keep them out of the JSON report.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for size in args.sizes:
+                report["runs"].append(benchmark_size(size, args, workdir))
+    finally:
+        main.USER_DATA_FILE = original_data_file
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        import resource
+        report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
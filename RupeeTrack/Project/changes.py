@@ -0,0 +1,288 @@
+"""
+Change log for delta sync.
+
+Every change to a synced record gets the next sequence number and is
+appended to a JSON Lines file next to ``user_data.json``, so a client that
+last synced at sequence ``N`` can fetch just what changed since then. Each
+line is ``{"seq", "at", "kind", "id", "op", "record"}``, ``at`` being the
+Unix time of the write. ``op`` is ``upsert`` with the full record, or
+``delete`` with no record: a tombstone.
+
+Transactions, goal contributions and journal entries are staged explicitly
+by the code that changes them, since diffing a large ledger on every save
+would cost more than the save itself. The small collections (goals,
+recurring rules, budget and settings) are diffed against the latest logged
+version of each record when a document is flushed.
+
+A new log is seeded with every existing record, so syncing from sequence
+0 returns a full copy. ``compact`` keeps only the newest line per record.
+That is always safe: a client behind the compaction still sees the latest
+state, or the tombstone, of every record changed since its sequence. A
+deleted goal's contributions are not tombstoned one by one; clients drop
+them with the goal.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    from . import ledger
+except ImportError:
+    import ledger
+
+DEFAULT_PAGE_SIZE = 1000
+
+# Compact once the log holds this many lines beyond one per live record.
+COMPACT_SLACK = 10000
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def changes_path(path):
+    return os.path.splitext(path)[0] + '.changes.jsonl'
+
+
+def log_for(data_path, seed=None):
+    """The shared change log for the data file at ``data_path``."""
+    path = changes_path(data_path)
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = ChangeLog(path, seed)
+        elif seed is not None:
+            log.seed = seed
+        return log
+
+
+def _digest(record):
+    return hashlib.blake2b(json.dumps(record, sort_keys=True, default=str).encode('utf-8'), digest_size=16).digest()
+
+
+def document_records(user):
+    """(kind, id, record) for each diffed record of a user document."""
+    for goal in user.get('goals', []):
+        yield 'goal', goal['id'], goal
+    for rule in user.get('recurring_transactions', []):
+        yield 'recurring_rule', rule['id'], rule
+    if isinstance(user.get('budget'), dict):
+        yield 'budget', 'budget', user['budget']
+    if isinstance(user.get('settings'), dict):
+        yield 'settings', 'settings', user['settings']
+
+
+DIFFED_KINDS = ('goal', 'recurring_rule', 'budget', 'settings')
+
+
+class ChangeLog:
+    """Append-only, sequence-numbered change file with an in-memory index."""
+
+    def __init__(self, path, seed=None):
+        # seed(user) yields (kind, id, record) for every record; user may be None.
+        self.path = path
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stat = None
+        self._seqs = []
+        self._offsets = []
+        # (kind, id) of each line, parallel to _seqs
+        self._keys = []
+        self._end = 0
+        # (kind, id) -> digest of the latest diffed record (True for staged
+        # kinds), None once deleted
+        self._latest = {}
+        # (kind, id) -> seq of its latest line
+        self._latest_seq = {}
+
+    # Staging -----------------------------------------------------------
+
+    def _pending(self):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = []
+        return pending
+
+    def stage(self, kind, record_id, record=None):
+        """Queue a change made by this thread; ``record=None`` is a delete."""
+        self._pending().append((kind, record_id, dict(record) if record is not None else None))
+
+    def discard(self):
+        self._local.pending = []
+
+    # Index -------------------------------------------------------------
+
+    def _current_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _index_line(self, line, offset):
+        change = json.loads(line)
+        key = (change['kind'], change['id'])
+        self._seqs.append(change['seq'])
+        self._offsets.append(offset)
+        self._keys.append(key)
+        self._latest_seq[key] = change['seq']
+        if change['op'] == 'delete':
+            self._latest[key] = None
+        else:
+            # Only diffed records are ever compared; the rest just need to be live.
+            self._latest[key] = _digest(change['record']) if key[0] in DIFFED_KINDS else True
+
+    def _refresh(self):
+        stat = self._current_stat()
+        if stat == self._stat:
+            return
+        self._seqs, self._offsets, self._keys, self._end = [], [], [], 0
+        self._latest, self._latest_seq = {}, {}
+        if stat is not None:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            self._index_line(line, self._end)
+                        except (ValueError, KeyError):
+                            # A torn final line from an interrupted append.
+                            pass
+                    self._end += len(line)
+        self._stat = stat
+
+    def last_seq(self):
+        with self._lock:
+            self._refresh()
+            return self._seqs[-1] if self._seqs else 0
+
+    # Writing -----------------------------------------------------------
+
+    def _append(self, changes):
+        """Write (kind, id, record) changes with new sequence numbers."""
+        seq = self._seqs[-1] if self._seqs else 0
+        at = round(time.time(), 3)
+        lines = []
+        for kind, record_id, record in changes:
+            seq += 1
+            change = {'seq': seq, 'at': at, 'kind': kind, 'id': record_id,
+                      'op': 'delete' if record is None else 'upsert', 'record': record}
+            lines.append(json.dumps(change, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+        with open(self.path, 'ab') as f:
+            start = f.tell()
+            f.write(b''.join(lines))
+        for line in lines:
+            self._index_line(line, start)
+            start += len(line)
+        self._end = start
+        self._stat = self._current_stat()
+
+    def _diff(self, user):
+        seen = set()
+        changes = []
+        for kind, record_id, record in document_records(user):
+            key = (kind, record_id)
+            seen.add(key)
+            if self._latest.get(key) != _digest(record):
+                changes.append((kind, record_id, record))
+        for key, digest in self._latest.items():
+            if key[0] in DIFFED_KINDS and digest is not None and key not in seen:
+                changes.append((key[0], key[1], None))
+        return changes
+
+    def flush(self, user=None):
+        """Log this thread's staged changes, plus ``user``'s diffed records; returns the last seq."""
+        pending, self._local.pending = self._pending(), []
+        with self._lock:
+            self._refresh()
+            if not self._seqs and self.seed is not None:
+                # The seed reads the saved state, which already includes pending.
+                self._append(list(self.seed(user)))
+                pending = []
+            changes = list(pending)
+            if user is not None:
+                changes.extend(self._diff(user))
+            if changes:
+                self._append(changes)
+            if len(self._seqs) > len(self._latest) + COMPACT_SLACK:
+                self._compact()
+            return self._seqs[-1] if self._seqs else 0
+
+    def _compact(self):
+        keep = {}
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    continue
+                keep[(change['kind'], change['id'])] = line if line.endswith(b'\n') else line + b'\n'
+        lines = sorted(keep.values(), key=lambda line: json.loads(line)['seq'])
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.writelines(lines)
+            os.chmod(tmp_path, ledger.replacement_mode(self.path))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._stat = None
+        self._refresh()
+
+    # Reading -----------------------------------------------------------
+
+    def _read_after(self, seq, upto=None):
+        with self._lock:
+            self._refresh()
+            last_seq = self._seqs[-1] if self._seqs else 0
+            start = bisect.bisect_right(self._seqs, seq)
+            stop = len(self._seqs) if upto is None else bisect.bisect_right(self._seqs, upto)
+            if start >= stop:
+                return [], last_seq
+            end = self._offsets[stop] if stop < len(self._offsets) else self._end
+            with open(self.path, 'rb') as f:
+                f.seek(self._offsets[start])
+                chunk = f.read(end - self._offsets[start])
+        changes = []
+        for line in chunk.splitlines():
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                continue
+        return changes, last_seq
+
+    def entries(self, after=0, upto=None):
+        """Every logged change with ``after < seq <= upto``, in order and not collapsed."""
+        return self._read_after(after, upto)[0]
+
+    def since(self, seq, limit=DEFAULT_PAGE_SIZE):
+        """Changes after ``seq``, newest per record, oldest first; returns (changes, last_seq, more).
+
+        The index says which line is each record's newest, so only the
+        lines of one page are read and parsed, not the whole tail.
+        """
+        with self._lock:
+            self._refresh()
+            last_seq = self._seqs[-1] if self._seqs else 0
+            positions = []
+            more = False
+            for pos in range(bisect.bisect_right(self._seqs, seq), len(self._seqs)):
+                if self._latest_seq[self._keys[pos]] != self._seqs[pos]:
+                    continue
+                if len(positions) == limit:
+                    more = True
+                    break
+                positions.append(pos)
+            lines = []
+            if positions:
+                with open(self.path, 'rb') as f:
+                    for pos in positions:
+                        f.seek(self._offsets[pos])
+                        lines.append(f.readline())
+        return [json.loads(line) for line in lines], last_seq, more
@@ -0,0 +1,97 @@
+"""
+Server-sent events for live page updates.
+
+After a write the pages only need a handful of numbers to refresh: balance,
+this month's spend per category and goal progress. ``EventBroker`` fans each
+published update out to every open ``/events`` stream. Each subscriber has
+a small bounded queue. A subscriber that stops reading is dropped instead
+of holding events in memory, and its browser reconnects with
+``Last-Event-ID`` and gets the updates it missed replayed from a short
+history.
+"""
+
+import collections
+import itertools
+import json
+import queue
+import threading
+
+HISTORY_SIZE = 100
+
+QUEUE_SIZE = 100
+
+HEARTBEAT_INTERVAL = 15
+
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    __slots__ = ('queue', 'closed', 'notify')
+
+    def __init__(self, queue_size, notify=None):
+        self.queue = queue.Queue(queue_size)
+        self.closed = False
+        # Called from the publishing thread after each put or close, so a
+        # reader on an event loop can wait without blocking a thread.
+        self.notify = notify
+
+
+class EventBroker:
+    """Publishes events to every current subscriber."""
+
+    def __init__(self, history_size=HISTORY_SIZE, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = collections.deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, last_event_id=None, notify=None):
+        """A new subscription, primed with the events after ``last_event_id`` still in history."""
+        subscription = Subscription(self.queue_size, notify)
+        with self._lock:
+            if last_event_id is not None:
+                for message in self._history:
+                    if message[0] > last_event_id:
+                        subscription.queue.put_nowait(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        with self._lock:
+            message = (next(self._ids), event, data)
+            self._history.append(message)
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.queue.put_nowait(message)
+                except queue.Full:
+                    subscription.closed = True
+                    self._subscribers.discard(subscription)
+                if subscription.notify is not None:
+                    subscription.notify()
+        return message[0]
+
+    def stream(self, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """Generator of ``text/event-stream`` chunks for one client."""
+        subscription = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not subscription.closed:
+                try:
+                    message = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line; keeps proxies from closing an idle stream.
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(*message)
+        finally:
+            self.unsubscribe(subscription)
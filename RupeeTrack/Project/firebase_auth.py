@@ -0,0 +1,258 @@
+"""
+Local verification of Firebase ID tokens.
+
+Firebase ID tokens are RS256 JWTs signed with Google keys that rotate every
+few hours. ``KeySet`` holds the current public keys (JWKS) for as long as the
+key source's ``Cache-Control`` allows, serves the cached keys while a refresh
+runs in the background once they expire, and refetches immediately (at most
+once per ``min_refresh_interval``) when a token names a key it has not seen.
+``TokenVerifier`` checks the signature with plain modular exponentiation and
+then the Firebase claims, and remembers each verified token, keyed on its
+SHA-256 hash, until the token expires. Logging in is therefore normally a
+dictionary lookup or one RSA verification, with no network round trip.
+
+A key source is any object with ``fetch() -> (keys, max_age)``, where
+``keys`` maps key id to an ``(n, e)`` pair of ints. ``HttpJwksSource`` reads
+Google's published JWKS and ``StaticKeySource`` serves fixed keys, e.g. for a
+local fake issuer.
+"""
+
+import base64
+import collections
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import urllib.request
+
+GOOGLE_JWKS_URL = 'https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com'
+
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+DEFAULT_KEY_TTL = 3600
+
+MIN_REFRESH_INTERVAL = 60
+
+# Allowed clock skew, in seconds, for exp/iat/auth_time.
+CLOCK_SKEW = 60
+
+TOKEN_CACHE_SIZE = 1024
+
+FETCH_TIMEOUT = 10
+
+# DER prefix of a PKCS#1 v1.5 DigestInfo for SHA-256.
+_SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class TokenError(ValueError):
+    """The token is malformed, not signed by a current key, or its claims do not hold."""
+
+
+def b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def _b64url_int(value):
+    return int.from_bytes(b64url_decode(value), 'big')
+
+
+def parse_jwks(document):
+    """``{kid: (n, e)}`` for the RSA keys in a JWKS document."""
+    keys = {}
+    for jwk in document.get('keys', []):
+        if jwk.get('kty') == 'RSA' and jwk.get('kid') and jwk.get('n') and jwk.get('e'):
+            keys[jwk['kid']] = (_b64url_int(jwk['n']), _b64url_int(jwk['e']))
+    return keys
+
+
+def rsa_sha256_verify(public_key, message, signature):
+    """True if ``signature`` is a valid RSASSA-PKCS1-v1_5 SHA-256 signature of ``message``."""
+    n, e = public_key
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    value = int.from_bytes(signature, 'big')
+    if value >= n:
+        return False
+    encoded = pow(value, e, n).to_bytes(size, 'big')
+    digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    padding = size - len(digest_info) - 3
+    if padding < 8:
+        return False
+    expected = b'\x00\x01' + b'\xff' * padding + b'\x00' + digest_info
+    return hmac.compare_digest(encoded, expected)
+
+
+class HttpJwksSource:
+    """Google's published JWKS, with the max-age from its Cache-Control header."""
+
+    def __init__(self, url=GOOGLE_JWKS_URL, timeout=FETCH_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            document = json.load(response)
+            match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+        return parse_jwks(document), int(match.group(1)) if match else None
+
+
+class StaticKeySource:
+    """Fixed keys, for tests and local fake issuers."""
+
+    def __init__(self, keys, max_age=None):
+        self.keys = dict(keys)
+        self.max_age = max_age
+
+    def fetch(self):
+        return dict(self.keys), self.max_age
+
+
+class KeySet:
+    """Cached, rotation-aware public keys from a key source."""
+
+    def __init__(self, source, default_ttl=DEFAULT_KEY_TTL, min_refresh_interval=MIN_REFRESH_INTERVAL,
+                 clock=time.time):
+        self.source = source
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0
+        self._last_fetch = None
+        self._refreshing = False
+
+    def refresh(self):
+        """Fetch the keys now; on failure keep whatever is cached."""
+        with self._lock:
+            self._last_fetch = self.clock()
+        try:
+            keys, max_age = self.source.fetch()
+        except Exception as e:
+            print(f"Could not fetch token signing keys: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._refreshing = False
+        with self._lock:
+            self._keys = keys
+            self._expires_at = self.clock() + (self.default_ttl if max_age is None else max_age)
+        return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='rupeetrack-jwks', daemon=True).start()
+
+    def get(self, kid):
+        """Public key ``(n, e)`` for ``kid``, or None if the source does not publish it."""
+        now = self.clock()
+        with self._lock:
+            key = self._keys.get(kid)
+            expired = now >= self._expires_at
+            recently_fetched = self._last_fetch is not None and now - self._last_fetch < self.min_refresh_interval
+        if key is not None:
+            if expired:
+                # Keys outlive their max-age by hours; refresh without blocking this login.
+                self._refresh_in_background()
+            return key
+        # However the last fetch went, an unknown kid may not trigger another
+        # one sooner: forged tokens with random kids would each block a login.
+        if recently_fetched:
+            return None
+        self.refresh()
+        with self._lock:
+            return self._keys.get(kid)
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens for one project against a ``KeySet``."""
+
+    def __init__(self, project_id, key_set, clock=time.time, cache_size=TOKEN_CACHE_SIZE):
+        self.project_id = project_id
+        self.issuer = ISSUER_PREFIX + project_id
+        self.key_set = key_set
+        self.clock = clock
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._verified = collections.OrderedDict()
+
+    def _cached(self, token_hash, now):
+        with self._lock:
+            entry = self._verified.get(token_hash)
+            if entry is None:
+                return None
+            if now >= entry['exp'] + CLOCK_SKEW:
+                del self._verified[token_hash]
+                return None
+            self._verified.move_to_end(token_hash)
+            return entry
+
+    def _remember(self, token_hash, claims):
+        with self._lock:
+            self._verified[token_hash] = claims
+            self._verified.move_to_end(token_hash)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+    def _decode(self, token):
+        parts = token.split('.')
+        if len(parts) != 3:
+            raise TokenError("Token is not a JWT.")
+        try:
+            header = json.loads(b64url_decode(parts[0]))
+            claims = json.loads(b64url_decode(parts[1]))
+            signature = b64url_decode(parts[2])
+        except ValueError:
+            raise TokenError("Token is not valid base64url JSON.")
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise TokenError("Token is not a JWT.")
+        return header, claims, (parts[0] + '.' + parts[1]).encode('ascii'), signature
+
+    def _check_claims(self, claims, now):
+        if claims.get('aud') != self.project_id:
+            raise TokenError("Token was issued for another project.")
+        if claims.get('iss') != self.issuer:
+            raise TokenError("Token has the wrong issuer.")
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise TokenError("Token has no valid subject.")
+        for name in ('exp', 'iat'):
+            if not isinstance(claims.get(name), (int, float)):
+                raise TokenError(f"Token has no {name} claim.")
+        if now >= claims['exp'] + CLOCK_SKEW:
+            raise TokenError("Token has expired.")
+        if claims['iat'] > now + CLOCK_SKEW:
+            raise TokenError("Token was issued in the future.")
+        auth_time = claims.get('auth_time')
+        if isinstance(auth_time, (int, float)) and auth_time > now + CLOCK_SKEW:
+            raise TokenError("Token was authenticated in the future.")
+
+    def verify(self, token):
+        """The token's claims; raises TokenError if it is not a valid, current ID token."""
+        if not isinstance(token, str) or not token:
+            raise TokenError("Missing token.")
+        now = self.clock()
+        token_hash = hashlib.sha256(token.encode('utf-8')).digest()
+        claims = self._cached(token_hash, now)
+        if claims is not None:
+            return claims
+
+        header, claims, signed, signature = self._decode(token)
+        if header.get('alg') != 'RS256':
+            raise TokenError("Token is not signed with RS256.")
+        key = self.key_set.get(header.get('kid'))
+        if key is None:
+            raise TokenError("Token is signed with an unknown key.")
+        if not rsa_sha256_verify(key, signed, signature):
+            raise TokenError("Token signature is invalid.")
+        self._check_claims(claims, now)
+        self._remember(token_hash, claims)
+        return claims
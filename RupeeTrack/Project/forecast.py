@@ -0,0 +1,201 @@
+"""
+Month-end spending forecast for the budgets page.
+
+For each category the forecast is what has been spent so far this month plus
+what was typically spent after today's day-of-month in the previous
+``HISTORY_MONTHS`` months. This follows each category's usual shape — rent
+early in the month, groceries spread across it. With no earlier months
+to learn from, it falls back to extrapolating the current daily pace.
+
+``BudgetForecast`` keeps the current month's daily spend per category and
+the historical tails, tagged with the data version like the search index.
+Expense writes in the current month adjust a single day's bucket, so the
+forecast stays current at O(1) cost per write; anything else triggers a
+rebuild on the next read.
+"""
+
+import bisect
+import calendar
+import datetime
+import threading
+
+try:
+    from . import ledger as ledger_module
+except ImportError:
+    import ledger as ledger_module
+
+SECONDS_PER_DAY = 86400
+
+HISTORY_MONTHS = 3
+
+WARNING_PERCENTAGE = 80
+
+
+def _month_start(day):
+    return datetime.datetime(day.year, day.month, 1)
+
+
+def _add_months(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def _category_name(category):
+    return 'Other' if category is None else category
+
+
+def _status(projected, budget):
+    if budget <= 0:
+        return 'no_budget'
+    usage = projected / budget * 100
+    if usage >= 100:
+        return 'over'
+    if usage >= WARNING_PERCENTAGE:
+        return 'warning'
+    return 'ok'
+
+
+class BudgetForecast:
+    """Current-month spend curves and historical tails for one data version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.month = None
+        self.history_start_ts = 0
+        self.month_start_ts = 0
+        self.month_end_ts = 0
+        self.days_in_month = 0
+        # category -> paise spent on each day of the current month
+        self.current = {}
+        # category -> average paise spent after day d of earlier months
+        self.tails = {}
+        self.history_months = 0
+
+    def _rebuild(self, user, version, today):
+        transactions = user.get('transactions', ledger_module.TransactionLedger())
+        month_start = _month_start(today)
+        starts = [_add_months(month_start, offset) for offset in range(-HISTORY_MONTHS, 2)]
+        bounds = [ledger_module.datetime_to_epoch(start) for start in starts]
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+
+        expense_code = transactions.type_codes.codes.get('expense', -1)
+        category_names = transactions.category_codes.names
+        # (month index, category code) -> paise per day of that month
+        daily = {}
+        for ts, amount, tx_type, category in zip(transactions.timestamps, transactions.amounts,
+                                                 transactions.types, transactions.categories):
+            if tx_type != expense_code or not bounds[0] <= ts < bounds[-1]:
+                continue
+            month_index = bisect.bisect_right(bounds, ts) - 1
+            days = daily.get((month_index, category))
+            if days is None:
+                days = daily[(month_index, category)] = [0] * 31
+            days[(ts - bounds[month_index]) // SECONDS_PER_DAY] += amount
+
+        active_months = {month_index for month_index, _ in daily if month_index < HISTORY_MONTHS}
+        current = {}
+        tail_sums = {}
+        for (month_index, category), days in daily.items():
+            name = _category_name(category_names[category])
+            if month_index == HISTORY_MONTHS:
+                merged = current.setdefault(name, [0] * days_in_month)
+                for day, amount in enumerate(days[:days_in_month]):
+                    merged[day] += amount
+                continue
+            # tail[d] = spend on day d+1 onwards, i.e. after the first d days
+            tail = tail_sums.setdefault(name, [0] * 32)
+            remaining = 0
+            for day in range(30, -1, -1):
+                remaining += days[day]
+                tail[day] += remaining
+
+        self.version = version
+        self.month = (today.year, today.month)
+        self.history_start_ts = bounds[0]
+        self.month_start_ts = bounds[HISTORY_MONTHS]
+        self.month_end_ts = bounds[HISTORY_MONTHS + 1]
+        self.days_in_month = days_in_month
+        self.current = current
+        self.history_months = len(active_months)
+        self.tails = {name: [total // self.history_months for total in tail] for name, tail in tail_sums.items()}
+
+    def _ensure(self, user, version, today):
+        if self.version is None or self.version != version or self.month != (today.year, today.month):
+            self._rebuild(user, version, today)
+
+    def apply_transaction(self, base_version, tx, sign=1):
+        """Count (``sign=1``) or uncount (``sign=-1``) one transaction."""
+        if tx.get('type') != 'expense':
+            return
+        ts = ledger_module.parse_timestamp(tx.get('timestamp'))
+        try:
+            amount = ledger_module.to_paise(tx.get('amount', 0)) * sign
+        except (TypeError, ValueError):
+            amount = 0
+        with self._lock:
+            if self.version is None or self.version != base_version:
+                return
+            if self.month_start_ts <= ts < self.month_end_ts:
+                days = self.current.setdefault(_category_name(tx.get('category')), [0] * self.days_in_month)
+                days[(ts - self.month_start_ts) // SECONDS_PER_DAY] += amount
+            elif self.history_start_ts <= ts < self.month_start_ts:
+                # Earlier months feed the historical tails; recompute them.
+                self.version = None
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+
+    def advance(self, base_version, new_version):
+        """Move to ``new_version`` after a save; invalidate if we were not at ``base_version``."""
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.version = new_version
+            else:
+                self.version = None
+
+    def _project(self, name, day):
+        spent = sum(self.current.get(name, ())[:day])
+        if self.history_months:
+            return spent, spent + self.tails.get(name, [0] * 32)[day]
+        return spent, spent * self.days_in_month // day
+
+    def report(self, user, version, today=None):
+        """Spent-to-date and projected month-end spend, in rupees, against the user's budgets."""
+        today = today or datetime.date.today()
+        budget = user.get('budget') if isinstance(user.get('budget'), dict) else {}
+        category_budgets = budget.get('categories', {})
+        with self._lock:
+            self._ensure(user, version, today)
+            day = today.day
+            names = set(self.current) | set(self.tails) | set(category_budgets)
+            categories = {}
+            total_spent = total_projected = 0
+            for name in sorted(names):
+                spent, projected = self._project(name, day)
+                total_spent += spent
+                total_projected += projected
+                category_budget = ledger_module.to_paise(category_budgets.get(name, 0))
+                categories[name] = {
+                    'spent': ledger_module.from_paise(spent),
+                    'projected': ledger_module.from_paise(projected),
+                    'budget': ledger_module.from_paise(category_budget),
+                    'status': _status(projected, category_budget),
+                }
+            history_months = self.history_months
+            days_in_month = self.days_in_month
+
+        monthly_budget = ledger_module.to_paise(budget.get('monthly', 0))
+        return {
+            'day': day,
+            'days_in_month': days_in_month,
+            'history_months': history_months,
+            'total': {
+                'spent': ledger_module.from_paise(total_spent),
+                'projected': ledger_module.from_paise(total_projected),
+                'budget': ledger_module.from_paise(monthly_budget),
+                'status': _status(total_projected, monthly_budget),
+            },
+            'categories': categories,
+        }
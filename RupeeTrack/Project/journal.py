@@ -0,0 +1,167 @@
+"""
+Append-only journal storage for RupeeTrack.
+
+Journal entries live in a JSON Lines file next to ``user_data.json``, one
+entry per line, oldest first. Adding an entry appends one line instead of
+rewriting the whole data file, and ``JournalStore`` keeps the byte offset
+of every line so a reverse-chronological page is a single seek and read.
+The cursor returned with a page is the line number to continue below.
+
+Files written before the store existed keep entries (newest first) under
+``journal_entries`` in the document; ``import_legacy`` moves them over,
+merging with any entries the store already has.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+try:
+    from . import ledger
+except ImportError:
+    import ledger
+
+DEFAULT_PAGE_SIZE = 10
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def journal_path(path):
+    return os.path.splitext(path)[0] + '.journal.jsonl'
+
+
+def store_for(data_path):
+    """The shared store for the data file at ``data_path``."""
+    path = journal_path(data_path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = JournalStore(path)
+        return store
+
+
+class JournalStore:
+    """One user's journal: an append-only JSON Lines file plus a line-offset index."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = []
+        self._end = 0
+        self._stat = None
+
+    def _current_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        """Re-index the file if something other than ``append`` changed it."""
+        stat = self._current_stat()
+        if stat == self._stat:
+            return
+        offsets = []
+        end = 0
+        if stat is not None:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        offsets.append(end)
+                    end += len(line)
+        self._offsets = offsets
+        self._end = end
+        self._stat = stat
+
+    def version(self):
+        """A value that changes whenever the journal does."""
+        return self._current_stat()
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            self._refresh()
+            with open(self.path, 'ab') as f:
+                start = f.tell()
+                f.write(line)
+            self._offsets.append(start)
+            self._end = start + len(line)
+            self._stat = self._current_stat()
+
+    def _read(self, start, end):
+        if start >= end:
+            return []
+        stop = self._offsets[end] if end < len(self._offsets) else self._end
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[start])
+            chunk = f.read(stop - self._offsets[start])
+        entries = []
+        for line in chunk.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from an interrupted append.
+                continue
+        return entries
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """``limit`` entries, newest first, older than ``cursor``; returns (entries, next_cursor)."""
+        with self._lock:
+            self._refresh()
+            end = len(self._offsets)
+            if cursor is not None:
+                end = max(0, min(int(cursor), end))
+            start = max(0, end - limit)
+            entries = self._read(start, end)
+        entries.reverse()
+        return entries, (start if start > 0 else None)
+
+    def entries(self):
+        """Every entry, oldest first."""
+        with self._lock:
+            self._refresh()
+            return self._read(0, len(self._offsets))
+
+    def import_legacy(self, entries):
+        """Move a document's newest-first ``journal_entries`` into the store.
+
+        The store may already have entries, e.g. when an older copy of the
+        document is restored next to it; entries it already holds (by id)
+        are skipped and the rest merged in date order. Returns True if any
+        were added.
+        """
+        with self._lock:
+            self._refresh()
+            existing = self._read(0, len(self._offsets))
+            ids = {entry.get('id') for entry in existing if isinstance(entry, dict)}
+            added = [entry for entry in reversed(entries)
+                     if isinstance(entry, dict)
+                     and (entry.get('id') not in ids if entry.get('id') is not None else entry not in existing)]
+            if not added:
+                return False
+            merged = existing + added
+            if existing:
+                merged.sort(key=lambda entry: str(entry.get('date', '')) if isinstance(entry, dict) else '')
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    for entry in merged:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                os.chmod(tmp_path, ledger.replacement_mode(self.path))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._stat = None
+            return True
@@ -0,0 +1,854 @@
+"""
+Compact transaction storage and streaming JSON I/O for RupeeTrack.
+
+A user's transactions are held column-wise (parallel arrays of ids,
+descriptions, integer-paise amounts, type/category codes and epoch
+timestamps) instead of
+one dict per transaction. ``load_document`` streams ``user_data.json`` and
+feeds each transaction straight into the columns, so a large ledger never
+exists as a list of dicts; ``dump_document`` writes it back the same way.
+
+``TransactionLedger`` behaves like the list it replaces: iterating yields
+lightweight ``Transaction`` rows that support ``tx['amount']``,
+``tx.get('category')`` and Jinja's ``tx.amount``.
+"""
+
+import datetime
+import json
+import math
+import mmap
+import os
+import re
+import stat
+import struct
+import sys
+import tempfile
+import uuid
+from array import array
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Column value for a transaction without a parseable timestamp.
+NO_TIMESTAMP = -(2 ** 63)
+
+COLUMN_FIELDS = ('id', 'description', 'amount', 'type', 'category', 'timestamp')
+
+_ONE_SECOND = datetime.timedelta(seconds=1)
+
+READ_CHUNK_SIZE = 1 << 20
+
+# Read once at import: os.umask can only be queried by setting it, which
+# is not safe to do while other threads create files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_SCALAR_END = re.compile(r'[,\]}\s]')
+
+
+def parse_timestamp(value):
+    """Seconds since EPOCH for a ``YYYY-MM-DD HH:MM:SS`` string, else NO_TIMESTAMP."""
+    if not isinstance(value, str) or len(value) != 19:
+        return NO_TIMESTAMP
+    try:
+        dt = datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                               int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    except ValueError:
+        return NO_TIMESTAMP
+    if value[4] != '-' or value[7] != '-' or value[10] != ' ' or value[13] != ':' or value[16] != ':':
+        return NO_TIMESTAMP
+    return (dt - EPOCH) // _ONE_SECOND
+
+
+def to_paise(value):
+    """Integer paise for a rupee amount (number or numeric string)."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * 100
+    rupees = float(value)
+    if not math.isfinite(rupees):
+        raise ValueError(f"Amount is not finite: {value!r}")
+    return round(rupees * 100)
+
+
+def from_paise(paise):
+    """Rupee float for display and JSON; exact to the paisa when printed."""
+    return paise / 100
+
+
+def epoch_to_datetime(seconds):
+    return EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def datetime_to_epoch(dt):
+    return (dt.replace(microsecond=0) - EPOCH) // _ONE_SECOND
+
+
+class _Codes:
+    """Small string interning table used for the type and category columns."""
+
+    __slots__ = ('names', 'codes')
+
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self.codes[name] = code
+        return code
+
+
+def _pack_uuid(value):
+    """16 raw bytes for a canonical lowercase uuid string, else None."""
+    if (len(value) != 36 or value[8] != '-' or value[13] != '-'
+            or value[18] != '-' or value[23] != '-'):
+        return None
+    digits = value[0:8] + value[9:13] + value[14:18] + value[19:23] + value[24:36]
+    try:
+        packed = bytes.fromhex(digits)
+    except ValueError:
+        return None
+    return packed if packed.hex() == digits else None
+
+
+def _unpack_uuid(packed):
+    h = packed.hex()
+    return f"{h[0:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+
+
+class IdColumn:
+    """List-like column of transaction ids.
+
+    Ids are almost always uuid4 strings, which are kept as 16 packed bytes
+    instead of an ~85-byte str object each. Any other id is kept verbatim in
+    ``odd`` (position -> id) with a zeroed slot in the packed buffer.
+    """
+
+    __slots__ = ('packed', 'odd')
+
+    WIDTH = 16
+
+    def __init__(self):
+        self.packed = bytearray()
+        self.odd = {}
+
+    def __len__(self):
+        return len(self.packed) // self.WIDTH
+
+    def __bool__(self):
+        return bool(self.packed)
+
+    def __getitem__(self, pos):
+        odd = self.odd.get(pos) if self.odd else None
+        if odd is not None:
+            return odd
+        start = pos * self.WIDTH
+        return _unpack_uuid(self.packed[start:start + self.WIDTH])
+
+    def __setitem__(self, pos, value):
+        packed = _pack_uuid(value) if isinstance(value, str) else None
+        start = pos * self.WIDTH
+        if packed is None:
+            self.packed[start:start + self.WIDTH] = bytes(self.WIDTH)
+            self.odd[pos] = value
+        else:
+            self.packed[start:start + self.WIDTH] = packed
+            self.odd.pop(pos, None)
+
+    def append(self, value):
+        packed = _pack_uuid(value)
+        if packed is None:
+            self.odd[len(self)] = value
+            packed = bytes(self.WIDTH)
+        self.packed += packed
+
+    def pop(self, pos):
+        value = self[pos]
+        start = pos * self.WIDTH
+        del self.packed[start:start + self.WIDTH]
+        if self.odd:
+            self.odd = {(p - 1 if p > pos else p): v for p, v in self.odd.items() if p != pos}
+        return value
+
+    def index(self, value):
+        if not isinstance(self.packed, bytearray):
+            self.packed = bytearray(self.packed)
+        for pos, odd in self.odd.items():
+            if odd == value:
+                return pos
+        packed = _pack_uuid(value)
+        if packed is not None:
+            start = 0
+            while True:
+                found = self.packed.find(packed, start)
+                if found < 0:
+                    break
+                if found % self.WIDTH == 0 and found // self.WIDTH not in self.odd:
+                    return found // self.WIDTH
+                start = found + 1
+        raise ValueError(f"{value!r} is not in ledger")
+
+
+class Transaction:
+    """Row view over one position of a TransactionLedger.
+
+    Rows are cheap, short-lived handles; they are not valid after the ledger
+    has an earlier row removed.
+    """
+
+    __slots__ = ('_ledger', '_pos')
+
+    def __init__(self, ledger, pos):
+        self._ledger = ledger
+        self._pos = pos
+
+    def __getitem__(self, key):
+        value = self._ledger._field(self._pos, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._ledger._field(self._pos, key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key):
+        return self._ledger._field(self._pos, key) is not _MISSING
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        value = self._ledger._field(self._pos, key)
+        if value is _MISSING:
+            raise AttributeError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._ledger._set_field(self._pos, key, value)
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self._ledger._set_field(self._pos, key, value)
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    @property
+    def timestamp_dt(self):
+        seconds = self._ledger.timestamps[self._pos]
+        if seconds == NO_TIMESTAMP:
+            return None
+        return epoch_to_datetime(seconds)
+
+    def to_dict(self):
+        return self._ledger._materialize(self._pos)
+
+    def __repr__(self):
+        return f"Transaction({self.to_dict()!r})"
+
+
+class _Missing:
+    __slots__ = ()
+
+
+_MISSING = _Missing()
+
+
+class TransactionLedger:
+    """Columnar, list-like container of a user's transactions."""
+
+    def __init__(self, transactions=()):
+        self.ids = IdColumn()
+        self.descriptions = array('I')
+        # Integer paise; rows convert back to rupees for templates and JSON.
+        self.amounts = array('q')
+        self.types = bytearray()
+        self.categories = array('H')
+        self.timestamps = array('q')
+        self.type_codes = _Codes(('income', 'expense'))
+        self.category_codes = _Codes()
+        # Descriptions repeat heavily ("Groceries", "Rent"), so they are coded too.
+        self.description_codes = _Codes()
+        # True while the columns are read-only views over a mapped sidecar.
+        self.mapped = False
+        # Keys outside the fixed columns, and raw values the columns could not
+        # hold (a malformed amount or timestamp), keyed by transaction id.
+        self.extras = {}
+        for tx in transactions:
+            self.append(tx)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def __iter__(self):
+        for pos in range(len(self.ids)):
+            yield Transaction(self, pos)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [Transaction(self, i) for i in range(*pos.indices(len(self.ids)))]
+        if pos < 0:
+            pos += len(self.ids)
+        if not 0 <= pos < len(self.ids):
+            raise IndexError('transaction index out of range')
+        return Transaction(self, pos)
+
+    def _writable(self):
+        """Copy mapped columns into private arrays before the first mutation."""
+        if not self.mapped:
+            return
+        self.ids.packed = bytearray(self.ids.packed)
+        for name in ('descriptions', 'amounts', 'categories', 'timestamps'):
+            view = getattr(self, name)
+            column = array(view.format)
+            column.frombytes(view.cast('B'))
+            setattr(self, name, column)
+        self.types = bytearray(self.types)
+        self.mapped = False
+
+    def append_pairs(self, pairs):
+        """Append a transaction given as JSON key/value pairs."""
+        self._writable()
+        tx_id = description = tx_type = category = timestamp = None
+        amount = 0
+        extra = None
+        for key, value in pairs:
+            if key == 'id':
+                tx_id = value
+            elif key == 'description':
+                description = value
+            elif key == 'amount':
+                amount = value
+            elif key == 'type':
+                tx_type = value
+            elif key == 'category':
+                category = value
+            elif key == 'timestamp':
+                timestamp = value
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = _to_plain(value)
+
+        if not isinstance(tx_id, str):
+            if tx_id is not None:
+                extra = extra or {}
+                extra['id'] = tx_id
+            tx_id = str(uuid.uuid4())
+        try:
+            paise = to_paise(amount)
+        except (TypeError, ValueError, OverflowError):
+            paise = 0
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or (paise == 0 and amount != 0):
+            extra = extra or {}
+            extra['amount'] = amount
+        seconds = parse_timestamp(timestamp)
+        if seconds == NO_TIMESTAMP and timestamp is not None:
+            extra = extra or {}
+            extra['timestamp'] = timestamp
+        if not isinstance(description, str):
+            if description is not None:
+                extra = extra or {}
+                extra['description'] = description
+            description = ''
+
+        self.ids.append(tx_id)
+        self.descriptions.append(self.description_codes.code(description))
+        self.amounts.append(paise)
+        self.types.append(self.type_codes.code(tx_type))
+        self.categories.append(self.category_codes.code(category))
+        self.timestamps.append(seconds)
+        if extra:
+            self.extras[tx_id] = extra
+
+    def append(self, tx):
+        if isinstance(tx, Transaction):
+            tx = tx.to_dict()
+        self.append_pairs(tx.items())
+
+    def extend(self, transactions):
+        for tx in transactions:
+            self.append(tx)
+
+    def totals(self):
+        """Lifetime (income, expense) in paise."""
+        income_code = self.type_codes.codes.get('income', -1)
+        expense_code = self.type_codes.codes.get('expense', -1)
+        income = expense = 0
+        for amount, tx_type in zip(self.amounts, self.types):
+            if tx_type == income_code:
+                income += amount
+            elif tx_type == expense_code:
+                expense += amount
+        return income, expense
+
+    def index_of(self, tx_id):
+        try:
+            return self.ids.index(tx_id)
+        except ValueError:
+            return -1
+
+    def find(self, tx_id):
+        pos = self.index_of(tx_id)
+        return Transaction(self, pos) if pos >= 0 else None
+
+    def pop(self, pos=-1):
+        self._writable()
+        if pos < 0:
+            pos += len(self.ids)
+        removed = self._materialize(pos)
+        tx_id = self.ids.pop(pos)
+        del self.descriptions[pos]
+        del self.amounts[pos]
+        del self.types[pos]
+        del self.categories[pos]
+        del self.timestamps[pos]
+        self.extras.pop(tx_id, None)
+        return removed
+
+    def remove_id(self, tx_id):
+        pos = self.index_of(tx_id)
+        return self.pop(pos) if pos >= 0 else None
+
+    def retain(self, keep):
+        """Drop every row whose flag in ``keep`` is false, in one pass; returns the number dropped."""
+        positions = [pos for pos, flag in enumerate(keep) if flag]
+        dropped = len(self.ids) - len(positions)
+        if not dropped:
+            return 0
+        self._writable()
+        width = IdColumn.WIDTH
+        ids = IdColumn()
+        extras = {}
+        for new_pos, pos in enumerate(positions):
+            ids.packed += self.ids.packed[pos * width:(pos + 1) * width]
+            odd = self.ids.odd.get(pos) if self.ids.odd else None
+            if odd is not None:
+                ids.odd[new_pos] = odd
+            if self.extras:
+                tx_id = self.ids[pos]
+                if tx_id in self.extras:
+                    extras[tx_id] = self.extras[tx_id]
+        for name in ('descriptions', 'amounts', 'categories', 'timestamps'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[pos] for pos in positions]))
+        self.types = bytearray(self.types[pos] for pos in positions)
+        self.ids = ids
+        self.extras = extras
+        return dropped
+
+    def _field(self, pos, key):
+        extra = self.extras.get(self.ids[pos]) if self.extras else None
+        if extra is not None and key in extra:
+            return extra[key]
+        if key == 'id':
+            return self.ids[pos]
+        if key == 'description':
+            return self.description_codes.names[self.descriptions[pos]]
+        if key == 'amount':
+            return from_paise(self.amounts[pos])
+        if key == 'type':
+            name = self.type_codes.names[self.types[pos]]
+            return _MISSING if name is None else name
+        if key == 'category':
+            name = self.category_codes.names[self.categories[pos]]
+            return _MISSING if name is None else name
+        if key == 'timestamp':
+            seconds = self.timestamps[pos]
+            if seconds == NO_TIMESTAMP:
+                return _MISSING
+            return epoch_to_datetime(seconds).strftime(TIMESTAMP_FORMAT)
+        return _MISSING
+
+    def _set_field(self, pos, key, value):
+        self._writable()
+        tx_id = self.ids[pos]
+        extra = self.extras.get(tx_id)
+        if extra is not None:
+            extra.pop(key, None)
+        if key == 'id':
+            if extra is not None:
+                self.extras[value] = self.extras.pop(tx_id)
+            self.ids[pos] = value
+        elif key == 'description':
+            self.descriptions[pos] = self.description_codes.code(value)
+        elif key == 'amount':
+            self.amounts[pos] = to_paise(value)
+        elif key == 'type':
+            self.types[pos] = self.type_codes.code(value)
+        elif key == 'category':
+            self.categories[pos] = self.category_codes.code(value)
+        elif key == 'timestamp':
+            seconds = parse_timestamp(value)
+            self.timestamps[pos] = seconds
+            if seconds == NO_TIMESTAMP:
+                self.extras.setdefault(tx_id, {})['timestamp'] = value
+        else:
+            self.extras.setdefault(tx_id, {})[key] = value
+        if tx_id in self.extras and not self.extras[tx_id]:
+            del self.extras[tx_id]
+
+    def _materialize(self, pos):
+        tx = {}
+        for key in COLUMN_FIELDS:
+            value = self._field(pos, key)
+            if value is not _MISSING:
+                tx[key] = value
+        extra = self.extras.get(self.ids[pos])
+        if extra:
+            tx.update(extra)
+        return tx
+
+    def to_dicts(self):
+        for pos in range(len(self.ids)):
+            yield self._materialize(pos)
+
+    def write_json(self, f, indent=4, level=1):
+        """Stream the ledger as a JSON array, one transaction at a time."""
+        outer = ' ' * (indent * level)
+        inner = outer + ' ' * indent
+        if not self.ids:
+            f.write('[]')
+            return
+        f.write('[')
+        separator = '\n'
+        for tx in self.to_dicts():
+            f.write(separator)
+            f.write(inner)
+            f.write(json.dumps(tx, indent=indent).replace('\n', '\n' + inner))
+            separator = ',\n'
+        f.write('\n' + outer + ']')
+
+
+class _PairList(list):
+    """JSON object decoded as its key/value pairs, without building a dict."""
+
+    __slots__ = ()
+
+
+def _to_plain(value):
+    if isinstance(value, _PairList):
+        return {key: _to_plain(item) for key, item in value}
+    if isinstance(value, list):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+class _ChunkReader:
+    """Incremental JSON value reader over a text file."""
+
+    def __init__(self, f, decoder):
+        self.f = f
+        self.decoder = decoder
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of input."""
+        while True:
+            buf, pos, end = self.buf, self.pos, len(self.buf)
+            while pos < end and buf[pos] in ' \t\r\n':
+                pos += 1
+            self.pos = pos
+            if pos < end:
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        if self.peek() not in '{["':
+            # Numbers and literals have no closing token, so buffer past one.
+            while not _SCALAR_END.search(self.buf, self.pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+
+def _read_transactions(reader):
+    ledger = TransactionLedger()
+    decoder = json.JSONDecoder(object_pairs_hook=_PairList)
+    element_reader = reader.decoder
+    reader.decoder = decoder
+    try:
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return ledger
+        while True:
+            if reader.peek() != '{':
+                raise json.JSONDecodeError("Expecting transaction object", reader.buf, reader.pos)
+            ledger.append_pairs(reader.value())
+            if reader.peek() == ',':
+                reader.pos += 1
+                continue
+            reader.expect(']')
+            return ledger
+    finally:
+        reader.decoder = element_reader
+
+
+def load_document(path, sidecar=None):
+    """Stream-parse a user data file into a dict whose transactions are a ledger.
+
+    With ``sidecar`` set, a matching binary sidecar is mapped instead of
+    parsing, and a missing or stale one is rebuilt after parsing.
+    """
+    if sidecar:
+        document = load_sidecar(sidecar, path)
+        if document is not None:
+            return document
+    document = _parse_document(path)
+    if sidecar:
+        try:
+            write_sidecar(document, sidecar, path)
+        except OSError as e:
+            print(f"Could not write ledger sidecar {sidecar}: {e}")
+    return document
+
+
+def _parse_document(path):
+    with open(path, 'r') as f:
+        reader = _ChunkReader(f, json.JSONDecoder())
+        reader.expect('{')
+        document = {}
+        if reader.peek() == '}':
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError("Expecting property name", reader.buf, reader.pos)
+                reader.expect(':')
+                if key == 'transactions' and reader.peek() == '[':
+                    document[key] = _read_transactions(reader)
+                else:
+                    document[key] = reader.value()
+                if reader.peek() == ',':
+                    reader.pos += 1
+                    continue
+                reader.expect('}')
+                break
+        if reader.peek() != '':
+            raise json.JSONDecodeError("Extra data", reader.buf, reader.pos)
+    if not isinstance(document.get('transactions'), TransactionLedger):
+        document['transactions'] = TransactionLedger(document.get('transactions') or [])
+    return document
+
+
+def replacement_mode(path):
+    """Permission bits for a file about to replace ``path``.
+
+    ``tempfile.mkstemp`` creates files as 0600 and ``os.replace`` keeps
+    that, so an atomic save would otherwise tighten the file's mode. Keep
+    the existing file's mode, or use what a plain ``open`` would give.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def dump_document(document, path, indent=4, sidecar=None):
+    """Atomically write a user data document, streaming its transaction ledger."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.user_data-', suffix='.json', dir=directory)
+    pad = ' ' * indent
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write('{')
+            separator = '\n'
+            for key, value in document.items():
+                f.write(separator + pad + json.dumps(key) + ': ')
+                if isinstance(value, TransactionLedger):
+                    value.write_json(f, indent=indent, level=1)
+                else:
+                    f.write(json.dumps(value, indent=indent, default=_json_default).replace('\n', '\n' + pad))
+                separator = ',\n'
+            f.write('\n}' if document else '}')
+        os.chmod(tmp_path, replacement_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if sidecar:
+        write_sidecar(document, sidecar, path)
+
+
+def _json_default(value):
+    if isinstance(value, Transaction):
+        return value.to_dict()
+    if isinstance(value, TransactionLedger):
+        return list(value.to_dicts())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Binary sidecar ------------------------------------------------------------
+#
+# An optional ``.ledger`` file next to user_data.json holding the same ledger
+# as fixed-width columns, so a cold process can mmap it and read amounts and
+# timestamps straight through memoryviews instead of parsing JSON. The JSON
+# file stays the source of truth: the header records its size and mtime, and
+# a sidecar that does not match is ignored and rebuilt.
+#
+# Layout: header, then one 8-byte-aligned section per column (packed ids,
+# description codes, amounts, type codes, category codes, timestamps) and a
+# final JSON string table with the code names, odd ids, extras and the rest
+# of the user document.
+
+SIDECAR_MAGIC = b'RTLEDGER'
+SIDECAR_VERSION = 2
+
+# magic, version, byteorder flag, count, json size, json mtime_ns, then
+# (offset, length) for the seven sections.
+_SIDECAR_HEADER = struct.Struct('<8sIIQQq' + 'QQ' * 7)
+
+_SIDECAR_COLUMNS = (
+    ('ids', 'B'),
+    ('descriptions', 'I'),
+    ('amounts', 'q'),
+    ('types', 'B'),
+    ('categories', 'H'),
+    ('timestamps', 'q'),
+)
+
+_BYTEORDER_FLAG = 1 if sys.byteorder == 'little' else 2
+
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.ledger'
+
+
+def _column_bytes(ledger, name):
+    if name == 'ids':
+        return ledger.ids.packed
+    return getattr(ledger, name)
+
+
+def write_sidecar(document, path, source_path):
+    """Write the binary sidecar for ``document`` as saved at ``source_path``."""
+    ledger = document.get('transactions')
+    if not isinstance(ledger, TransactionLedger):
+        ledger = TransactionLedger(ledger or [])
+    source = os.stat(source_path)
+    table = {
+        'types': ledger.type_codes.names,
+        'categories': ledger.category_codes.names,
+        'descriptions': ledger.description_codes.names,
+        'odd_ids': sorted(ledger.ids.odd.items()),
+        'extras': ledger.extras,
+        'document': {key: value for key, value in document.items() if key != 'transactions'},
+    }
+    strings = json.dumps(table, default=_json_default).encode('utf-8')
+
+    sections = []
+    offset = _SIDECAR_HEADER.size
+    payloads = [_column_bytes(ledger, name) for name, _ in _SIDECAR_COLUMNS] + [strings]
+    for payload in payloads:
+        offset = (offset + 7) & ~7
+        length = memoryview(payload).nbytes
+        sections.append((offset, length))
+        offset += length
+
+    header = _SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, _BYTEORDER_FLAG, len(ledger),
+                                  source.st_size, source.st_mtime_ns,
+                                  *[value for section in sections for value in section])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.user_data-', suffix='.ledger', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for (section_offset, _), payload in zip(sections, payloads):
+                f.write(bytes(section_offset - f.tell()))
+                f.write(payload)
+        os.chmod(tmp_path, replacement_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_sidecar(path, source_path):
+    """Map a sidecar into a document, or return None if missing or stale."""
+    try:
+        source = os.stat(source_path)
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mapped) < _SIDECAR_HEADER.size:
+        return None
+    header = _SIDECAR_HEADER.unpack_from(mapped, 0)
+    magic, version, byteorder, count, json_size, json_mtime_ns = header[:6]
+    if (magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or byteorder != _BYTEORDER_FLAG
+            or json_size != source.st_size or json_mtime_ns != source.st_mtime_ns):
+        return None
+    sections = [header[6 + 2 * i:8 + 2 * i] for i in range(len(_SIDECAR_COLUMNS) + 1)]
+    if any(offset + length > len(mapped) for offset, length in sections):
+        return None
+
+    view = memoryview(mapped)
+    ledger = TransactionLedger()
+    for (name, typecode), (offset, length) in zip(_SIDECAR_COLUMNS, sections):
+        column = view[offset:offset + length].cast(typecode)
+        if name == 'ids':
+            ledger.ids.packed = column
+        else:
+            setattr(ledger, name, column)
+    ledger.mapped = True
+    if len(ledger.ids) != count or len(ledger.timestamps) != count:
+        return None
+
+    offset, length = sections[-1]
+    table = json.loads(bytes(view[offset:offset + length]).decode('utf-8'))
+    ledger.type_codes = _Codes(table['types'])
+    ledger.category_codes = _Codes(table['categories'])
+    ledger.description_codes = _Codes(table['descriptions'])
+    ledger.ids.odd = {pos: tx_id for pos, tx_id in table['odd_ids']}
+    ledger.extras = table['extras']
+
+    document = table['document']
+    document['transactions'] = ledger
+    return document
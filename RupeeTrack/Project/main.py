@@ -2,34 +2,81 @@ import os
 import uuid
 import json
 import datetime
+import bisect
 import csv
 import io
 import re
-from flask import (Flask, request, redirect, url_for, session,
-                   render_template, flash, make_response, jsonify, g)
-import locale
+import threading
+import functools
+import hmac
+import math
+from flask import (Flask, Response, request, redirect, url_for, session,
+                   render_template, flash, make_response, jsonify, g,
+                   abort, send_from_directory, has_request_context)
+
+try:
+    from . import (aggregates, archive, backups, changes, events, firebase_auth, forecast, journal, ledger, profiler,
+                   recurring, report, schema, search, sessions, suggestions)
+except ImportError:
+    import aggregates
+    import archive
+    import backups
+    import changes
+    import events
+    import firebase_auth
+    import forecast
+    import journal
+    import ledger
+    import profiler
+    import recurring
+    import report
+    import schema
+    import search
+    import sessions
+    import suggestions
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24).hex()
+app.config['SECRET_KEY'] = sessions.load_secret_key(app.instance_path)
+app.config['SESSION_DB'] = os.environ.get('RUPEETRACK_SESSION_DB', os.path.join(app.instance_path, 'sessions.db'))
+app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(seconds=sessions.SESSION_LIFETIME)
+app.session_interface = sessions.ServerSessionInterface(sessions.SessionStore(app.config['SESSION_DB']))
+app.config['ADMIN_TOKEN'] = os.environ.get('RUPEETRACK_ADMIN_TOKEN')
+app.config['BINARY_LEDGER'] = os.environ.get('RUPEETRACK_BINARY_LEDGER', '').lower() in ('1', 'true', 'yes')
+app.config['FIREBASE_PROJECT_ID'] = os.environ.get('FIREBASE_PROJECT_ID', 'rupeetrack-1bae2')
+app.config['ARCHIVE_CLOSED_YEARS'] = os.environ.get('RUPEETRACK_ARCHIVE_CLOSED_YEARS', '').lower() in ('1', 'true', 'yes')
+# Seconds between backup snapshots; 0 turns scheduled backups off.
+app.config['BACKUP_INTERVAL'] = int(os.environ.get('RUPEETRACK_BACKUP_INTERVAL', 0))
+
+profiler.init_app(app)
 
 DEVELOPER_OVERRIDE_BUDGET_LOCK = False
 
 USER_DATA_FILE = 'user_data.json'
 
-try:
-    locale.setlocale(locale.LC_ALL, 'en_IN.utf8')
-except locale.Error:
-    try:
-        locale.setlocale(locale.LC_ALL, 'English_India.1252')
-    except locale.Error:
-        print("Warning: Could not set locale for currency formatting.")
+def format_indian_number(value):
+    text = "%.2f" % value
+    if not math.isfinite(value):
+        return text
+    sign = ''
+    if text.startswith('-'):
+        sign, text = '-', text[1:]
+    whole, fraction = text.split('.')
+    number = int(whole)
+    if number < 1000:
+        return f"{sign}{whole}.{fraction}"
+    number, thousands = divmod(number, 1000)
+    groups = [f"{thousands:03d}"]
+    while number >= 100:
+        number, pair = divmod(number, 100)
+        groups.append(f"{pair:02d}")
+    groups.append(str(number))
+    return sign + ",".join(reversed(groups)) + "." + fraction
 
 @app.template_filter('currencyformat')
 def currencyformat_filter(value):
-    try:
-        return locale.format_string("%.2f", value, grouping=True)
-    except (TypeError, ValueError):
+    if not isinstance(value, (int, float)):
         return value
+    return format_indian_number(value)
 
 @app.template_filter('comma_format')
 def comma_format_filter(value):
@@ -40,62 +87,261 @@ def comma_format_filter(value):
     except (TypeError, ValueError):
         return value
 
-@app.template_filter('format_datetime')
-def format_datetime_filter(value, format='%B %d, %Y %I:%M %p'):
-    if not value:
-        return ""
+@functools.lru_cache(maxsize=4096)
+def _format_datetime(value, format):
     try:
         dt_object = datetime.datetime.fromisoformat(value)
         return dt_object.strftime(format)
     except (ValueError, TypeError):
         return value
 
+@app.template_filter('format_datetime')
+def format_datetime_filter(value, format='%B %d, %Y %I:%M %p'):
+    if not value:
+        return ""
+    if not isinstance(value, str):
+        return value
+    return _format_datetime(value, format)
+
 CATEGORIES = ["Food", "Transport", "Salary", "Bills", "Entertainment", "Housing"]
 
-DEFAULT_USER_DATA_STRUCTURE = {
-    "name": "Guest User",
-    "email": "guest@example.com",
-    "transactions": [],
-    "budget": {
-        "monthly": 0,
-        "categories": {},
-        "history": [],
-        "last_updated": None,
-        "change_history": []
-    },
-    "settings": {
-        "show_presets": False,
-        "smart_suggestions": True,
-        "show_confirmations": True
-    },
-    "journal_entries": []
-}
+def ledger_sidecar_file():
+    if not app.config.get('BINARY_LEDGER'):
+        return None
+    return ledger.sidecar_path(USER_DATA_FILE)
+
+def journal_store():
+    return journal.store_for(USER_DATA_FILE)
+
+def change_log():
+    return changes.log_for(USER_DATA_FILE, seed=change_log_seed)
+
+def change_log_seed(user=None):
+    # Every record as it is now; the first entries of a new change log.
+    if user is None:
+        user = load_user_data_from_json()
+    transactions = user.get('transactions', [])
+    # A document built in code (benchmark.py, imports) may still hold a plain list.
+    for tx in transactions.to_dicts() if isinstance(transactions, ledger.TransactionLedger) else map(dict, transactions):
+        yield 'transaction', tx['id'], tx
+    for goal_id, history in user.get('goal_transactions', {}).items():
+        for entry in history:
+            yield 'goal_transaction', entry['id'], dict(entry, goal_id=goal_id)
+    for entry in journal_store().entries():
+        yield 'journal_entry', entry['id'], entry
+    yield from changes.document_records(user)
 
 def load_user_data_from_json():
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as f:
-            try:
-                data = json.load(f)
-                merged_data = DEFAULT_USER_DATA_STRUCTURE.copy()
-                merged_data.update(data)
-                return merged_data
-            except json.JSONDecodeError:
-                print(f"Error decoding JSON from {USER_DATA_FILE}. Using default data.")
-                return DEFAULT_USER_DATA_STRUCTURE.copy()
-    return DEFAULT_USER_DATA_STRUCTURE.copy()
-
-def save_user_data_to_json(user_data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(user_data, f, indent=4)
+    """The user document, in the current schema (see ``schema``)."""
+    if not os.path.exists(USER_DATA_FILE):
+        return schema.new_document()
+    try:
+        user_data = ledger.load_document(USER_DATA_FILE, sidecar=ledger_sidecar_file())
+    except json.JSONDecodeError:
+        print(f"Error decoding JSON from {USER_DATA_FILE}. Using default data.")
+        return schema.new_document()
+    if schema.migrate(user_data, journal_store()):
+        # Upgrade the file once, so no later load repeats the migrations.
+        ledger.dump_document(user_data, USER_DATA_FILE, sidecar=ledger_sidecar_file())
+    return user_data
+
+def save_user_data_to_json(user_data, base_version=None):
+    if base_version is None and has_request_context():
+        base_version = g.get('data_version')
+    try:
+        ledger.dump_document(user_data, USER_DATA_FILE, sidecar=ledger_sidecar_file())
+    except Exception:
+        for index in derived_indexes:
+            index.invalidate()
+        change_log().discard()
+        raise
+    publish_live_update(user_data, advance_data_version(base_version, user_data))
+
+def advance_data_version(base_version, user=None):
+    new_version = current_data_version()
+    change_log().flush(user)
+    for index in derived_indexes:
+        index.advance(base_version, new_version)
+    if has_request_context():
+        g.data_version = new_version
+    aggregate_cache.notify_mutation()
+    return new_version
+
+def current_data_version():
+    try:
+        stat = os.stat(USER_DATA_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, journal_store().version())
+
+aggregate_cache = aggregates.AggregateCache(load_user_data_from_json, current_data_version)
+
+search_index = search.SearchIndex()
+
+suggestion_engine = suggestions.SuggestionEngine()
+
+balance_cache = aggregates.BalanceCache()
+
+budget_forecast = forecast.BudgetForecast()
+
+# Kept in step with user_data.json by the routes that write it.
+derived_indexes = (search_index, suggestion_engine, balance_cache, budget_forecast)
+
+def track_added_transaction(base_version, tx):
+    change_log().stage('transaction', tx['id'], tx)
+    search_index.index_transaction(base_version, tx)
+    suggestion_engine.add_transaction(base_version, tx)
+    balance_cache.apply_transaction(base_version, tx)
+    budget_forecast.apply_transaction(base_version, tx)
+
+def track_removed_transaction(base_version, tx):
+    change_log().stage('transaction', tx['id'])
+    search_index.remove_transaction(base_version, tx['id'])
+    suggestion_engine.remove_transaction(base_version, tx)
+    balance_cache.apply_transaction(base_version, tx, -1)
+    budget_forecast.apply_transaction(base_version, tx, -1)
+
+event_broker = events.EventBroker()
+
+def publish_live_update(user, version):
+    """Push balance, this month's category spend and goal progress to open /events streams."""
+    if not event_broker.has_subscribers():
+        return
+    # Both caches were kept current by the write that got us here.
+    income, expenses, allocated = balance_cache.totals(user, version)
+    month = budget_forecast.report(user, version)
+    event_broker.publish('update', {
+        'seq': change_log().last_seq(),
+        'total_income': ledger.from_paise(income),
+        'total_expenses': ledger.from_paise(expenses),
+        'current_balance': ledger.from_paise(income - expenses),
+        'available_balance': ledger.from_paise(income - expenses - allocated),
+        'month': datetime.date.today().strftime('%Y-%m'),
+        'month_expenses': month['total']['spent'],
+        'category_expenses': {name: category['spent'] for name, category in month['categories'].items()
+                              if category['spent']},
+        'goals': [{'id': goal['id'],
+                   'saved_amount': goal.get('saved_amount', 0),
+                   'target_amount': goal.get('target_amount', 0)} for goal in user.get('goals', [])]
+    })
+
+def publish_chart_update(snapshot):
+    """Push the dashboard's monthly, cash-flow and daily chart series to open /events streams.
+
+    Runs on the aggregate worker once the snapshot after a write is ready,
+    since a backdated transaction can change any month or day on the charts.
+    """
+    if not event_broker.has_subscribers():
+        return
+    monthly_summary = snapshot['monthly_summary']
+    event_broker.publish('charts', {
+        'monthly_summary': monthly_summary,
+        'cash_flow': {month: data['income'] - data['expense'] for month, data in monthly_summary.items()},
+        'daily_summary': snapshot['daily_summary']
+    })
+
+aggregate_cache.on_refresh = publish_chart_update
+
+# Serialises goal contributions so two concurrent deposits cannot both pass
+# the available-balance check.
+contribution_lock = threading.Lock()
+
+def materialize_recurring_transactions():
+    version = current_data_version()
+    user = load_user_data_from_json()
+    created = recurring.materialize(user)
+    if not created:
+        return 0
+    for tx in created:
+        track_added_transaction(version, tx)
+    save_user_data_to_json(user, base_version=version)
+    return len(created)
+
+def archive_closed_years():
+    version = current_data_version()
+    user = load_user_data_from_json()
+    years = archive.archive_closed_years(user, USER_DATA_FILE)
+    if not years:
+        return []
+    # Every derived index drops the archived rows on its next rebuild.
+    for index in derived_indexes:
+        index.invalidate()
+    save_user_data_to_json(user, base_version=version)
+    return years
+
+def run_daily_jobs():
+    materialize_recurring_transactions()
+    if app.config.get('ARCHIVE_CLOSED_YEARS'):
+        archive_closed_years()
+
+recurring_scheduler = recurring.RecurringScheduler(run_daily_jobs)
+
+def take_backup_snapshot():
+    return backups.snapshot(USER_DATA_FILE, sidecar=ledger_sidecar_file())
+
+backup_scheduler = backups.BackupScheduler(take_backup_snapshot,
+                                           app.config['BACKUP_INTERVAL'] or backups.DEFAULT_INTERVAL)
+
+def total_income_and_expenses(user):
+    """Lifetime (income, expense) in paise, including archived years."""
+    income, expenses = user.get('transactions', ledger.TransactionLedger()).totals()
+    archived_income, archived_expenses = archive.totals(user)
+    return income + archived_income, expenses + archived_expenses
+
+def archived_ledgers_for_filter(user, start_date_str, end_date_str):
+    """Segments of the archived years a start/end date filter reaches into."""
+    try:
+        start = datetime.datetime.strptime(start_date_str, "%Y-%m-%d").date() if start_date_str else None
+        end = datetime.datetime.strptime(end_date_str, "%Y-%m-%d").date() if end_date_str else None
+    except ValueError:
+        return []
+    return archive.load_range(USER_DATA_FILE, user, start, end)
 
 @app.before_request
 def before_request():
+    recurring_scheduler.start()
+    recurring_scheduler.run_if_due()
+    if app.config.get('BACKUP_INTERVAL'):
+        backup_scheduler.start()
+    g.data_version = current_data_version()
     g.user = load_user_data_from_json()
+    # Changes staged by a request that failed before saving were never made.
+    change_log().discard()
 
 @app.route("/")
 def index():
     return render_template('index.html')
 
+token_verifier = firebase_auth.TokenVerifier(app.config['FIREBASE_PROJECT_ID'],
+                                             firebase_auth.KeySet(firebase_auth.HttpJwksSource()))
+
+@app.route('/events', methods=['GET'])
+def live_events():
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    response = Response(event_broker.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/verify_token', methods=['POST'])
+def verify_token():
+    payload = request.get_json(silent=True) or {}
+    try:
+        claims = token_verifier.verify(payload.get('idToken'))
+    except firebase_auth.TokenError as e:
+        return jsonify({'success': False, 'error': str(e)}), 401
+
+    # A fresh session id on login, so one planted beforehand is never authenticated.
+    app.session_interface.regenerate(session)
+    session.permanent = True
+    session['user_id'] = claims['sub']
+    session['email'] = claims.get('email')
+    session['name'] = payload.get('displayName') or claims.get('name') or claims.get('email')
+    return jsonify({'success': True, 'user_id': claims['sub']})
+
 @app.route("/dashboard", methods=['GET'])
 def dashboard():
     user = g.user
@@ -109,14 +355,6 @@ def dashboard():
     
     print(f"Current server time (now): {now}")
     
-    if 'budget' not in user or not isinstance(user.get('budget'), dict):
-        user['budget'] = {
-            'monthly': user.get('budget', 0) if isinstance(user.get('budget'), int) else 0,
-            'categories': {},
-            'history': [],
-            'last_updated': None,
-            'change_history': []
-        }
     monthly_budget = user['budget'].get('monthly', 0)
 
     pending_category_budgets = 0
@@ -126,17 +364,16 @@ def dashboard():
     _, current_month_category_expenses = calculate_current_month_expenses(user)
 
     for category, budget_amount in user['budget'].get('categories', {}).items():
-        total_category_allocated_budget += budget_amount
-        if budget_amount > 0:
-            spent_amount = current_month_category_expenses.get(category, 0)
-            if spent_amount >= budget_amount:
-                filled_category_budgets += budget_amount
+        budget_paise = ledger.to_paise(budget_amount)
+        total_category_allocated_budget += budget_paise
+        if budget_paise > 0:
+            spent_paise = current_month_category_expenses.get(category, 0)
+            if spent_paise >= budget_paise:
+                filled_category_budgets += budget_paise
             else:
-                pending_category_budgets += (budget_amount - spent_amount)
+                pending_category_budgets += (budget_paise - spent_paise)
 
-    unallocated_budget = monthly_budget - total_category_allocated_budget
-    if unallocated_budget < 0:
-        unallocated_budget = 0
+    unallocated_budget = max(ledger.to_paise(monthly_budget) - total_category_allocated_budget, 0)
 
     filter_category = request.args.get('filter_category')
     filter_type = request.args.get('filter_type')
@@ -150,16 +387,12 @@ def dashboard():
         'end_date': end_date_str
     }
     
-    for tx in transactions_all:
-        try:
-            if 'timestamp' in tx:
-                tx['timestamp_dt'] = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            else:
-                tx['timestamp_dt'] = datetime.datetime.now()
-        except:
-            tx['timestamp_dt'] = datetime.datetime.now()
-
     transactions_filtered = transactions_all
+    archived_segments = archived_ledgers_for_filter(user, start_date_str, end_date_str)
+    if archived_segments:
+        transactions_filtered = list(transactions_all)
+        for segment in archived_segments:
+            transactions_filtered.extend(segment)
     
     if filter_category and transactions_filtered:
         transactions_filtered = [tx for tx in transactions_filtered if tx.get('category') == filter_category]
@@ -168,219 +401,120 @@ def dashboard():
     if start_date_str and transactions_filtered:
         try:
             start_date = datetime.datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            transactions_filtered = [tx for tx in transactions_filtered if tx.get('timestamp_dt', datetime.datetime.now()).date() >= start_date]
+            transactions_filtered = [tx for tx in transactions_filtered if (tx.timestamp_dt or now).date() >= start_date]
         except:
             pass
     if end_date_str and transactions_filtered:
         try:
             end_date = datetime.datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            transactions_filtered = [tx for tx in transactions_filtered if tx.get('timestamp_dt', datetime.datetime.now()).date() <= end_date]
+            transactions_filtered = [tx for tx in transactions_filtered if (tx.timestamp_dt or now).date() <= end_date]
         except:
             pass
 
     if transactions_filtered:
         try:
-            transactions_sorted = sorted(transactions_filtered, key=lambda x: x.get('timestamp_dt', datetime.datetime.now()), reverse=True)
+            transactions_sorted = sorted(transactions_filtered, key=lambda x: x.timestamp_dt or now, reverse=True)
         except:
             transactions_sorted = transactions_filtered
     else:
         transactions_sorted = []
     
-    balance = 0
-    for tx in transactions_all:
-        try:
-            if tx.get('type') == 'income':
-                balance += float(tx.get('amount', 0))
-            elif tx.get('type') == 'expense':
-                balance -= float(tx.get('amount', 0))
-        except:
-            pass
-
-    total_income_all = 0
-    total_expenses_all = 0
-    
-    for tx in transactions_all:
-        try:
-            amount = float(tx.get('amount', 0))
-            if tx.get('type') == 'income':
-                total_income_all += amount
-            elif tx.get('type') == 'expense':
-                total_expenses_all += amount
-        except:
-            pass
-    
-    current_balance_all = total_income_all - total_expenses_all
+    total_income_all, total_expenses_all = total_income_and_expenses(user)
 
     recent_transactions = transactions_sorted[:5]
 
-    monthly_summary = get_monthly_summary(transactions_all)
-    
-    _, current_month_category_expenses = calculate_current_month_expenses(user)
+    snapshot = aggregate_cache.get(user, g.data_version)
+    monthly_summary = snapshot['monthly_summary']
 
     cash_flow_data = {month: data["income"] - data["expense"] for month, data in monthly_summary.items()}
 
-    daily_summary = get_daily_summary(transactions_all)
+    daily_summary = snapshot['daily_summary']
 
     return render_template('dashboard.html', 
                            user=user,
-                           current_balance=current_balance_all, 
-                           total_income=total_income_all,
-                           total_expenses=total_expenses_all,
+                           current_balance=ledger.from_paise(total_income_all - total_expenses_all), 
+                           total_income=ledger.from_paise(total_income_all),
+                           total_expenses=ledger.from_paise(total_expenses_all),
                            transactions=transactions_sorted, 
                            categories=CATEGORIES, 
                            filters=filters, 
                            recent_transactions=recent_transactions,
                            category_budgets=user['budget'].get('categories', {}),
                            monthly_budget=monthly_budget,
-                           pending_category_budgets=pending_category_budgets,
-                           filled_category_budgets=filled_category_budgets,
-                           total_category_allocated_budget=total_category_allocated_budget,
-                           unallocated_budget=unallocated_budget,
+                           pending_category_budgets=ledger.from_paise(pending_category_budgets),
+                           filled_category_budgets=ledger.from_paise(filled_category_budgets),
+                           total_category_allocated_budget=ledger.from_paise(total_category_allocated_budget),
+                           unallocated_budget=ledger.from_paise(unallocated_budget),
                            user_budget=monthly_budget,
-                           monthly_expenses=total_expenses_all,
+                           monthly_expenses=ledger.from_paise(total_expenses_all),
                            monthly_summary_json=json.dumps(monthly_summary),
-                           expense_breakdown_json=json.dumps(current_month_category_expenses),
+                           expense_breakdown_json=json.dumps({category: ledger.from_paise(paise) for category, paise in current_month_category_expenses.items()}),
                            cash_flow_json=json.dumps(cash_flow_data),
                            daily_summary_json=json.dumps(daily_summary))
 
-def get_monthly_summary(transactions):
-    monthly_data = {}
-    now = datetime.datetime.now()
-    
-    for i in range(12):
-        month_date = now - datetime.timedelta(days=30 * i)
-        month_key = month_date.strftime("%Y-%m")
-        monthly_data[month_key] = {"income": 0, "expense": 0, "net_flow": 0}
-
-    for tx in transactions:
-        try:
-            tx_date = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            month_key = tx_date.strftime("%Y-%m")
-            
-            if month_key in monthly_data:
-                amount = float(tx.get('amount', 0))
-                tx_type = tx.get('type')
-                
-                if tx_type == 'income':
-                    monthly_data[month_key]["income"] += amount
-                    monthly_data[month_key]["net_flow"] += amount
-                elif tx_type == 'expense':
-                    monthly_data[month_key]["expense"] += amount
-                    monthly_data[month_key]["net_flow"] -= amount
-        except:
-            continue
-            
-    sorted_monthly_data = dict(sorted(monthly_data.items()))
-    
-    return sorted_monthly_data
-
-def get_daily_summary(transactions):
-    daily_data = {}
-    now = datetime.datetime.now()
-    
-    for i in range(30):
-        day_date = now - datetime.timedelta(days=i)
-        day_key = day_date.strftime("%Y-%m-%d")
-        daily_data[day_key] = {"income": 0, "expense": 0}
-
-    for tx in transactions:
-        try:
-            tx_date = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            day_key = tx_date.strftime("%Y-%m-%d")
-            
-            if day_key in daily_data:
-                amount = float(tx.get('amount', 0))
-                tx_type = tx.get('type')
-                
-                if tx_type == 'income':
-                    daily_data[day_key]["income"] += amount
-                elif tx_type == 'expense':
-                    daily_data[day_key]["expense"] += amount
-        except:
-            continue
-            
-    sorted_daily_data = dict(sorted(daily_data.items()))
-    
-    return sorted_daily_data
-
 @app.route('/transactions', methods=['GET'])
 def transactions_page():
     user = g.user
     
-    if 'settings' not in user:
-        user['settings'] = {
-            'show_presets': False,
-            'smart_suggestions': True,
-            'show_confirmations': True
-        }
-    
     transactions_all = user.get('transactions', [])
-    
-    for tx in transactions_all:
-        try:
-            if 'timestamp' in tx:
-                tx['timestamp_dt'] = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            else:
-                tx['timestamp_dt'] = datetime.datetime.now()
-        except:
-            tx['timestamp_dt'] = datetime.datetime.now()
+    now = datetime.datetime.now()
 
     if transactions_all:
         try:
-            transactions_sorted = sorted(transactions_all, key=lambda x: x.get('timestamp_dt', datetime.datetime.now()), reverse=True)
+            transactions_sorted = sorted(transactions_all, key=lambda x: x.timestamp_dt or now, reverse=True)
         except:
             transactions_sorted = transactions_all
     else:
         transactions_sorted = []
 
-    total_income = 0
-    total_expenses = 0
-    
-    for tx in transactions_all:
-        try:
-            amount = float(tx.get('amount', 0))
-            if tx.get('type') == 'income':
-                total_income += amount
-            elif tx.get('type') == 'expense':
-                total_expenses += amount
-        except:
-            pass
-    
-    current_balance = total_income - total_expenses
+    total_income, total_expenses = total_income_and_expenses(user)
 
     return render_template('transactions.html', 
                            user=user,
                            transactions=transactions_sorted, 
                            categories=CATEGORIES, 
-                           total_income=total_income,
-                           total_expenses=total_expenses,
-                           current_balance=current_balance,
+                           total_income=ledger.from_paise(total_income),
+                           total_expenses=ledger.from_paise(total_expenses),
+                           current_balance=ledger.from_paise(total_income - total_expenses),
                            transaction_to_edit_json='null')
 
+def current_month_range():
+    month_start = datetime.datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_end = (month_start + datetime.timedelta(days=32)).replace(day=1)
+    return ledger.datetime_to_epoch(month_start), ledger.datetime_to_epoch(month_end)
+
+def calculate_current_month_income(user):
+    transactions = user.get('transactions', [])
+    month_start_ts, month_end_ts = current_month_range()
+    income_code = transactions.type_codes.codes.get('income', -1)
+    
+    return sum(amount for ts, amount, tx_type in zip(transactions.timestamps, transactions.amounts, transactions.types)
+               if tx_type == income_code and month_start_ts <= ts < month_end_ts)
+
 def calculate_current_month_expenses(user):
-    now = datetime.datetime.now()
     transactions = user.get('transactions', [])
+    month_start_ts, month_end_ts = current_month_range()
+    expense_code = transactions.type_codes.codes.get('expense', -1)
+    category_names = transactions.category_codes.names
     
     monthly_expenses = 0
-    category_expenses = {}
+    category_code_expenses = {}
     
-    for tx in transactions:
-        try:
-            tx_date = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            if (tx_date.month == now.month and 
-                tx_date.year == now.year and 
-                tx.get('type') == 'expense'):
-                
-                amount = float(tx.get('amount', 0))
-                monthly_expenses += amount
-                
-                category = tx.get('category', 'Other')
-                category_expenses[category] = category_expenses.get(category, 0) + amount
-        except:
-            continue
+    for ts, amount, tx_type, category in zip(transactions.timestamps, transactions.amounts, transactions.types, transactions.categories):
+        if tx_type == expense_code and month_start_ts <= ts < month_end_ts:
+            monthly_expenses += amount
+            category_code_expenses[category] = category_code_expenses.get(category, 0) + amount
+    
+    category_expenses = {}
+    for code, amount in category_code_expenses.items():
+        category = category_names[code] if category_names[code] is not None else 'Other'
+        category_expenses[category] = category_expenses.get(category, 0) + amount
     
     return monthly_expenses, category_expenses
 
+def calculate_available_balance(user):
+    return balance_cache.available(user, g.data_version)
+
 @app.route('/add_transaction', methods=['POST'])
 def add_transaction():
     user = g.user
@@ -403,7 +537,7 @@ def add_transaction():
             return redirect(url_for('transactions_page'))
 
         try:
-            amount = float(amount_str)
+            amount = ledger.to_paise(amount_str)
             if amount <= 0:
                 flash('Amount must be positive.', 'error')
                 return redirect(url_for('transactions_page'))
@@ -411,17 +545,12 @@ def add_transaction():
             flash('Invalid amount format.', 'error')
             return redirect(url_for('transactions_page'))
 
+        rupees = ledger.from_paise
+
         if transaction_type == 'expense':
-            if 'budget' not in user or not isinstance(user.get('budget'), dict):
-                user['budget'] = {
-                    'monthly': 0,
-                    'categories': {},
-                    'history': [],
-                    'last_updated': None
-                }
-            
-            monthly_budget = user['budget'].get('monthly', 0)
+            monthly_budget = ledger.to_paise(user['budget'].get('monthly', 0))
             category_budgets = user['budget'].get('categories', {})
+            category_budget = ledger.to_paise(category_budgets.get(category, 0))
             
             if monthly_budget > 0:
                 current_monthly_expenses, current_category_expenses = calculate_current_month_expenses(user)
@@ -430,51 +559,57 @@ def add_transaction():
                 
                 if projected_monthly_expenses > monthly_budget:
                     remaining_budget = monthly_budget - current_monthly_expenses
-                    flash(f'❌ Budget Exceeded! You only have ₹{remaining_budget:.2f} remaining in your monthly budget of ₹{monthly_budget:.2f}. This expense of ₹{amount:.2f} would exceed your budget by ₹{projected_monthly_expenses - monthly_budget:.2f}.', 'error')
+                    flash(f'❌ Budget Exceeded! You only have ₹{rupees(remaining_budget):.2f} remaining in your monthly budget of ₹{rupees(monthly_budget):.2f}. This expense of ₹{rupees(amount):.2f} would exceed your budget by ₹{rupees(projected_monthly_expenses - monthly_budget):.2f}.', 'error')
                     return redirect(url_for('transactions_page'))
                 
-                if category in category_budgets and category_budgets[category] > 0:
+                if category_budget > 0:
                     current_category_expense = current_category_expenses.get(category, 0)
-                    category_budget = category_budgets[category]
                     projected_category_expense = current_category_expense + amount
                     
                     if projected_category_expense > category_budget:
                         remaining_category_budget = category_budget - current_category_expense
-                        flash(f'❌ Category Budget Exceeded! You only have ₹{remaining_category_budget:.2f} remaining in your {category} budget of ₹{category_budget:.2f}. This expense would exceed your category budget by ₹{projected_category_expense - category_budget:.2f}.', 'error')
+                        flash(f'❌ Category Budget Exceeded! You only have ₹{rupees(remaining_category_budget):.2f} remaining in your {category} budget of ₹{rupees(category_budget):.2f}. This expense would exceed your category budget by ₹{rupees(projected_category_expense - category_budget):.2f}.', 'error')
                         return redirect(url_for('transactions_page'))
                 
                 budget_usage_percentage = (projected_monthly_expenses / monthly_budget) * 100
                 if budget_usage_percentage >= 80 and budget_usage_percentage < 100:
                     remaining_budget = monthly_budget - projected_monthly_expenses
-                    flash(f'⚠️ Budget Warning! After this transaction, you will have used {budget_usage_percentage:.1f}% of your monthly budget. Only ₹{remaining_budget:.2f} remaining.', 'warning')
+                    flash(f'⚠️ Budget Warning! After this transaction, you will have used {budget_usage_percentage:.1f}% of your monthly budget. Only ₹{rupees(remaining_budget):.2f} remaining.', 'warning')
                 
-                if category in category_budgets and category_budgets[category] > 0:
+                if category_budget > 0:
                     current_category_expense = current_category_expenses.get(category, 0)
-                    category_budget = category_budgets[category]
                     projected_category_expense = current_category_expense + amount
                     category_usage_percentage = (projected_category_expense / category_budget) * 100
                     
                     if category_usage_percentage >= 80 and category_usage_percentage < 100:
                         remaining_category_budget = category_budget - projected_category_expense
-                        flash(f'⚠️ Category Warning! After this transaction, you will have used {category_usage_percentage:.1f}% of your {category} budget. Only ₹{remaining_category_budget:.2f} remaining.', 'warning')
+                        flash(f'⚠️ Category Warning! After this transaction, you will have used {category_usage_percentage:.1f}% of your {category} budget. Only ₹{rupees(remaining_category_budget):.2f} remaining.', 'warning')
 
         new_transaction = {
             "id": str(uuid.uuid4()),
             "description": description[:25],
-            "amount": amount,
+            "amount": rupees(amount),
             "type": transaction_type,
             "category": category,
             "timestamp": datetime.datetime.combine(transaction_date, datetime.datetime.now().time()).strftime("%Y-%m-%d %H:%M:%S")
         }
 
         user.setdefault('transactions', []).append(new_transaction)
+        track_added_transaction(g.data_version, new_transaction)
         save_user_data_to_json(user)
         
         if transaction_type == 'expense' and user['budget'].get('monthly', 0) > 0:
             current_monthly_expenses, _ = calculate_current_month_expenses(user)
-            monthly_budget = user['budget'].get('monthly', 0)
+            monthly_budget = ledger.to_paise(user['budget'].get('monthly', 0))
             remaining_budget = monthly_budget - current_monthly_expenses
-            flash(f'✅ Transaction added successfully! Monthly budget remaining: ₹{remaining_budget:.2f} of ₹{monthly_budget:.2f}', 'success')
+            flash(f'✅ Transaction added successfully! Monthly budget remaining: ₹{rupees(remaining_budget):.2f} of ₹{rupees(monthly_budget):.2f}', 'success')
+            
+            month_forecast = budget_forecast.report(user, g.data_version)
+            category_forecast = month_forecast['categories'].get(category)
+            if category_forecast and category_forecast['status'] == 'over':
+                flash(f'📈 Forecast: at your usual pace, {category} spending will reach ₹{category_forecast["projected"]:.2f} this month, above its ₹{category_forecast["budget"]:.2f} budget.', 'warning')
+            elif month_forecast['total']['status'] == 'over':
+                flash(f'📈 Forecast: at your usual pace, this month\'s spending will reach ₹{month_forecast["total"]["projected"]:.2f}, above your ₹{month_forecast["total"]["budget"]:.2f} budget.', 'warning')
         else:
             flash('✅ Transaction added successfully!', 'success')
             
@@ -488,12 +623,62 @@ def add_transaction():
         flash('An unexpected error occurred. Please try again.', 'error')
         return redirect(url_for('transactions_page'))
 
+@app.route('/recurring', methods=['GET'])
+def recurring_rules():
+    return jsonify(g.user.get('recurring_transactions', []))
+
+@app.route('/add_recurring', methods=['POST'])
+def add_recurring():
+    user = g.user
+    
+    try:
+        description = request.form.get('description', '').strip()
+        amount_str = request.form.get('amount')
+        transaction_type = request.form.get('type')
+        category = request.form.get('category')
+        frequency = request.form.get('frequency')
+        start_date = request.form.get('start_date')
+        end_date = request.form.get('end_date', '').strip()
+
+        if not all([description, amount_str, transaction_type, category, frequency, start_date]):
+            flash('All fields except the end date are required.', 'error')
+            return redirect(url_for('transactions_page'))
+
+        rule = recurring.new_rule(description, amount_str, transaction_type, category, frequency, start_date, end_date)
+        user.setdefault('recurring_transactions', []).append(rule)
+        save_user_data_to_json(user)
+        recurring_scheduler.run_now()
+        flash(f'🔁 Recurring {frequency} transaction "{rule["description"]}" scheduled from {rule["start_date"]}.', 'success')
+        
+    except ValueError as e:
+        flash(f'Invalid recurring transaction: {e}', 'error')
+    except Exception as e:
+        print(f"Add recurring error: {e}")
+        flash('An unexpected error occurred. Please try again.', 'error')
+    
+    return redirect(url_for('transactions_page'))
+
+@app.route('/delete_recurring/<rule_id>', methods=['POST'])
+def delete_recurring(rule_id):
+    user = g.user
+    
+    rules = user.get('recurring_transactions', [])
+    remaining = [rule for rule in rules if rule.get('id') != rule_id]
+    if len(remaining) < len(rules):
+        user['recurring_transactions'] = remaining
+        save_user_data_to_json(user)
+        flash('Recurring transaction stopped. Past entries were kept.', 'success')
+    else:
+        flash('Recurring transaction not found.', 'error')
+    
+    return redirect(url_for('transactions_page'))
+
 @app.route('/edit_transaction/<tx_id>', methods=['GET', 'POST'])
 def edit_transaction(tx_id):
     user = g.user
     transactions = user.get('transactions', [])
     
-    transaction_to_edit = next((tx for tx in transactions if tx.get('id') == tx_id), None)
+    transaction_to_edit = transactions.find(tx_id)
 
     if not transaction_to_edit:
         flash('Transaction not found!', 'error')
@@ -518,7 +703,7 @@ def edit_transaction(tx_id):
                 return redirect(url_for('edit_transaction', tx_id=tx_id))
 
             try:
-                amount = float(amount_str)
+                amount = ledger.to_paise(amount_str)
                 if amount <= 0:
                     flash('Amount must be positive.', 'error')
                     return redirect(url_for('edit_transaction', tx_id=tx_id))
@@ -526,13 +711,15 @@ def edit_transaction(tx_id):
                 flash('Invalid amount format.', 'error')
                 return redirect(url_for('edit_transaction', tx_id=tx_id))
 
+            track_removed_transaction(g.data_version, transaction_to_edit)
             transaction_to_edit.update({
                 'description': description[:25],
-                'amount': amount,
+                'amount': ledger.from_paise(amount),
                 'type': transaction_type,
                 'category': category,
                 'timestamp': datetime.datetime.combine(transaction_date, datetime.datetime.now().time()).strftime("%Y-%m-%d %H:%M:%S")
             })
+            track_added_transaction(g.data_version, transaction_to_edit)
 
             save_user_data_to_json(user)
             flash('Transaction updated successfully!', 'success')
@@ -546,7 +733,7 @@ def edit_transaction(tx_id):
             flash('An unexpected error occurred. Please try again.', 'error')
             return redirect(url_for('edit_transaction', tx_id=tx_id))
     
-    transaction_to_edit_json = json.dumps(transaction_to_edit)
+    transaction_to_edit_json = json.dumps(transaction_to_edit.to_dict())
     
     return render_template('transactions.html', 
                            user=user,
@@ -559,12 +746,6 @@ def get_progressive_lock_status(user):
     if DEVELOPER_OVERRIDE_BUDGET_LOCK:
         return False, 0, "", 0
 
-    if 'budget' not in user:
-        return False, 0, "", 0
-    
-    if 'change_history' not in user['budget']:
-        user['budget']['change_history'] = []
-    
     now = datetime.datetime.now()
     change_history = user['budget']['change_history']
     
@@ -630,14 +811,6 @@ def get_progressive_lock_status(user):
 def budgets_page():
     user = g.user
     now = datetime.datetime.now()
-    
-    if 'budget' not in user or not isinstance(user.get('budget'), dict):
-        user['budget'] = {
-            'monthly': user.get('budget', 0) if isinstance(user.get('budget'), int) else 0,
-            'categories': {},
-            'history': [],
-            'last_updated': None
-        }
 
     budget_locked, grace_period_remaining, budget_locked_reason, lock_level = get_progressive_lock_status(user)
 
@@ -651,13 +824,10 @@ def budgets_page():
                 return redirect(url_for('budgets_page'))
             
             try:
-                monthly_budget = float(request.form.get('monthly_budget', 0))
+                monthly_budget = ledger.from_paise(ledger.to_paise(request.form.get('monthly_budget', 0)))
                 if monthly_budget < 0:
                     flash('Monthly budget cannot be negative.', 'error')
                 else:
-                    if 'change_history' not in user['budget']:
-                        user['budget']['change_history'] = []
-                    
                     previous_budget = user['budget'].get('monthly', 0)
                     change_entry = {
                         'date': now.isoformat(),
@@ -694,7 +864,7 @@ def budgets_page():
         elif action == 'set_category_budget':
             try:
                 category = request.form.get('category')
-                amount = float(request.form.get('budget_amount', 0))
+                amount = ledger.from_paise(ledger.to_paise(request.form.get('budget_amount', 0)))
 
                 if category and category in CATEGORIES:
                     if amount < 0:
@@ -715,29 +885,20 @@ def budgets_page():
 
     current_budget = user['budget'].get('monthly', 0)
     category_budgets = user['budget'].get('categories', {})
-    
-    transactions = user.get('transactions', [])
-    current_month_transactions = []
-    
-    for tx in transactions:
-        try:
-            tx_date = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-            if tx_date.month == now.month and tx_date.year == now.year:
-                current_month_transactions.append(tx)
-        except:
-            pass
+    current_budget_paise = ledger.to_paise(current_budget)
 
-    monthly_income = sum(float(tx['amount']) for tx in current_month_transactions if tx['type'] == 'income')
-    monthly_expenses = sum(float(tx['amount']) for tx in current_month_transactions if tx['type'] == 'expense')
+    monthly_income = calculate_current_month_income(user)
+    monthly_expenses, month_category_expenses = calculate_current_month_expenses(user)
 
     category_expenses = {cat: 0 for cat in CATEGORIES}
-    for tx in current_month_transactions:
-        if tx['type'] == 'expense':
-            category_expenses[tx['category']] = category_expenses.get(tx['category'], 0) + float(tx['amount'])
+    for category, paise in month_category_expenses.items():
+        category_expenses[category] = ledger.from_paise(paise)
 
-    remaining_budget = current_budget - monthly_expenses
-    budget_usage_percentage = (monthly_expenses / current_budget * 100) if current_budget > 0 else 0
-    total_allocated = sum(category_budgets.values())
+    remaining_budget = ledger.from_paise(current_budget_paise - monthly_expenses)
+    budget_usage_percentage = (monthly_expenses / current_budget_paise * 100) if current_budget_paise > 0 else 0
+    total_allocated = ledger.from_paise(sum(ledger.to_paise(amount) for amount in category_budgets.values()))
+    monthly_income = ledger.from_paise(monthly_income)
+    monthly_expenses = ledger.from_paise(monthly_expenses)
 
     warning_message = ""
     warning_level = ""
@@ -761,90 +922,13 @@ def budgets_page():
         except:
             pass
 
-    processed_budget_history = []
-    
-    budget_values_over_time = {}
-    
-    budget_changes = sorted(user['budget'].get('history', []), key=lambda x: datetime.datetime.fromisoformat(x['date']))
-    
-    initial_budget = user['budget'].get('monthly', 0)
-    if budget_changes:
-        initial_budget = budget_changes[0]['previous_amount'] 
-    
-    earliest_date = None
-    if transactions:
-        earliest_tx_date = min(datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S") for tx in transactions if 'timestamp' in tx)
-        if earliest_date is None or earliest_tx_date < earliest_date:
-            earliest_date = earliest_tx_date
-    if budget_changes:
-        earliest_change_date = datetime.datetime.fromisoformat(budget_changes[0]['date'])
-        if earliest_date is None or earliest_change_date < earliest_date:
-            earliest_date = earliest_change_date
-            
-    if earliest_date is None:
-        sorted_months = []
-    else:
-        start_month = earliest_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        current_month_iter = start_month
-        all_months_dt = []
-        while current_month_iter <= end_month:
-            all_months_dt.append(current_month_iter)
-            if current_month_iter.month == 12:
-                current_month_iter = current_month_iter.replace(year=current_month_iter.year + 1, month=1)
-            else:
-                current_month_iter = current_month_iter.replace(month=current_month_iter.month + 1)
-        
-        sorted_months = [m.strftime("%Y-%m") for m in all_months_dt]
-
-    for month_str in sorted_months:
-        month_start_dt = datetime.datetime.strptime(month_str, "%Y-%m")
-        
-        effective_budget_for_month = initial_budget
-        for change in budget_changes:
-            change_date = datetime.datetime.fromisoformat(change['date'])
-            if change_date <= month_start_dt:
-                effective_budget_for_month = change['new_amount']
-            elif change_date > month_start_dt:
-                break
-        
-        budget_values_over_time[month_str] = effective_budget_for_month
+    processed_budget_history = aggregate_cache.get(user, g.data_version)['budget_history']
 
-    for month_str in sorted_months:
-        month_start_dt = datetime.datetime.strptime(month_str, "%Y-%m")
-        
-        if month_start_dt.month == now.month and month_start_dt.year == now.year:
-            continue
-
-        monthly_expenses_sum = 0
-        for tx in transactions:
-            try:
-                tx_date = datetime.datetime.strptime(tx['timestamp'], "%Y-%m-%d %H:%M:%S")
-                if (tx_date.month == month_start_dt.month and 
-                    tx_date.year == month_start_dt.year and 
-                    tx.get('type') == 'expense'):
-                    monthly_expenses_sum += float(tx.get('amount', 0))
-            except:
-                pass
-        
-        month_budget = budget_values_over_time.get(month_str, 0)
-
-        remaining = month_budget - monthly_expenses_sum
-        usage_percentage = (monthly_expenses_sum / month_budget * 100) if month_budget > 0 else 0
-
-        processed_budget_history.append({
-            'month': month_start_dt.strftime("%B %Y"),
-            'budget': month_budget,
-            'expenses': monthly_expenses_sum,
-            'remaining': remaining,
-            'usage_percentage': usage_percentage
-        })
-    
-    processed_budget_history.sort(key=lambda x: datetime.datetime.strptime(x['month'], "%B %Y"), reverse=True)
+    month_forecast = budget_forecast.report(user, g.data_version)
 
     return render_template('budgets.html', 
                            user=user,
+                           forecast=month_forecast,
                            current_budget=current_budget,
                            category_budgets=category_budgets,
                            monthly_income=monthly_income,
@@ -864,30 +948,23 @@ def budgets_page():
                            warning_message=warning_message,
                            warning_level=warning_level)
 
+GOAL_TRANSACTIONS_PAGE_SIZE = 20
+
+def record_goal_transaction(user, goal_id, entry):
+    history = user['goal_transactions'].setdefault(goal_id, [])
+    bisect.insort(history, entry, key=schema.goal_transaction_key)
+    change_log().stage('goal_transaction', entry['id'], dict(entry, goal_id=goal_id))
+
+@app.route('/budget_forecast', methods=['GET'])
+def budget_forecast_page():
+    return jsonify(budget_forecast.report(g.user, g.data_version))
+
 @app.route('/goals')
 def goals():
     user = g.user
     
-    if 'goals' not in user:
-        user['goals'] = []
-    
-    transactions = user.get('transactions', [])
-    total_income = 0
-    total_expenses = 0
-    
-    for tx in transactions:
-        try:
-            amount = float(tx.get('amount', 0))
-            if tx.get('type') == 'income':
-                total_income += amount
-            elif tx.get('type') == 'expense':
-                total_expenses += amount
-        except:
-            pass
-    
-    total_balance = total_income - total_expenses
-    total_allocated = sum(goal.get('saved_amount', 0) for goal in user['goals'])
-    available_balance = total_balance - total_allocated
+    available_balance = ledger.from_paise(calculate_available_balance(user))
+    projections = aggregate_cache.get(user, g.data_version)['goal_projections']
     
     goal_categories = ['Emergency', 'Travel', 'Education', 'Technology', 'Health', 'Home', 'Investment', 'Entertainment', 'Vehicle', 'Other']
     
@@ -895,18 +972,16 @@ def goals():
                          user=user, 
                          goals=user['goals'],
                          available_balance=available_balance,
+                         projections=projections,
                          categories=goal_categories)
 
 @app.route('/create_goal', methods=['POST'])
 def create_goal():
     user = g.user
     
-    if 'goals' not in user:
-        user['goals'] = []
-    
     try:
         title = request.form['title'].strip()
-        target_amount = float(request.form['target_amount'])
+        target_amount = ledger.from_paise(ledger.to_paise(request.form['target_amount']))
         category = request.form['category']
         deadline = request.form.get('deadline', '')
         
@@ -931,8 +1006,7 @@ def create_goal():
             'category': category,
             'deadline': deadline,
             'status': 'In Progress',
-            'created_date': datetime.datetime.now().strftime('%Y-%m-%d'),
-            'transactions': []
+            'created_date': datetime.datetime.now().strftime('%Y-%m-%d')
         }
         
         user['goals'].append(new_goal)
@@ -949,10 +1023,19 @@ def create_goal():
 
 @app.route('/add_money/<goal_id>', methods=['POST'])
 def add_money(goal_id):
+    with contribution_lock:
+        version = current_data_version()
+        if version != g.data_version:
+            g.data_version = version
+            g.user = load_user_data_from_json()
+        return add_money_to_goal(goal_id)
+
+def add_money_to_goal(goal_id):
     user = g.user
     
     try:
-        amount = float(request.form['amount'])
+        amount = ledger.to_paise(request.form['amount'])
+        rupees = ledger.from_paise
         
         if amount <= 0:
             flash('Amount to add must be positive.', 'error')
@@ -963,40 +1046,38 @@ def add_money(goal_id):
             if goal['id'] == goal_id:
                 goal_found = True
                 
-                transactions = user.get('transactions', [])
-                total_income = sum(float(tx.get('amount', 0)) for tx in transactions if tx.get('type') == 'income')
-                total_expenses = sum(float(tx.get('amount', 0)) for tx in transactions if tx.get('type') == 'expense')
-                total_balance = total_income - total_expenses
-                total_allocated = sum(g.get('saved_amount', 0) for g in user['goals'])
-                available_balance = total_balance - total_allocated
-                
-                remaining_to_goal = goal['target_amount'] - goal['saved_amount']
+                available_balance = calculate_available_balance(user)
+                saved_amount = ledger.to_paise(goal['saved_amount'])
+                target_amount = ledger.to_paise(goal['target_amount'])
+                remaining_to_goal = target_amount - saved_amount
                 
                 if amount > available_balance:
-                    flash(f'Insufficient available balance. You only have ₹{available_balance:.2f} available.', 'error')
+                    flash(f'Insufficient available balance. You only have ₹{rupees(available_balance):.2f} available.', 'error')
                     return redirect(url_for('goals'))
                 
                 if amount > remaining_to_goal:
-                    flash(f'Amount exceeds remaining goal target. You only need ₹{remaining_to_goal:.2f} to complete this goal.', 'error')
+                    flash(f'Amount exceeds remaining goal target. You only need ₹{rupees(remaining_to_goal):.2f} to complete this goal.', 'error')
                     return redirect(url_for('goals'))
                 
-                goal['saved_amount'] += amount
+                saved_amount += amount
+                goal['saved_amount'] = rupees(saved_amount)
+                balance_cache.apply_allocation(g.data_version, amount)
                 
-                if goal['saved_amount'] >= goal['target_amount']:
+                if saved_amount >= target_amount:
                     goal['status'] = 'Completed'
                     flash(f'🎉 Goal "{goal["title"]}" completed! Congratulations!', 'success')
                 
                 goal_transaction = {
                     'id': str(uuid.uuid4()),
-                    'amount': amount,
+                    'amount': rupees(amount),
                     'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                     'type': 'add_money_to_goal',
                     'balance_after': goal['saved_amount']
                 }
-                goal.setdefault('transactions', []).append(goal_transaction)
+                record_goal_transaction(user, goal_id, goal_transaction)
                 
                 save_user_data_to_json(user)
-                flash(f'₹{amount:.2f} added to "{goal["title"]}" successfully!', 'success')
+                flash(f'₹{rupees(amount):.2f} added to "{goal["title"]}" successfully!', 'success')
                 break
         
         if not goal_found:
@@ -1016,7 +1097,7 @@ def edit_goal(goal_id):
     
     try:
         title = request.form['title'].strip()
-        target_amount = float(request.form['target_amount'])
+        target_amount = ledger.from_paise(ledger.to_paise(request.form['target_amount']))
         category = request.form['category']
         deadline = request.form.get('deadline', '')
         
@@ -1042,7 +1123,7 @@ def edit_goal(goal_id):
                 goal['category'] = category
                 goal['deadline'] = deadline
                 
-                if goal['saved_amount'] >= goal['target_amount']:
+                if ledger.to_paise(goal['saved_amount']) >= ledger.to_paise(goal['target_amount']):
                     goal['status'] = 'Completed'
                 else:
                     goal['status'] = 'In Progress'
@@ -1067,9 +1148,12 @@ def delete_goal(goal_id):
     user = g.user
     
     original_goals_count = len(user.get('goals', []))
+    released = sum(ledger.to_paise(goal.get('saved_amount', 0)) for goal in user.get('goals', []) if goal['id'] == goal_id)
     user['goals'] = [goal for goal in user.get('goals', []) if goal['id'] != goal_id]
     
     if len(user['goals']) < original_goals_count:
+        user.get('goal_transactions', {}).pop(goal_id, None)
+        balance_cache.apply_allocation(g.data_version, -released)
         save_user_data_to_json(user)
         flash('Goal deleted successfully! Saved amount returned to available balance.', 'success')
     else:
@@ -1077,85 +1161,143 @@ def delete_goal(goal_id):
         
     return redirect(url_for('goals'))
 
+def goal_transactions_page(user, goal_id, cursor=None, limit=GOAL_TRANSACTIONS_PAGE_SIZE):
+    """One page of a goal's contributions, newest first, or None if there is no such goal."""
+    goal = next((goal for goal in user.get('goals', []) if goal['id'] == goal_id), None)
+    if goal is None:
+        return None
+
+    history = user.get('goal_transactions', {}).get(goal_id, [])
+    end = len(history)
+    if cursor:
+        date, _, entry_id = cursor.partition('|')
+        end = bisect.bisect_left(history, (date, entry_id), key=schema.goal_transaction_key)
+    start = max(0, end - limit)
+
+    page = history[start:end]
+    page.reverse()
+    next_cursor = None
+    if start > 0:
+        next_cursor = '|'.join(schema.goal_transaction_key(history[start]))
+
+    return {
+        'transactions': page,
+        'next_cursor': next_cursor,
+        'total_count': len(history),
+        'saved_amount': goal.get('saved_amount', 0)
+    }
+
+def parse_page_limit(value, default, maximum):
+    try:
+        return max(1, min(int(value if value is not None else default), maximum))
+    except ValueError:
+        return default
+
 @app.route('/goal_transactions/<goal_id>', methods=['GET'])
 def goal_transactions(goal_id):
+    limit = parse_page_limit(request.args.get('limit'), GOAL_TRANSACTIONS_PAGE_SIZE, 100)
+    page = goal_transactions_page(g.user, goal_id, request.args.get('cursor'), limit)
+    if page is None:
+        return jsonify({'error': 'Goal not found.'}), 404
+    return jsonify(page)
+
+@app.route('/search', methods=['GET'])
+def search_page():
     user = g.user
-    
-    transactions = []
-    for goal in user.get('goals', []):
-        if goal['id'] == goal_id:
-            transactions = sorted(goal.get('transactions', []), key=lambda x: x['date'], reverse=True)
-            break
-            
-    return jsonify(transactions)
+    query = request.args.get('q', '').strip()
+    filter_category = request.args.get('filter_category')
+    filter_type = request.args.get('filter_type')
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        limit = 50
+
+    start = end = None
+    try:
+        if start_date_str:
+            start = ledger.datetime_to_epoch(datetime.datetime.strptime(start_date_str, '%Y-%m-%d'))
+        if end_date_str:
+            end = ledger.datetime_to_epoch(datetime.datetime.strptime(end_date_str, '%Y-%m-%d') + datetime.timedelta(days=1))
+    except ValueError:
+        return jsonify({'error': 'Dates must use YYYY-MM-DD.'}), 400
+
+    search_index.ensure(user, g.data_version, journal_store().entries)
+    transaction_ids = search_index.search_transactions(query, filter_category, filter_type, start, end)
+    # Journal entries have no category or type, so those filters exclude them.
+    journal_ids = []
+    if not filter_category and not filter_type:
+        journal_ids = search_index.search_journal(query, start, end)
+
+    transactions = user.get('transactions', [])
+    matched_transactions = []
+    for tx_id in transaction_ids[:limit]:
+        tx = transactions.find(tx_id)
+        if tx is not None:
+            matched_transactions.append(tx.to_dict())
+
+    # Archived years are older than anything hot, so their matches go last.
+    total_transactions = len(transaction_ids)
+    for segment in reversed(archived_ledgers_for_filter(user, start_date_str, end_date_str)):
+        archived_ids = search.match_transactions(search.index_ledger(segment), query, filter_category, filter_type, start, end)
+        total_transactions += len(archived_ids)
+        for tx_id in archived_ids[:max(limit - len(matched_transactions), 0)]:
+            matched_transactions.append(segment.find(tx_id).to_dict())
+
+    matched_journal = []
+    if journal_ids:
+        journal_by_id = {entry.get('id'): entry for entry in journal_store().entries() if isinstance(entry, dict)}
+        matched_journal = [journal_by_id[entry_id] for entry_id in journal_ids[:limit] if entry_id in journal_by_id]
+
+    return jsonify({
+        'query': query,
+        'total_transactions': total_transactions,
+        'transactions': matched_transactions,
+        'total_journal_entries': len(journal_ids),
+        'journal_entries': matched_journal
+    })
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    user = g.user
+    prefix = request.args.get('q', '').strip()
+
+    if not user.get('settings', {}).get('smart_suggestions', True) or not prefix:
+        return jsonify({'query': prefix, 'suggestions': []})
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', suggestions.DEFAULT_LIMIT)), 20))
+    except ValueError:
+        limit = suggestions.DEFAULT_LIMIT
+
+    suggestion_engine.ensure(user, g.data_version)
+    return jsonify({'query': prefix, 'suggestions': suggestion_engine.suggest(prefix, limit)})
 
 @app.route('/profile')
 def profile_page():
     user = g.user
-    transactions = user.get('transactions', [])
-    
-    total_income = 0
-    total_expenses = 0
-    income_count = 0
-    expense_count = 0
-    largest_expense = None
-    largest_income = None
-    category_totals = {}
-    
-    for tx in transactions:
-        try:
-            amount = float(tx.get('amount', 0))
-            tx_type = tx.get('type', '')
-            category = tx.get('category', 'Other')
-            
-            if tx_type == 'income':
-                total_income += amount
-                income_count += 1
-                if largest_income is None or amount > largest_income['amount']:
-                    largest_income = tx
-            elif tx_type == 'expense':
-                total_expenses += amount
-                expense_count += 1
-                if largest_expense is None or amount > largest_expense['amount']:
-                    largest_expense = tx
-                
-                category_totals[category] = category_totals.get(category, 0) + amount
-        except:
-            pass
-    
-    balance = total_income - total_expenses
-    total_transactions = len(transactions)
-    
-    top_category = ('None', 0)
-    if category_totals:
-        top_category = max(category_totals.items(), key=lambda x: x[1])
-    
-    if 'settings' not in user:
-        user['settings'] = {
-            'show_presets': False,
-            'smart_suggestions': True,
-            'show_confirmations': True
-        }
-    
-    if 'notes' not in user:
-        user['notes'] = []
+    stats = aggregate_cache.get(user, g.data_version)['profile_stats']
 
-    if 'journal_entries' not in user:
-        user['journal_entries'] = []
+    journal_entries, journal_next_cursor = journal_store().page(limit=journal.DEFAULT_PAGE_SIZE)
 
     total_savings = sum(goal.get('saved_amount', 0) for goal in user.get('goals', []))
     
     return render_template('profile.html', 
                          user=user,
-                         total_income=total_income,
-                         total_expenses=total_expenses,
-                         balance=balance,
-                         income_count=income_count,
-                         expense_count=expense_count,
-                         total_transactions=total_transactions,
-                         largest_expense=largest_expense,
-                         largest_income=largest_income,
-                         top_category=top_category,
+                         journal_entries=journal_entries,
+                         journal_next_cursor=journal_next_cursor,
+                         journal_count=journal_store().count(),
+                         total_income=stats['total_income'],
+                         total_expenses=stats['total_expenses'],
+                         balance=stats['balance'],
+                         income_count=stats['income_count'],
+                         expense_count=stats['expense_count'],
+                         total_transactions=stats['total_transactions'],
+                         largest_expense=stats['largest_expense'],
+                         largest_income=stats['largest_income'],
+                         top_category=stats['top_category'],
                          total_savings=total_savings)
 
 @app.route('/delete_transaction/<tx_id>')
@@ -1163,12 +1305,11 @@ def delete_transaction(tx_id):
     user = g.user
     transactions = user.get('transactions', [])
     
-    for i, tx in enumerate(transactions):
-        if tx.get('id') == tx_id:
-            deleted_tx = transactions.pop(i)
-            save_user_data_to_json(user)
-            flash(f'Transaction "{deleted_tx.get("description", "")}" deleted successfully!', 'success')
-            break
+    deleted_tx = transactions.remove_id(tx_id)
+    if deleted_tx is not None:
+        track_removed_transaction(g.data_version, deleted_tx)
+        save_user_data_to_json(user)
+        flash(f'Transaction "{deleted_tx.get("description", "")}" deleted successfully!', 'success')
     else:
         flash('Transaction not found!', 'error')
     
@@ -1178,13 +1319,6 @@ def delete_transaction(tx_id):
 def update_settings():
     user = g.user
     
-    if 'settings' not in user:
-        user['settings'] = {
-            'show_presets': False,
-            'smart_suggestions': True,
-            'show_confirmations': True
-        }
-    
     try:
         user['settings']['show_presets'] = 'show_presets' in request.form
         user['settings']['smart_suggestions'] = 'smart_suggestions' in request.form
@@ -1215,11 +1349,10 @@ def update_journal():
             'date': datetime.datetime.now().isoformat()
         }
         
-        if 'journal_entries' not in user:
-            user['journal_entries'] = []
-            
-        user['journal_entries'].insert(0, new_entry)
-        save_user_data_to_json(user)
+        journal_store().append(new_entry)
+        search_index.index_journal_entry(g.data_version, new_entry)
+        change_log().stage('journal_entry', new_entry['id'], new_entry)
+        advance_data_version(g.data_version)
         flash('Journal entry added successfully!', 'success')
         
     except Exception as e:
@@ -1228,7 +1361,342 @@ def update_journal():
         
     return redirect(url_for('profile_page'))
 
+@app.route('/journal_entries', methods=['GET'])
+def journal_entries_page():
+    try:
+        entries, next_cursor = journal_store().page(request.args.get('cursor'), journal.DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor.'}), 400
+    for entry in entries:
+        entry['display_date'] = format_datetime_filter(entry.get('date'))
+    return jsonify({'entries': entries, 'next_cursor': next_cursor})
+
+BATCH_MAX_MUTATIONS = 1000
+
+# Client ids map to stable server ids (uuid5), so replaying a batch whose
+# response was lost does not apply its additions twice.
+BATCH_ID_NAMESPACE = uuid.UUID('0f6c8a52-3d7e-4b91-a6f0-5e2d9c41b7a3')
+
+def batch_client_id(item):
+    """The item's client id, which additions need for their stable server id."""
+    client_id = item.get('client_id')
+    if not isinstance(client_id, str) or not client_id:
+        # Without it every addition would map to the same id and be dropped as a duplicate.
+        raise ValueError('client_id must be a non-empty string.')
+    return client_id
+
+def batch_transaction_fields(item, now):
+    """Validated transaction fields from a batch item; raises ValueError with the form's messages."""
+    # JSON can carry any type where the form only ever sends strings.
+    for field in ('transaction_date', 'description', 'type', 'category'):
+        if item.get(field) is not None and not isinstance(item[field], str):
+            raise ValueError(f'{field} must be a string.')
+    if isinstance(item.get('amount'), bool) or not isinstance(item.get('amount'), (str, int, float, type(None))):
+        raise ValueError('Invalid amount format.')
+
+    transaction_date_str = item.get('transaction_date')
+    description = (item.get('description') or '').strip()
+    amount_str = item.get('amount')
+    transaction_type = item.get('type')
+    category = item.get('category')
+
+    if not all([transaction_date_str, description, amount_str, transaction_type, category]):
+        raise ValueError('All fields are required.')
+    try:
+        transaction_date = datetime.datetime.strptime(transaction_date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Please use YYYY-MM-DD.')
+    if transaction_date > now.date():
+        raise ValueError('Transaction date cannot be in the future.')
+    try:
+        amount = ledger.to_paise(amount_str)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid amount format.')
+    if amount <= 0:
+        raise ValueError('Amount must be positive.')
+    if transaction_type not in ('income', 'expense'):
+        raise ValueError('Type must be income or expense.')
+
+    return {
+        'description': description[:25],
+        'amount': ledger.from_paise(amount),
+        'type': transaction_type,
+        'category': category,
+        'timestamp': datetime.datetime.combine(transaction_date, now.time()).strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+class BatchTotals:
+    """Running balance and this month's spend while a batch is applied."""
+
+    def __init__(self, user, version):
+        self.available = balance_cache.available(user, version)
+        self.month_expenses, self.category_expenses = calculate_current_month_expenses(user)
+        self.month_start, self.month_end = current_month_range()
+        self.monthly_budget = ledger.to_paise(user['budget']['monthly'])
+        self.category_budgets = user['budget']['categories']
+
+    def apply(self, tx, sign=1):
+        amount = ledger.to_paise(tx['amount']) * sign
+        if tx['type'] == 'income':
+            self.available += amount
+        elif tx['type'] == 'expense':
+            self.available -= amount
+            if self.month_start <= ledger.parse_timestamp(tx['timestamp']) < self.month_end:
+                self.month_expenses += amount
+                category = tx['category'] if tx['category'] is not None else 'Other'
+                self.category_expenses[category] = self.category_expenses.get(category, 0) + amount
+
+    def check_budget(self, tx):
+        """Raise ValueError if ``tx`` (already counted) takes this month over a budget."""
+        if tx['type'] != 'expense' or self.monthly_budget <= 0:
+            return
+        if not self.month_start <= ledger.parse_timestamp(tx['timestamp']) < self.month_end:
+            return
+        if self.month_expenses > self.monthly_budget:
+            raise ValueError(f'Budget Exceeded! This expense would exceed your monthly budget of ₹{ledger.from_paise(self.monthly_budget):.2f}.')
+        category_budget = ledger.to_paise(self.category_budgets.get(tx['category'], 0))
+        if category_budget > 0 and self.category_expenses.get(tx['category'], 0) > category_budget:
+            raise ValueError(f'Category Budget Exceeded! This expense would exceed your {tx["category"]} budget of ₹{ledger.from_paise(category_budget):.2f}.')
+
+def apply_batch_mutation(user, item, totals, now, tracked):
+    """Apply one mutation to ``user``; returns its result dict or raises ValueError."""
+    op = item.get('op')
+    transactions = user['transactions']
+
+    if op == 'add_transaction':
+        tx_id = str(uuid.uuid5(BATCH_ID_NAMESPACE, f"transaction:{batch_client_id(item)}"))
+        if transactions.index_of(tx_id) >= 0:
+            return {'status': 'duplicate', 'id': tx_id}
+        new_transaction = dict(batch_transaction_fields(item, now), id=tx_id)
+        totals.apply(new_transaction)
+        totals.check_budget(new_transaction)
+        transactions.append(new_transaction)
+        tracked.append((track_added_transaction, new_transaction))
+        return {'status': 'applied', 'id': tx_id}
+
+    if op == 'edit_transaction':
+        transaction = transactions.find(item.get('id'))
+        if transaction is None:
+            raise ValueError('Transaction not found!')
+        previous = transaction.to_dict()
+        fields = batch_transaction_fields(item, now)
+        totals.apply(previous, -1)
+        totals.apply(fields)
+        totals.check_budget(fields)
+        transaction.update(fields)
+        tracked.append((track_removed_transaction, previous))
+        tracked.append((track_added_transaction, transaction.to_dict()))
+        return {'status': 'applied', 'id': previous['id']}
+
+    if op == 'delete_transaction':
+        deleted_tx = transactions.remove_id(item.get('id'))
+        if deleted_tx is None:
+            # Already gone, e.g. a replayed batch; deleting is idempotent.
+            return {'status': 'duplicate', 'id': item.get('id')}
+        totals.apply(deleted_tx, -1)
+        tracked.append((track_removed_transaction, deleted_tx))
+        return {'status': 'applied', 'id': deleted_tx['id']}
+
+    if op == 'add_money':
+        goal_id = item.get('goal_id')
+        goal = next((goal for goal in user.get('goals', []) if goal['id'] == goal_id), None)
+        if goal is None:
+            raise ValueError('Goal not found.')
+        entry_id = str(uuid.uuid5(BATCH_ID_NAMESPACE, f"goal:{batch_client_id(item)}"))
+        if any(entry.get('id') == entry_id for entry in user.get('goal_transactions', {}).get(goal_id, [])):
+            return {'status': 'duplicate', 'id': entry_id}
+        try:
+            if isinstance(item.get('amount'), bool):
+                raise TypeError('amount must be a number or string')
+            amount = ledger.to_paise(item.get('amount'))
+        except (TypeError, ValueError):
+            raise ValueError('Please enter a valid amount.')
+        if amount <= 0:
+            raise ValueError('Amount to add must be positive.')
+        saved_amount = ledger.to_paise(goal['saved_amount'])
+        target_amount = ledger.to_paise(goal['target_amount'])
+        if amount > totals.available:
+            raise ValueError(f'Insufficient available balance. You only have ₹{ledger.from_paise(totals.available):.2f} available.')
+        if amount > target_amount - saved_amount:
+            raise ValueError(f'Amount exceeds remaining goal target. You only need ₹{ledger.from_paise(target_amount - saved_amount):.2f} to complete this goal.')
+
+        totals.available -= amount
+        saved_amount += amount
+        goal['saved_amount'] = ledger.from_paise(saved_amount)
+        if saved_amount >= target_amount:
+            goal['status'] = 'Completed'
+        record_goal_transaction(user, goal_id, {
+            'id': entry_id,
+            'amount': ledger.from_paise(amount),
+            'date': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'type': 'add_money_to_goal',
+            'balance_after': goal['saved_amount']
+        })
+        tracked.append((balance_cache.apply_allocation, amount))
+        return {'status': 'applied', 'id': entry_id, 'saved_amount': goal['saved_amount']}
+
+    raise ValueError(f'Unknown operation: {op!r}')
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    payload = request.get_json(silent=True)
+    mutations = payload.get('mutations') if isinstance(payload, dict) else None
+    if not isinstance(mutations, list) or not all(isinstance(item, dict) for item in mutations):
+        return jsonify({'success': False, 'error': 'Expected {"mutations": [...]}.'}), 400
+    if len(mutations) > BATCH_MAX_MUTATIONS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_MUTATIONS} mutations per batch.'}), 400
+
+    # Same lock as add_money: the batch checks and spends the available balance.
+    with contribution_lock:
+        version = current_data_version()
+        if version != g.data_version:
+            g.data_version = version
+            g.user = load_user_data_from_json()
+        user = g.user
+        now = datetime.datetime.now()
+        totals = BatchTotals(user, version)
+        tracked = []
+        results = []
+        failed = False
+        for item in mutations:
+            result = {'client_id': item.get('client_id')}
+            if failed:
+                result['status'] = 'not_applied'
+            else:
+                try:
+                    result.update(apply_batch_mutation(user, item, totals, now, tracked))
+                except ValueError as e:
+                    result.update(status='error', error=str(e))
+                    failed = True
+            results.append(result)
+
+        # All or nothing: a rejected batch leaves the stored data untouched.
+        if failed:
+            change_log().discard()
+            for result in results:
+                if result['status'] == 'applied':
+                    result['status'] = 'not_applied'
+            return jsonify({'success': False, 'results': results}), 409
+
+        if any(result['status'] == 'applied' for result in results):
+            for track, value in tracked:
+                track(version, value)
+            save_user_data_to_json(user, base_version=version)
+
+        income, expenses, allocated = balance_cache.totals(user, g.data_version)
+        return jsonify({
+            'success': True,
+            'seq': change_log().last_seq(),
+            'results': results,
+            'totals': {
+                'total_income': ledger.from_paise(income),
+                'total_expenses': ledger.from_paise(expenses),
+                'current_balance': ledger.from_paise(income - expenses),
+                'available_balance': ledger.from_paise(income - expenses - allocated)
+            }
+        })
+
+@app.route('/report', methods=['GET'])
+def year_end_report():
+    try:
+        years = report.parse_years(request.args.get('from') or None, request.args.get('to') or None)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from and to must be years.'}), 400
+    result = report.build_report(g.user, USER_DATA_FILE, years)
+    output_format = request.args.get('format', 'html')
+    if output_format == 'csv':
+        response = Response(report.to_csv(result), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=rupeetrack-report.csv'
+        return response
+    if output_format == 'json':
+        return jsonify(result)
+    return render_template('report.html', report=result)
+
+CHANGES_PAGE_SIZE = 1000
+
+@app.route('/api/changes', methods=['GET'])
+def api_changes():
+    """Records changed since sequence ``since``; ``seq`` is the value to send next time."""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since must be an integer.'}), 400
+    limit = parse_page_limit(request.args.get('limit'), CHANGES_PAGE_SIZE, CHANGES_PAGE_SIZE)
+    log = change_log()
+    if log.last_seq() == 0:
+        # No write since the log was introduced; seed it so a full sync works.
+        log.flush(g.user)
+    entries, last_seq, more = log.since(since, limit)
+    return jsonify({
+        'success': True,
+        'seq': entries[-1]['seq'] if more else last_seq,
+        'more': more,
+        'changes': entries
+    })
+
+def require_admin():
+    expected = app.config.get('ADMIN_TOKEN')
+    # Header only: a query-string token would end up in access logs and history.
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not expected or not hmac.compare_digest(supplied.encode('utf-8'), expected.encode('utf-8')):
+        abort(404)
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    require_admin()
+
+    if request.method == 'POST':
+        action = request.form.get('action')
+
+        if action == 'capture':
+            endpoint = request.form.get('endpoint', '')
+            if endpoint not in app.view_functions:
+                return jsonify({'error': f'Unknown endpoint: {endpoint}'}), 400
+            try:
+                count = int(request.form.get('count', 1))
+            except ValueError:
+                return jsonify({'error': 'Invalid request count.'}), 400
+            profiler.arm_capture(endpoint, count)
+        elif action == 'stop_capture':
+            profiler.disarm_capture()
+        elif action == 'start_sampling':
+            try:
+                interval = float(request.form.get('interval', profiler.DEFAULT_SAMPLE_INTERVAL))
+            except ValueError:
+                return jsonify({'error': 'Invalid sampling interval.'}), 400
+            profiler.start_sampling(max(interval, 0.001))
+        elif action == 'stop_sampling':
+            profiler.stop_sampling()
+        elif action == 'flush_samples':
+            profiler.flush_samples()
+        else:
+            return jsonify({'error': 'Unknown action.'}), 400
+
+    return jsonify(profiler.status())
+
+@app.route('/admin/profiler/files/<path:filename>', methods=['GET'])
+def admin_profiler_file(filename):
+    require_admin()
+    return send_from_directory(os.path.abspath(profiler.PROFILE_DIR), filename, as_attachment=True)
+
+@app.route('/admin/archive', methods=['GET', 'POST'])
+def admin_archive():
+    require_admin()
+
+    archived_years = []
+    if request.method == 'POST':
+        archived_years = archive_closed_years()
+
+    return jsonify({
+        'archived_years': archived_years,
+        'archive': {year: {'count': summary.get('count', 0),
+                           'income': ledger.from_paise(summary.get('income', 0)),
+                           'expense': ledger.from_paise(summary.get('expense', 0))}
+                    for year, summary in archive.summaries(load_user_data_from_json()).items()}
+    })
+
 def main():
+    recurring_scheduler.run_now()
     app.run(host="0.0.0.0", port=int(os.environ.get('PORT', 8080)), debug=True)
 
 if __name__ == "__main__":
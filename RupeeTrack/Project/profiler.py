@@ -0,0 +1,199 @@
+"""
+Opt-in request profiling for RupeeTrack.
+
+Two modes, both off by default:
+
+* capture - profile the next N requests to one endpoint with cProfile and
+  write each run as a ``.pstats`` file.
+* sampling - a background thread samples every thread's stack at a fixed
+  interval and accumulates collapsed stacks (``frame;frame;frame count``)
+  that flamegraph tools can read.
+
+While neither mode is active the only per-request cost is one attribute check.
+"""
+
+import cProfile
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+
+from flask import g, request
+
+PROFILE_DIR = os.environ.get('RUPEETRACK_PROFILE_DIR', 'profiles')
+
+DEFAULT_SAMPLE_INTERVAL = 0.01
+
+_lock = threading.Lock()
+# cProfile hooks are process-wide on newer Pythons, so only one request is
+# profiled at a time; concurrent matches are simply not captured.
+_capture_slot = threading.Lock()
+
+_state = {
+    'active': False,
+    'endpoint': None,
+    'remaining': 0,
+}
+
+_sampler = {
+    'thread': None,
+    'stop': None,
+    'interval': DEFAULT_SAMPLE_INTERVAL,
+    'started_at': None,
+    'samples': 0,
+    'stacks': collections.Counter(),
+}
+
+
+def _timestamp():
+    return datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+
+def _ensure_dir():
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return PROFILE_DIR
+
+
+def arm_capture(endpoint, count):
+    """Profile the next ``count`` requests whose endpoint matches."""
+    with _lock:
+        _state['endpoint'] = endpoint
+        _state['remaining'] = max(0, int(count))
+        _state['active'] = _state['remaining'] > 0
+
+
+def disarm_capture():
+    with _lock:
+        _state['active'] = False
+        _state['remaining'] = 0
+        _state['endpoint'] = None
+
+
+def _before_request():
+    if not _state['active']:
+        return
+    if request.endpoint != _state['endpoint']:
+        return
+    with _lock:
+        if _state['remaining'] <= 0:
+            return
+        if not _capture_slot.acquire(blocking=False):
+            return
+        _state['remaining'] -= 1
+        _state['active'] = _state['remaining'] > 0
+    profile = cProfile.Profile()
+    g._route_profile = profile
+    profile.enable()
+
+
+def _teardown_request(exc):
+    profile = g.pop('_route_profile', None)
+    if profile is None:
+        return
+    try:
+        profile.disable()
+        filename = f"{request.endpoint}-{_timestamp()}.pstats"
+        profile.dump_stats(os.path.join(_ensure_dir(), filename))
+    except Exception as e:
+        print(f"Profiler capture error: {e}")
+    finally:
+        _capture_slot.release()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def _sample_loop(stop, interval):
+    own_ident = threading.get_ident()
+    while not stop.wait(interval):
+        frames = sys._current_frames()
+        batch = [_collapse(frame) for ident, frame in frames.items() if ident != own_ident]
+        del frames
+        with _lock:
+            _sampler['stacks'].update(batch)
+            _sampler['samples'] += 1
+
+
+def start_sampling(interval=DEFAULT_SAMPLE_INTERVAL):
+    """Start the background stack sampler (no-op if already running)."""
+    with _lock:
+        if _sampler['thread'] is not None:
+            return False
+        stop = threading.Event()
+        thread = threading.Thread(target=_sample_loop, args=(stop, interval),
+                                  name='rupeetrack-sampler', daemon=True)
+        _sampler.update(thread=thread, stop=stop, interval=interval,
+                        started_at=time.time(), samples=0, stacks=collections.Counter())
+    thread.start()
+    return True
+
+
+def stop_sampling():
+    """Stop the sampler and write its collapsed stacks; returns the filename."""
+    with _lock:
+        thread, stop = _sampler['thread'], _sampler['stop']
+        if thread is None:
+            return None
+        _sampler['thread'] = None
+    stop.set()
+    thread.join()
+    return flush_samples()
+
+
+def flush_samples():
+    """Write accumulated collapsed stacks to disk and reset the counters."""
+    with _lock:
+        stacks = _sampler['stacks']
+        _sampler['stacks'] = collections.Counter()
+        _sampler['samples'] = 0
+    if not stacks:
+        return None
+    filename = f"samples-{_timestamp()}.collapsed"
+    with open(os.path.join(_ensure_dir(), filename), 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return filename
+
+
+def status():
+    with _lock:
+        return {
+            'capture': {
+                'active': _state['active'],
+                'endpoint': _state['endpoint'],
+                'remaining': _state['remaining'],
+            },
+            'sampling': {
+                'active': _sampler['thread'] is not None,
+                'interval': _sampler['interval'],
+                'started_at': _sampler['started_at'],
+                'samples': _sampler['samples'],
+            },
+            'files': list_files(),
+        }
+
+
+def list_files():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(name for name in os.listdir(PROFILE_DIR)
+                  if name.endswith(('.pstats', '.collapsed')))
+
+
+def init_app(app):
+    """Register the request hooks; call before any other before_request."""
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,159 @@
+"""
+Recurring transaction rules and the scheduler that materialises them.
+
+A rule lives in ``user['recurring_transactions']`` and describes a
+transaction that repeats daily, weekly or monthly from ``start_date`` until
+an optional ``end_date``. Each rule stores ``next_due``, the first date it
+has not yet produced. ``materialize`` walks only the due dates of each rule
+and advances ``next_due`` in the same document that receives the new
+transactions, so once that document is saved a second run finds nothing to
+do. Occurrence ids are derived from the rule id and date, so a repeat run
+against an older copy of the file produces the same transactions, not
+duplicates.
+
+``RecurringScheduler`` runs a catch-up callback at most once per day
+lazily, on demand, and on a background timer.
+"""
+
+import calendar
+import datetime
+import threading
+import uuid
+
+try:
+    from . import ledger as ledger_module
+except ImportError:
+    import ledger as ledger_module
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+DATE_FORMAT = '%Y-%m-%d'
+
+DEFAULT_CHECK_INTERVAL = 3600
+
+# Namespace for occurrence ids: uuid5(namespace, "<rule id>:<date>").
+OCCURRENCE_NAMESPACE = uuid.UUID('5b0d3c1e-8a53-4a38-9d4f-1c6a2f0f7e21')
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, DATE_FORMAT).date()
+
+
+def next_occurrence(rule, current):
+    """Date after ``current`` on which ``rule`` is due again."""
+    frequency = rule['frequency']
+    if frequency == 'daily':
+        return current + datetime.timedelta(days=1)
+    if frequency == 'weekly':
+        return current + datetime.timedelta(weeks=1)
+    month_index = current.year * 12 + current.month
+    year, month = divmod(month_index, 12)
+    month += 1
+    day = min(rule.get('day_of_month', current.day), calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def new_rule(description, amount, tx_type, category, frequency, start_date, end_date=None):
+    """Validated rule dict; raises ValueError on bad input."""
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency: {frequency!r}")
+    paise = ledger_module.to_paise(amount)
+    if paise <= 0:
+        raise ValueError("Amount must be positive.")
+    start = parse_date(start_date)
+    if end_date:
+        if parse_date(end_date) < start:
+            raise ValueError("End date is before the start date.")
+    else:
+        end_date = None
+    return {
+        'id': str(uuid.uuid4()),
+        'description': description[:25],
+        'amount': ledger_module.from_paise(paise),
+        'type': tx_type,
+        'category': category,
+        'frequency': frequency,
+        'day_of_month': start.day,
+        'start_date': start.strftime(DATE_FORMAT),
+        'end_date': end_date,
+        'next_due': start.strftime(DATE_FORMAT),
+        'created_date': datetime.date.today().strftime(DATE_FORMAT)
+    }
+
+
+def materialize(user, today=None):
+    """Append every due occurrence to ``user``'s ledger; returns the new transactions."""
+    today = today or datetime.date.today()
+    created = []
+    for rule in user.get('recurring_transactions', []):
+        try:
+            due = parse_date(rule['next_due'])
+            end = parse_date(rule['end_date']) if rule.get('end_date') else None
+        except (KeyError, TypeError, ValueError):
+            continue
+        last = today if end is None else min(today, end)
+        while due <= last:
+            created.append({
+                'id': str(uuid.uuid5(OCCURRENCE_NAMESPACE, f"{rule['id']}:{due.strftime(DATE_FORMAT)}")),
+                'description': rule['description'],
+                'amount': rule['amount'],
+                'type': rule['type'],
+                'category': rule['category'],
+                'timestamp': datetime.datetime.combine(due, datetime.time()).strftime(ledger_module.TIMESTAMP_FORMAT),
+                'recurring_id': rule['id']
+            })
+            due = next_occurrence(rule, due)
+        rule['next_due'] = due.strftime(DATE_FORMAT)
+
+    if created:
+        user['transactions'].extend(created)
+    return created
+
+
+class RecurringScheduler:
+    """Runs ``catch_up`` once per day: lazily, on demand, and from a timer thread."""
+
+    def __init__(self, catch_up, interval=DEFAULT_CHECK_INTERVAL):
+        self.catch_up = catch_up
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def _run(self):
+        try:
+            self.catch_up()
+        except Exception as e:
+            print(f"Recurring transactions error: {e}")
+            return
+        self.last_run = datetime.date.today()
+
+    def run_now(self):
+        with self._lock:
+            self._run()
+
+    def run_if_due(self):
+        """Catch up unless that already happened today; cheap when it has."""
+        if self.last_run == datetime.date.today():
+            return
+        with self._lock:
+            if self.last_run != datetime.date.today():
+                self._run()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_if_due()
+
+    def start(self):
+        """Start the background timer (no-op if already running)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='rupeetrack-recurring', daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
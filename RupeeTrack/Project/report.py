@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Year-end financial reports for RupeeTrack.
+
+For each year, the report covers income, expenses, savings and savings
+rate, the same broken down by category, budget adherence and goal
+contributions. Adherence counts the months where spending stayed within the
+monthly budget in effect at the time, taken from ``budget.history``. Only
+closed months count, from the month of the first transaction.
+
+Years are computed independently in a process pool: hot years from slices of
+the ledger columns and archived years straight from their segment files.
+A closed year's result is cached under ``user_data.reports/<year>.json``
+together with a fingerprint of everything it was computed from, so a report
+over ten years recomputes only the current year and any older year whose
+transactions, budget history or goal contributions changed.
+
+    python report.py --format html --output report.html
+    python report.py --from 2016 --to 2025 --format csv
+"""
+
+import argparse
+import bisect
+import concurrent.futures
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+from array import array
+
+import jinja2
+
+try:
+    from . import aggregates, archive, ledger
+except ImportError:
+    import aggregates
+    import archive
+    import ledger
+
+# Part of every cache fingerprint; bump it when the year report changes shape.
+REPORT_FORMAT = 1
+
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Below this many transactions to scan, starting worker processes costs more
+# than it saves.
+PARALLEL_MIN_ROWS = 50000
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+from_paise = ledger.from_paise
+
+
+def report_dir(data_path):
+    return os.path.splitext(data_path)[0] + '.reports'
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 1) if whole else None
+
+
+def _goal_entries(user):
+    """(goal id, entry) for every goal contribution, including ones still embedded in goals."""
+    for goal_id, history in user.get('goal_transactions', {}).items():
+        for entry in history:
+            yield goal_id, entry
+    for goal in user.get('goals', []):
+        for entry in goal.get('transactions', []):
+            yield goal['id'], entry
+
+
+def _columns(transactions, positions):
+    return (array('q', (transactions.timestamps[pos] for pos in positions)),
+            array('q', (transactions.amounts[pos] for pos in positions)),
+            bytes(transactions.types[pos] for pos in positions),
+            array('H', (transactions.categories[pos] for pos in positions)))
+
+
+def year_tasks(user, data_path, years=None, now=None):
+    """One self-contained task per year, for ``compute_year``."""
+    now = now or datetime.datetime.now()
+    transactions = user['transactions']
+    archived_years = set(archive.summaries(user))
+
+    by_year = {}
+    stamps = [ts for ts in transactions.timestamps if ts != ledger.NO_TIMESTAMP]
+    if stamps:
+        first_year = ledger.epoch_to_datetime(min(stamps)).year
+        last_year = ledger.epoch_to_datetime(max(stamps)).year
+        year_starts = [ledger.datetime_to_epoch(datetime.datetime(year, 1, 1))
+                       for year in range(first_year, last_year + 2)]
+        for pos, ts in enumerate(transactions.timestamps):
+            if ts != ledger.NO_TIMESTAMP:
+                year = first_year + bisect.bisect_right(year_starts, ts) - 1
+                by_year.setdefault(year, []).append(pos)
+
+    goal_titles = {goal['id']: goal.get('title', '') for goal in user.get('goals', [])}
+    contributions = {}
+    for goal_id, entry in _goal_entries(user):
+        try:
+            year = int(str(entry.get('date', ''))[:4])
+        except ValueError:
+            continue
+        goals = contributions.setdefault(year, {})
+        goal = goals.setdefault(goal_id, {'title': goal_titles.get(goal_id, ''), 'amount': 0, 'count': 0})
+        goal['amount'] += ledger.to_paise(entry.get('amount', 0))
+        goal['count'] += 1
+
+    all_years = set(by_year) | archived_years | set(contributions)
+    if years is not None:
+        all_years &= set(years)
+
+    # Months count for adherence from the first activity to the last closed
+    # month, as on the budgets page.
+    schedule = aggregates.budget_schedule(user.get('budget'))
+    firsts = [ledger.epoch_to_datetime(min(stamps))] if stamps else []
+    archived_earliest = archive.earliest_timestamp(user)
+    if archived_earliest is not None:
+        firsts.append(ledger.epoch_to_datetime(archived_earliest))
+    if schedule[1]:
+        firsts.append(schedule[1][0][0])
+    first_month = min(firsts).replace(day=1, hour=0, minute=0, second=0, microsecond=0) if firsts else None
+
+    tasks = []
+    for year in sorted(all_years):
+        months = []
+        for month in range(1, 13):
+            month_start = datetime.datetime(year, month, 1)
+            closed = (year, month) < (now.year, now.month)
+            counted = closed and first_month is not None and month_start >= first_month
+            budget = ledger.to_paise(aggregates.budget_for_month(schedule, month_start)) if counted else 0
+            months.append((counted, budget))
+        task = {
+            'year': year,
+            'closed': year < now.year,
+            'months': months,
+            'goals': contributions.get(year, {}),
+            'type_names': list(transactions.type_codes.names),
+            'category_names': list(transactions.category_codes.names),
+            'columns': _columns(transactions, by_year.get(year, [])),
+            'data_path': data_path,
+            'archived': year in archived_years,
+        }
+        tasks.append(task)
+    return tasks
+
+
+def fingerprint(task):
+    """A digest of everything a year's report is computed from."""
+    digest = hashlib.sha256()
+    small = {key: value for key, value in task.items() if key != 'columns'}
+    digest.update(json.dumps([REPORT_FORMAT, small], sort_keys=True).encode('utf-8'))
+    for column in task['columns']:
+        digest.update(bytes(column))
+    if task['archived']:
+        try:
+            stat = os.stat(archive.segment_path(task['data_path'], task['year']))
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode('ascii'))
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+def _sum_columns(totals, year, timestamps, amounts, types, categories, type_names, category_names):
+    income_code = type_names.index('income') if 'income' in type_names else -1
+    expense_code = type_names.index('expense') if 'expense' in type_names else -1
+    month_starts = [ledger.datetime_to_epoch(datetime.datetime(year, month, 1)) for month in range(1, 13)]
+    for ts, amount, tx_type, category in zip(timestamps, amounts, types, categories):
+        if tx_type == income_code:
+            kind = 'income'
+        elif tx_type == expense_code:
+            kind = 'expense'
+        else:
+            continue
+        month = bisect.bisect_right(month_starts, ts) - 1
+        totals[kind] += amount
+        totals['count'] += 1
+        totals['months'][month][kind] += amount
+        name = category_names[category]
+        category_totals = totals['categories'].setdefault('Other' if name is None else name,
+                                                          {'income': 0, 'expense': 0})
+        category_totals[kind] += amount
+
+
+def compute_year(task):
+    """The report for one year; runs in a worker process."""
+    totals = {'income': 0, 'expense': 0, 'count': 0, 'categories': {},
+              'months': [{'income': 0, 'expense': 0} for _ in range(12)]}
+    _sum_columns(totals, task['year'], *task['columns'], task['type_names'], task['category_names'])
+    if task['archived']:
+        segment = archive.load_segment(task['data_path'], task['year'])
+        _sum_columns(totals, task['year'], segment.timestamps, segment.amounts, segment.types, segment.categories,
+                     segment.type_codes.names, segment.category_codes.names)
+
+    months = []
+    budgeted = within = 0
+    for month, ((counted, budget), flows) in enumerate(zip(task['months'], totals['months']), start=1):
+        ok = None
+        if counted and budget > 0:
+            budgeted += 1
+            ok = flows['expense'] <= budget
+            within += ok
+        months.append({
+            'month': f"{task['year']}-{month:02d}",
+            'income': from_paise(flows['income']),
+            'expense': from_paise(flows['expense']),
+            'budget': from_paise(budget) if counted else None,
+            'within_budget': ok,
+        })
+
+    goals = sorted(({'id': goal_id, 'title': goal['title'], 'amount': from_paise(goal['amount']),
+                     'count': goal['count']} for goal_id, goal in task['goals'].items()),
+                   key=lambda goal: -goal['amount'])
+    savings = totals['income'] - totals['expense']
+    return {
+        'year': task['year'],
+        'closed': task['closed'],
+        'transactions': totals['count'],
+        'income': from_paise(totals['income']),
+        'expenses': from_paise(totals['expense']),
+        'savings': from_paise(savings),
+        'savings_rate': _percent(savings, totals['income']),
+        'categories': {name: {'income': from_paise(values['income']), 'expense': from_paise(values['expense'])}
+                       for name, values in sorted(totals['categories'].items())},
+        'months': months,
+        'budget_months': budgeted,
+        'months_within_budget': within,
+        'budget_adherence': _percent(within, budgeted),
+        'goal_contributions': from_paise(sum(goal['amount'] for goal in task['goals'].values())),
+        'goals': goals,
+    }
+
+
+def _read_cached(path, key):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached['report'] if cached.get('fingerprint') == key else None
+
+
+def _write_cached(path, key, result):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'fingerprint': key, 'report': result}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_report(user, data_path, years=None, now=None, max_workers=MAX_WORKERS):
+    """Reports for ``years`` (default: every year with data), oldest first, plus their totals."""
+    now = now or datetime.datetime.now()
+    tasks = year_tasks(user, data_path, years, now)
+    results = {}
+    pending = []
+    for task in tasks:
+        if task['closed']:
+            task['cache_path'] = os.path.join(report_dir(data_path), f"{task['year']}.json")
+            task['fingerprint'] = fingerprint(task)
+            cached = _read_cached(task['cache_path'], task['fingerprint'])
+            if cached is not None:
+                results[task['year']] = cached
+                continue
+        pending.append(task)
+
+    archived = archive.summaries(user)
+    rows = sum(len(task['columns'][0]) + archived.get(task['year'], {}).get('count', 0) for task in pending)
+    if len(pending) > 1 and max_workers > 1 and rows >= PARALLEL_MIN_ROWS:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            computed = list(pool.map(compute_year, pending))
+    else:
+        computed = [compute_year(task) for task in pending]
+    for task, result in zip(pending, computed):
+        results[task['year']] = result
+        if task['closed']:
+            _write_cached(task['cache_path'], task['fingerprint'], result)
+
+    year_reports = [results[task['year']] for task in tasks]
+    income = sum(ledger.to_paise(year['income']) for year in year_reports)
+    expenses = sum(ledger.to_paise(year['expenses']) for year in year_reports)
+    budgeted = sum(year['budget_months'] for year in year_reports)
+    within = sum(year['months_within_budget'] for year in year_reports)
+    return {
+        'generated_at': now.isoformat(timespec='seconds'),
+        'name': user.get('name', ''),
+        'years': year_reports,
+        'total': {
+            'income': from_paise(income),
+            'expenses': from_paise(expenses),
+            'savings': from_paise(income - expenses),
+            'savings_rate': _percent(income - expenses, income),
+            'budget_adherence': _percent(within, budgeted),
+            'goal_contributions': from_paise(sum(ledger.to_paise(year['goal_contributions'])
+                                                 for year in year_reports)),
+        },
+    }
+
+
+CSV_FIELDS = ['year', 'category', 'income', 'expenses', 'savings', 'savings_rate',
+              'budget_adherence', 'goal_contributions']
+
+
+def to_csv(report):
+    """One row per year, followed by that year's categories."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for year in report['years']:
+        writer.writerow({'year': year['year'], 'category': 'All', 'income': year['income'],
+                         'expenses': year['expenses'], 'savings': year['savings'],
+                         'savings_rate': year['savings_rate'], 'budget_adherence': year['budget_adherence'],
+                         'goal_contributions': year['goal_contributions']})
+        for name, values in year['categories'].items():
+            writer.writerow({'year': year['year'], 'category': name, 'income': values['income'],
+                             'expenses': values['expense'],
+                             'savings': from_paise(ledger.to_paise(values['income']) - ledger.to_paise(values['expense']))})
+    return output.getvalue()
+
+
+def to_html(report):
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATE_DIR), autoescape=True)
+    return environment.get_template('report.html').render(report=report)
+
+
+def parse_years(start, end):
+    """The inclusive year range for optional ``start``/``end`` bounds, or None for every year."""
+    if start is None and end is None:
+        return None
+    start = int(start) if start is not None else 1970
+    end = int(end) if end is not None else datetime.date.today().year
+    return range(start, end + 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a year-end RupeeTrack report.")
+    parser.add_argument('--data', default='user_data.json', help="Path of user_data.json")
+    parser.add_argument('--from', dest='start', type=int, help="First year to include")
+    parser.add_argument('--to', dest='end', type=int, help="Last year to include")
+    parser.add_argument('--format', choices=('csv', 'html', 'json'), default='csv')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Worker processes")
+    parser.add_argument('--output', help="Write the report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    """Entry point for the report command"""
+
+    args = parse_args(argv)
+    user = ledger.load_document(args.data)
+    report = build_report(user, args.data, parse_years(args.start, args.end), max_workers=args.workers)
+    if args.format == 'csv':
+        output = to_csv(report)
+    elif args.format == 'html':
+        output = to_html(report)
+    else:
+        output = json.dumps(report, indent=4) + "\n"
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,122 @@
+"""
+Versioned schema for the RupeeTrack user document.
+
+The document records the version of its shape under ``schema_version``.
+``migrate`` brings an older document up to ``SCHEMA_VERSION`` by running
+each pending migration once, in order. ``main`` saves the result straight
+away, so later loads find a current document and do no repair work. Code
+past the load can therefore rely on the shape a current document has:
+
+* ``budget`` is a dict with ``monthly``, ``categories``, ``history``,
+  ``last_updated`` and ``change_history``;
+* ``settings`` has every key in ``DEFAULT_SETTINGS``;
+* ``name``, ``email``, ``goals``, ``goal_transactions``, ``notes`` and
+  ``recurring_transactions`` exist;
+* goal contributions live in ``goal_transactions``, ordered by date, and
+  journal entries in the journal file, not in the document.
+
+A migration may be run on a document that is already partly in its shape
+(files were repaired piecemeal before versions existed), so each one only
+fills in or moves what is missing.
+"""
+
+try:
+    from . import ledger
+except ImportError:
+    import ledger
+
+SCHEMA_VERSION = 4
+
+DEFAULT_NAME = "Guest User"
+
+DEFAULT_EMAIL = "guest@example.com"
+
+DEFAULT_SETTINGS = {
+    "show_presets": False,
+    "smart_suggestions": True,
+    "show_confirmations": True
+}
+
+
+def goal_transaction_key(entry):
+    return (entry.get('date', ''), entry.get('id', ''))
+
+
+def _normalize_budget(user, journal_store):
+    # Very old files stored the monthly budget as a bare number.
+    budget = user.get('budget')
+    if not isinstance(budget, dict):
+        budget = user['budget'] = {'monthly': budget if isinstance(budget, (int, float)) else 0}
+    budget.setdefault('monthly', 0)
+    budget.setdefault('categories', {})
+    budget.setdefault('history', [])
+    budget.setdefault('last_updated', None)
+    budget.setdefault('change_history', [])
+
+
+def _add_missing_sections(user, journal_store):
+    user.setdefault('name', DEFAULT_NAME)
+    user.setdefault('email', DEFAULT_EMAIL)
+    if not isinstance(user.get('settings'), dict):
+        user['settings'] = {}
+    for key, value in DEFAULT_SETTINGS.items():
+        user['settings'].setdefault(key, value)
+    user.setdefault('goals', [])
+    user.setdefault('notes', [])
+    user.setdefault('recurring_transactions', [])
+
+
+def _move_goal_transactions(user, journal_store):
+    # Contributions used to be embedded in each goal; move them to the
+    # per-goal history, ordered by date.
+    histories = user.setdefault('goal_transactions', {})
+    for goal in user['goals']:
+        embedded = goal.pop('transactions', None)
+        if not embedded:
+            continue
+        history = histories.setdefault(goal['id'], [])
+        history.extend(embedded)
+        history.sort(key=goal_transaction_key)
+
+
+def _move_journal_entries(user, journal_store):
+    # Journal entries (newest first) now live in their own append-only file.
+    # The file may already exist; import_legacy merges into it rather than
+    # dropping the document's entries.
+    if journal_store is None:
+        return
+    legacy_journal = user.get('journal_entries')
+    if legacy_journal:
+        journal_store.import_legacy(legacy_journal)
+    user.pop('journal_entries', None)
+
+
+# MIGRATIONS[n] takes a version-n document to version n + 1.
+MIGRATIONS = [
+    _normalize_budget,
+    _add_missing_sections,
+    _move_goal_transactions,
+    _move_journal_entries,
+]
+
+assert len(MIGRATIONS) == SCHEMA_VERSION
+
+
+def new_document():
+    """A current, empty user document."""
+    user = {'transactions': ledger.TransactionLedger()}
+    migrate(user)
+    return user
+
+
+def migrate(user, journal_store=None):
+    """Bring ``user`` up to ``SCHEMA_VERSION`` in place; returns True if anything ran."""
+    version = user.get('schema_version', 0)
+    if version >= SCHEMA_VERSION:
+        return False
+    if not isinstance(user.get('transactions'), ledger.TransactionLedger):
+        user['transactions'] = ledger.TransactionLedger(user.get('transactions') or [])
+    for migration in MIGRATIONS[version:]:
+        migration(user, journal_store)
+    user['schema_version'] = SCHEMA_VERSION
+    return True
@@ -0,0 +1,224 @@
+"""
+In-memory full-text search over transaction descriptions and journal entries.
+
+``InvertedIndex`` maps each lower-cased word to the set of document ids that
+contain it and keeps the vocabulary sorted, so a query word matches every
+indexed word it is a prefix of with two bisects. Each document also carries a
+small metadata tuple so category, type and date filters are applied without
+touching the ledger.
+
+``SearchIndex`` holds one index for transactions and one for journal entries,
+tagged with the data version they were built from. Routes apply their own
+changes to it as they save, so a search after an add, edit or delete does not
+rebuild; any change it was not told about shows up as a version mismatch and
+triggers a full rebuild on the next search.
+"""
+
+import bisect
+import datetime
+import re
+import threading
+
+try:
+    from . import ledger as ledger_module
+except ImportError:
+    import ledger as ledger_module
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Distinct lower-case words in ``text``."""
+    if not isinstance(text, str):
+        return frozenset()
+    return frozenset(WORD_PATTERN.findall(text.lower()))
+
+
+class InvertedIndex:
+    """Word -> posting set of document ids, with prefix lookup."""
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.documents = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, tokens, meta=None):
+        """Index ``doc_id`` under ``tokens``, replacing any earlier version."""
+        if doc_id in self.documents:
+            self.discard(doc_id)
+        self.documents[doc_id] = (tokens, meta)
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                bisect.insort(self.vocabulary, token)
+            posting.add(doc_id)
+
+    def discard(self, doc_id):
+        entry = self.documents.pop(doc_id, None)
+        if entry is None:
+            return
+        for token in entry[0]:
+            posting = self.postings[token]
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def meta(self, doc_id):
+        return self.documents[doc_id][1]
+
+    def prefix_matches(self, prefix):
+        """Ids of documents containing a word that starts with ``prefix``."""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        if end - start == 1:
+            return set(self.postings[self.vocabulary[start]])
+        matches = set()
+        for token in self.vocabulary[start:end]:
+            matches.update(self.postings[token])
+        return matches
+
+    def search(self, query_tokens):
+        """Ids of documents matching every query word as a prefix."""
+        result = None
+        # Narrow with the most selective (longest) words first.
+        for token in sorted(query_tokens, key=len, reverse=True):
+            matches = self.prefix_matches(token)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return set(self.documents) if result is None else result
+
+
+def _transaction_meta(transactions, pos, type_names, category_names):
+    return (type_names[transactions.types[pos]],
+            category_names[transactions.categories[pos]],
+            transactions.timestamps[pos])
+
+
+def index_ledger(transactions):
+    """Transaction index over every row of ``transactions``."""
+    type_names = transactions.type_codes.names
+    category_names = transactions.category_codes.names
+    description_names = transactions.description_codes.names
+    # Descriptions are interned, so each distinct one is tokenized once.
+    description_tokens = {}
+    index = InvertedIndex()
+    for pos, code in enumerate(transactions.descriptions):
+        tokens = description_tokens.get(code)
+        if tokens is None:
+            tokens = description_tokens[code] = tokenize(description_names[code])
+        index.add(transactions.ids[pos], tokens, _transaction_meta(transactions, pos, type_names, category_names))
+    return index
+
+
+def match_transactions(index, query, category=None, tx_type=None, start=None, end=None):
+    """Ids of transactions in ``index`` matching ``query`` and the filters, newest first."""
+    results = []
+    for doc_id in index.search(tokenize(query)):
+        doc_type, doc_category, seconds = index.meta(doc_id)
+        if category and doc_category != category:
+            continue
+        if tx_type and doc_type != tx_type:
+            continue
+        if start is not None and seconds < start:
+            continue
+        if end is not None and (seconds >= end or seconds == ledger_module.NO_TIMESTAMP):
+            continue
+        results.append((seconds, doc_id))
+    results.sort(reverse=True)
+    return [doc_id for _, doc_id in results]
+
+
+def _journal_meta(entry):
+    try:
+        seconds = ledger_module.datetime_to_epoch(datetime.datetime.fromisoformat(entry.get('date')))
+    except (TypeError, ValueError):
+        seconds = ledger_module.NO_TIMESTAMP
+    return (seconds,)
+
+
+class SearchIndex:
+    """Transaction and journal indexes for one version of the user document."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.transactions = InvertedIndex()
+        self.journal = InvertedIndex()
+
+    def _rebuild(self, user, version, journal_loader):
+        tx_index = index_ledger(user.get('transactions', ledger_module.TransactionLedger()))
+
+        journal_index = InvertedIndex()
+        for entry in journal_loader() if journal_loader else ():
+            if isinstance(entry, dict) and 'id' in entry:
+                journal_index.add(entry['id'], tokenize(entry.get('content')), _journal_meta(entry))
+
+        self.transactions = tx_index
+        self.journal = journal_index
+        self.version = version
+
+    def ensure(self, user, version, journal_loader=None):
+        """Rebuild unless the index already reflects ``version``.
+
+        ``journal_loader`` returns the journal entries and is only called
+        when a rebuild is needed.
+        """
+        with self._lock:
+            if self.version is None or self.version != version:
+                self._rebuild(user, version, journal_loader)
+
+    def index_transaction(self, base_version, tx):
+        """Add or replace one transaction (a dict or ledger row) in the index."""
+        with self._lock:
+            if self.version is None or self.version != base_version:
+                return
+            meta = (tx.get('type'), tx.get('category'), ledger_module.parse_timestamp(tx.get('timestamp')))
+            self.transactions.add(tx['id'], tokenize(tx.get('description')), meta)
+
+    def remove_transaction(self, base_version, tx_id):
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.transactions.discard(tx_id)
+
+    def index_journal_entry(self, base_version, entry):
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.journal.add(entry['id'], tokenize(entry.get('content')), _journal_meta(entry))
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+
+    def advance(self, base_version, new_version):
+        """Move to ``new_version`` after a save; invalidate if we were not at ``base_version``."""
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.version = new_version
+            else:
+                self.version = None
+
+    def search_transactions(self, query, category=None, tx_type=None, start=None, end=None):
+        """Matching transaction ids, newest first. ``start``/``end`` are epoch seconds, end exclusive."""
+        with self._lock:
+            return match_transactions(self.transactions, query, category, tx_type, start, end)
+
+    def search_journal(self, query, start=None, end=None):
+        """Matching journal entry ids, newest first."""
+        with self._lock:
+            index = self.journal
+            results = []
+            for doc_id in index.search(tokenize(query)):
+                seconds = index.meta(doc_id)[0]
+                if start is not None and seconds < start:
+                    continue
+                if end is not None and (seconds >= end or seconds == ledger_module.NO_TIMESTAMP):
+                    continue
+                results.append((seconds, doc_id))
+        results.sort(reverse=True)
+        return [doc_id for _, doc_id in results]
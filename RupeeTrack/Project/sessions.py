@@ -0,0 +1,223 @@
+"""
+Server-side sessions for RupeeTrack.
+
+Flask's default session puts the whole session in a cookie signed with
+``SECRET_KEY``. The key used to be random per process, so every worker and
+every restart rejected the cookies of all others. Here the cookie carries
+only a signed random session id and the data lives in SQLite, which all
+workers on a host share. ``load_secret_key`` gives every worker the same
+key: ``RUPEETRACK_SECRET_KEY`` if set, otherwise one generated once and kept
+in the instance folder.
+
+Lookups go through a small in-memory LRU in front of SQLite. A cached entry
+is trusted for ``CACHE_SECONDS`` before it is read again, which bounds how
+long another worker's change (a logout, say) takes to be seen here.
+"""
+
+import collections
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SecureCookieSession, SessionInterface
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+SECRET_KEY_ENV = 'RUPEETRACK_SECRET_KEY'
+
+SESSION_LIFETIME = 30 * 86400
+
+CACHE_SIZE = 1024
+
+CACHE_SECONDS = 10
+
+PURGE_INTERVAL = 3600
+
+# A stored expiry is pushed back at most this often for an unchanged
+# session, so a busy user costs one write per interval, not per request.
+TOUCH_INTERVAL = 3600
+
+
+def load_secret_key(instance_path):
+    """The configured secret key, or the one stored in ``instance_path`` (created on first use)."""
+    key = os.environ.get(SECRET_KEY_ENV)
+    if key:
+        return key
+    path = os.path.join(instance_path, 'secret_key')
+    os.makedirs(instance_path, exist_ok=True)
+    try:
+        # O_EXCL: when several workers start together exactly one writes the key.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    for _ in range(50):
+        with open(path) as f:
+            key = f.read().strip()
+        if key:
+            return key
+        # Another worker created the file but has not written it yet.
+        time.sleep(0.01)
+    raise RuntimeError(f"Secret key file {path} is empty")
+
+
+class SessionStore:
+    """Session data in SQLite behind a per-process LRU."""
+
+    def __init__(self, path, cache_size=CACHE_SIZE, cache_seconds=CACHE_SECONDS):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._last_purge = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS sessions '
+                       '(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)')
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def _cache_put(self, sid, data, expires):
+        with self._lock:
+            self._cache[sid] = (data, expires, time.monotonic() + self.cache_seconds)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, sid):
+        """The session dict for ``sid``, or None if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(sid)
+            if cached is not None and cached[2] > time.monotonic():
+                self._cache.move_to_end(sid)
+                return dict(cached[0]) if cached[1] > now else None
+        row = self._connection().execute('SELECT data, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        if row is None or row[1] <= now:
+            with self._lock:
+                self._cache.pop(sid, None)
+            return None
+        data = json.loads(row[0])
+        self._cache_put(sid, data, row[1])
+        return dict(data)
+
+    def set(self, sid, data, lifetime=SESSION_LIFETIME):
+        expires = time.time() + lifetime
+        with self._connection() as db:
+            db.execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+                       (sid, json.dumps(data), expires))
+        self._cache_put(sid, dict(data), expires)
+        self._purge_if_due()
+
+    def touch(self, sid, lifetime=SESSION_LIFETIME):
+        """Extend ``sid`` to ``lifetime`` from now, unless it was extended within ``TOUCH_INTERVAL``."""
+        expires = time.time() + lifetime
+        with self._lock:
+            cached = self._cache.get(sid)
+        if cached is not None and cached[1] > expires - TOUCH_INTERVAL:
+            return
+        with self._connection() as db:
+            db.execute('UPDATE sessions SET expires = ? WHERE sid = ? AND expires > ?', (expires, sid, time.time()))
+        if cached is not None:
+            self._cache_put(sid, cached[0], expires)
+
+    def delete(self, sid):
+        with self._connection() as db:
+            db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _purge_if_due(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        with self._connection() as db:
+            db.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        # Set by ``regenerate``; the stored row to drop when the session is saved.
+        self.previous_sid = None
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps session data in a ``SessionStore``; the cookie holds a signed session id."""
+
+    session_class = ServerSession
+
+    def __init__(self, store, lifetime=SESSION_LIFETIME):
+        self.store = store
+        self.lifetime = lifetime
+
+    def _serializer(self, app):
+        return URLSafeTimedSerializer(app.secret_key, salt='rupeetrack-session')
+
+    def regenerate(self, session):
+        """Give ``session`` a new id, keeping its data; call on login.
+
+        Otherwise an id planted in the browser before login (session
+        fixation) would become an authenticated session.
+        """
+        if not session.new:
+            session.previous_sid = session.sid
+        session.sid = secrets.token_urlsafe(32)
+        session.new = True
+        session.modified = True
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._serializer(app).loads(cookie, max_age=self.lifetime)
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    return self.session_class(data, sid=sid)
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        refresh_cookie = session.new or self.should_set_cookie(app, session)
+        if session.modified or session.new:
+            self.store.set(session.sid, dict(session), self.lifetime)
+        elif refresh_cookie:
+            # The cookie slides forward on every request; keep the row alive as long.
+            self.store.touch(session.sid, self.lifetime)
+        if not refresh_cookie:
+            return
+        response.set_cookie(name, self._serializer(app).dumps(session.sid),
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
@@ -19,6 +19,9 @@ document.addEventListener('DOMContentLoaded', function() {
     const cashFlowData = getChartData('cash-flow-data');
     const dailySummaryData = getChartData('daily-summary-data');
 
+    // Kept so live updates can patch the charts in place.
+    const charts = window.dashboardCharts = {};
+
     // Define a fixed set of colors for the pie chart
     const fixedPieColors = [
         'rgba(255, 99, 132, 0.7)',  // Red
@@ -32,6 +35,7 @@ document.addEventListener('DOMContentLoaded', function() {
         'rgba(233, 30, 99, 0.7)',   // Pink
         'rgba(0, 150, 136, 0.7)'    // Teal
     ];
+    charts.colors = fixedPieColors;
 
     // 1. Render Income vs. Expense Over Time Chart (Line Chart)
     if (monthlySummaryData) {
@@ -43,8 +47,9 @@ document.addEventListener('DOMContentLoaded', function() {
         });
         const incomes = Object.values(monthlySummaryData).map(data => data.income);
         const expenses = Object.values(monthlySummaryData).map(data => data.expense);
+        charts.monthKeys = Object.keys(monthlySummaryData);
 
-        new Chart(ctx, {
+        charts.monthly = new Chart(ctx, {
             type: 'line',
             data: {
                 labels: labels,
@@ -115,7 +120,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Use fixed colors, cycling through them if there are more categories than colors
         const backgroundColors = labels.map((_, i) => fixedPieColors[i % fixedPieColors.length]);
 
-        new Chart(ctx, {
+        charts.expenseBreakdown = new Chart(ctx, {
             type: 'bar',
             data: {
                 labels: labels,
@@ -183,7 +188,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
         const data = Object.values(cashFlowData);
 
-        new Chart(ctx, {
+        charts.cashFlow = new Chart(ctx, {
             type: 'bar',
             data: {
                 labels: labels,
@@ -250,7 +255,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const incomes = Object.values(dailySummaryData).map(data => data.income);
         const expenses = Object.values(dailySummaryData).map(data => data.expense);
 
-        new Chart(ctx, {
+        charts.daily = new Chart(ctx, {
             type: 'line',
             data: {
                 labels: labels,
@@ -320,3 +325,99 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
     }
 });
+
+// Live updates: after any write the server pushes new totals over /events,
+// and the open page patches its numbers and charts instead of reloading.
+document.addEventListener('DOMContentLoaded', function() {
+    const hasTargets = document.querySelector('[data-live], [data-live-goal]') !== null;
+    if (!window.EventSource || !hasTargets) {
+        return;
+    }
+
+    function formatAmount(value) {
+        return '₹' + value.toLocaleString('en-IN', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+    }
+
+    const source = new EventSource('/events');
+    source.addEventListener('update', function(event) {
+        const update = JSON.parse(event.data);
+
+        document.querySelectorAll('[data-live]').forEach(element => {
+            const value = update[element.dataset.live];
+            if (typeof value === 'number') {
+                element.textContent = formatAmount(value);
+            }
+        });
+
+        const charts = window.dashboardCharts || {};
+        if (charts.expenseBreakdown) {
+            const chart = charts.expenseBreakdown;
+            chart.data.labels = Object.keys(update.category_expenses);
+            chart.data.datasets[0].data = Object.values(update.category_expenses);
+            chart.data.datasets[0].backgroundColor = chart.data.labels.map((_, i) => charts.colors[i % charts.colors.length]);
+            chart.update();
+        }
+        if (charts.monthly && charts.monthKeys) {
+            const index = charts.monthKeys.indexOf(update.month);
+            if (index >= 0) {
+                charts.monthly.data.datasets[1].data[index] = update.month_expenses;
+                charts.monthly.update();
+            }
+        }
+
+        update.goals.forEach(goal => {
+            const progress = goal.target_amount > 0 ? goal.saved_amount / goal.target_amount * 100 : 0;
+            document.querySelectorAll(`[data-live-goal="${goal.id}"]`).forEach(element => {
+                const field = element.dataset.liveField;
+                if (field === 'saved') {
+                    element.textContent = '₹' + goal.saved_amount.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+                } else if (field === 'bar') {
+                    element.style.width = Math.min(progress, 100) + '%';
+                } else if (field === 'percent') {
+                    element.textContent = progress.toFixed(1) + '% complete';
+                }
+            });
+        });
+    });
+
+    function monthLabel(monthYear) {
+        const [year, month] = monthYear.split('-');
+        const date = new Date(year, month - 1);
+        return date.toLocaleString('default', { month: 'short', year: '2-digit' });
+    }
+
+    function dayLabel(dateStr) {
+        const date = new Date(dateStr);
+        return date.toLocaleString('default', { day: 'numeric', month: 'short' });
+    }
+
+    // Sent once the server has recomputed its aggregates after a write; a
+    // backdated transaction can move any month or day, so whole series are replaced.
+    source.addEventListener('charts', function(event) {
+        const update = JSON.parse(event.data);
+        const charts = window.dashboardCharts || {};
+
+        if (charts.monthly) {
+            charts.monthKeys = Object.keys(update.monthly_summary);
+            charts.monthly.data.labels = charts.monthKeys.map(monthLabel);
+            charts.monthly.data.datasets[0].data = Object.values(update.monthly_summary).map(data => data.income);
+            charts.monthly.data.datasets[1].data = Object.values(update.monthly_summary).map(data => data.expense);
+            charts.monthly.update();
+        }
+        if (charts.cashFlow) {
+            const data = Object.values(update.cash_flow);
+            const dataset = charts.cashFlow.data.datasets[0];
+            charts.cashFlow.data.labels = Object.keys(update.cash_flow).map(monthLabel);
+            dataset.data = data;
+            dataset.backgroundColor = data.map(value => value >= 0 ? 'rgba(16, 185, 129, 0.7)' : 'rgba(239, 68, 68, 0.7)');
+            dataset.borderColor = data.map(value => value >= 0 ? 'rgba(16, 185, 129, 1)' : 'rgba(239, 68, 68, 1)');
+            charts.cashFlow.update();
+        }
+        if (charts.daily) {
+            charts.daily.data.labels = Object.keys(update.daily_summary).map(dayLabel);
+            charts.daily.data.datasets[0].data = Object.values(update.daily_summary).map(data => data.income);
+            charts.daily.data.datasets[1].data = Object.values(update.daily_summary).map(data => data.expense);
+            charts.daily.update();
+        }
+    });
+});
@@ -0,0 +1,230 @@
+"""
+Description autocomplete for RupeeTrack's smart suggestions.
+
+Past transaction descriptions are kept in a character trie keyed on their
+lower-cased text. Every node lists the descriptions below it, so a partial
+description resolves to its candidates with one walk down the trie, and each
+description keeps running counts of its categories, types, amounts and
+timestamps. Candidates are ranked by frequency weighted by how recently they
+were used, and the suggestion carries the description's most common
+category and its median amount.
+
+Like the search index, the engine is tagged with the data version it was
+built from and kept current by the routes that add, edit and delete
+transactions.
+"""
+
+import bisect
+import collections
+import datetime
+import heapq
+import threading
+
+try:
+    from . import ledger as ledger_module
+except ImportError:
+    import ledger as ledger_module
+
+SECONDS_PER_DAY = 86400
+
+# A description last used this many days ago counts half as much as one used today.
+RECENCY_HALF_LIFE_DAYS = 30
+
+DEFAULT_LIMIT = 5
+
+
+def normalize(description):
+    if not isinstance(description, str):
+        return ''
+    return ' '.join(description.lower().split())
+
+
+class DescriptionStats:
+    """Running counts for every transaction sharing one normalized description."""
+
+    __slots__ = ('spellings', 'categories', 'types', 'amounts', 'timestamps')
+
+    def __init__(self):
+        self.spellings = collections.Counter()
+        self.categories = collections.Counter()
+        self.types = collections.Counter()
+        self.amounts = []
+        self.timestamps = []
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def add(self, description, category, tx_type, amount, timestamp, count=1):
+        self.spellings[description] += count
+        self.categories[category] += count
+        self.types[tx_type] += count
+        for values, value in ((self.amounts, amount), (self.timestamps, timestamp)):
+            pos = bisect.bisect_right(values, value)
+            values[pos:pos] = [value] * count
+
+    def remove(self, description, category, tx_type, amount, timestamp):
+        for counter, key in ((self.spellings, description), (self.categories, category), (self.types, tx_type)):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+        for values, value in ((self.amounts, amount), (self.timestamps, timestamp)):
+            pos = bisect.bisect_left(values, value)
+            if pos < len(values) and values[pos] == value:
+                del values[pos]
+
+    def last_used(self):
+        return self.timestamps[-1] if self.timestamps else ledger_module.NO_TIMESTAMP
+
+    def score(self, now):
+        last_used = self.last_used()
+        if last_used == ledger_module.NO_TIMESTAMP:
+            return 0.0
+        age_days = max(0, now - last_used) / SECONDS_PER_DAY
+        return len(self) * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+    def suggestion(self):
+        amount = self.amounts[len(self.amounts) // 2] if self.amounts else 0
+        last_used = self.last_used()
+        return {
+            'description': self.spellings.most_common(1)[0][0],
+            'category': self.categories.most_common(1)[0][0],
+            'type': self.types.most_common(1)[0][0],
+            'amount': ledger_module.from_paise(amount),
+            'count': len(self),
+            'last_used': None if last_used == ledger_module.NO_TIMESTAMP
+            else ledger_module.epoch_to_datetime(last_used).strftime(ledger_module.TIMESTAMP_FORMAT),
+        }
+
+
+class _Node:
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+
+
+class DescriptionTrie:
+    """Prefix trie from normalized descriptions to their ``DescriptionStats``."""
+
+    def __init__(self):
+        self.root = _Node()
+        self.stats = {}
+
+    def _insert_key(self, key):
+        node = self.root
+        node.keys.add(key)
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            child.keys.add(key)
+            node = child
+
+    def _delete_key(self, key):
+        node = self.root
+        node.keys.discard(key)
+        for char in key:
+            child = node.children[char]
+            child.keys.discard(key)
+            if not child.keys:
+                del node.children[char]
+                return
+            node = child
+
+    def add(self, description, category, tx_type, amount, timestamp, count=1):
+        key = normalize(description)
+        if not key:
+            return
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = DescriptionStats()
+            self._insert_key(key)
+        stats.add(description, category, tx_type, amount, timestamp, count)
+
+    def remove(self, description, category, tx_type, amount, timestamp):
+        key = normalize(description)
+        stats = self.stats.get(key)
+        if stats is None:
+            return
+        stats.remove(description, category, tx_type, amount, timestamp)
+        if not len(stats):
+            del self.stats[key]
+            self._delete_key(key)
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT, now=None):
+        """Best ``limit`` suggestions for descriptions starting with ``prefix``."""
+        node = self.root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if now is None:
+            now = ledger_module.datetime_to_epoch(datetime.datetime.now())
+        ranked = heapq.nlargest(limit, node.keys, key=lambda key: self.stats[key].score(now))
+        return [self.stats[key].suggestion() for key in ranked]
+
+
+def _transaction_fields(tx):
+    try:
+        amount = ledger_module.to_paise(tx.get('amount', 0))
+    except (TypeError, ValueError):
+        amount = 0
+    return (tx.get('description'), tx.get('category'), tx.get('type'), amount,
+            ledger_module.parse_timestamp(tx.get('timestamp')))
+
+
+class SuggestionEngine:
+    """Description trie for one version of the user document."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.trie = DescriptionTrie()
+
+    def _rebuild(self, user, version):
+        transactions = user.get('transactions', ledger_module.TransactionLedger())
+        description_names = transactions.description_codes.names
+        category_names = transactions.category_codes.names
+        type_names = transactions.type_codes.names
+        # Group identical rows first; descriptions repeat heavily.
+        groups = collections.Counter(zip(transactions.descriptions, transactions.categories, transactions.types,
+                                         transactions.amounts, transactions.timestamps))
+        trie = DescriptionTrie()
+        for (description, category, tx_type, amount, timestamp), count in groups.items():
+            trie.add(description_names[description], category_names[category], type_names[tx_type],
+                     amount, timestamp, count)
+        self.trie = trie
+        self.version = version
+
+    def ensure(self, user, version):
+        """Rebuild from ``user`` unless the trie already reflects ``version``."""
+        with self._lock:
+            if self.version is None or self.version != version:
+                self._rebuild(user, version)
+
+    def add_transaction(self, base_version, tx):
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.trie.add(*_transaction_fields(tx))
+
+    def remove_transaction(self, base_version, tx):
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.trie.remove(*_transaction_fields(tx))
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+
+    def advance(self, base_version, new_version):
+        """Move to ``new_version`` after a save; invalidate if we were not at ``base_version``."""
+        with self._lock:
+            if self.version is not None and self.version == base_version:
+                self.version = new_version
+            else:
+                self.version = None
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        with self._lock:
+            return self.trie.complete(prefix, limit)
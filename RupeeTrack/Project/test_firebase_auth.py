@@ -0,0 +1,248 @@
+"""
+Tests for local Firebase ID token verification against a fake issuer.
+
+The issuer signs RS256 tokens with small RSA keys generated here, so the
+tests need neither the network nor a crypto library. Run with pytest.
+"""
+
+import base64
+import hashlib
+import json
+import random
+
+import pytest
+
+import firebase_auth
+
+PROJECT_ID = 'rupeetrack-test'
+
+NOW = 1_700_000_000
+
+
+def _is_probable_prime(n, rng, rounds=32):
+    if n < 2:
+        return False
+    for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29):
+        if n % p == 0:
+            return n == p
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d, r = d // 2, r + 1
+    for _ in range(rounds):
+        x = pow(rng.randrange(2, n - 1), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _prime(bits, rng):
+    while True:
+        candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+        if _is_probable_prime(candidate, rng):
+            return candidate
+
+
+def generate_key(rng, bits=1024, e=65537):
+    """``((n, e), d)`` for a fresh RSA key."""
+    while True:
+        p, q = _prime(bits // 2, rng), _prime(bits // 2, rng)
+        phi = (p - 1) * (q - 1)
+        if p != q and phi % e:
+            return (p * q, e), pow(e, -1, phi)
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class FakeIssuer:
+    """Signs ID tokens for ``PROJECT_ID`` with keys it can rotate."""
+
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        self.private = {}
+        self.source = firebase_auth.StaticKeySource({})
+        self.rotate('key-1')
+
+    def rotate(self, kid):
+        """Publish a new key ``kid`` in place of the current ones."""
+        public, d = generate_key(self.rng)
+        self.private = {kid: (public, d)}
+        self.source.keys = {kid: public}
+        self.kid = kid
+
+    def claims(self, **overrides):
+        claims = {
+            'aud': PROJECT_ID,
+            'iss': firebase_auth.ISSUER_PREFIX + PROJECT_ID,
+            'sub': 'user-1',
+            'iat': NOW - 10,
+            'exp': NOW + 3600,
+            'auth_time': NOW - 10,
+        }
+        claims.update(overrides)
+        return claims
+
+    def token(self, kid=None, alg='RS256', **overrides):
+        kid = kid or self.kid
+        header = _b64url(json.dumps({'alg': alg, 'kid': kid, 'typ': 'JWT'}).encode('utf-8'))
+        payload = _b64url(json.dumps(self.claims(**overrides)).encode('utf-8'))
+        signed = (header + '.' + payload).encode('ascii')
+        (n, _), d = self.private[kid]
+        size = (n.bit_length() + 7) // 8
+        digest_info = firebase_auth._SHA256_DIGEST_INFO + hashlib.sha256(signed).digest()
+        encoded = b'\x00\x01' + b'\xff' * (size - len(digest_info) - 3) + b'\x00' + digest_info
+        signature = pow(int.from_bytes(encoded, 'big'), d, n).to_bytes(size, 'big')
+        return header + '.' + payload + '.' + _b64url(signature)
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingSource:
+    """Wraps a source and counts fetches; fails them while ``failing`` is set."""
+
+    def __init__(self, source, failing=False):
+        self.source = source
+        self.failing = failing
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        if self.failing:
+            raise OSError('issuer unreachable')
+        return self.source.fetch()
+
+
+@pytest.fixture
+def issuer():
+    return FakeIssuer()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_verifier(source, clock):
+    return firebase_auth.TokenVerifier(PROJECT_ID, firebase_auth.KeySet(source, clock=clock), clock=clock)
+
+
+def test_valid_token(issuer, clock):
+    claims = make_verifier(issuer.source, clock).verify(issuer.token())
+    assert claims['sub'] == 'user-1'
+
+
+def test_bad_signature(issuer, clock):
+    header, payload, signature = issuer.token().split('.')
+    tampered = _b64url(json.dumps(issuer.claims(sub='someone-else')).encode('utf-8'))
+    with pytest.raises(firebase_auth.TokenError, match='signature'):
+        make_verifier(issuer.source, clock).verify('.'.join([header, tampered, signature]))
+
+
+def test_signature_from_another_key(issuer, clock):
+    other = FakeIssuer(seed=2)
+    with pytest.raises(firebase_auth.TokenError, match='signature'):
+        make_verifier(issuer.source, clock).verify(other.token())
+
+
+@pytest.mark.parametrize('alg', ['HS256', 'none', 'RS512'])
+def test_rejects_other_algorithms(issuer, clock, alg):
+    with pytest.raises(firebase_auth.TokenError, match='RS256'):
+        make_verifier(issuer.source, clock).verify(issuer.token(alg=alg))
+
+
+def test_wrong_audience(issuer, clock):
+    with pytest.raises(firebase_auth.TokenError, match='another project'):
+        make_verifier(issuer.source, clock).verify(issuer.token(aud='other-project'))
+
+
+def test_wrong_issuer(issuer, clock):
+    with pytest.raises(firebase_auth.TokenError, match='issuer'):
+        make_verifier(issuer.source, clock).verify(
+            issuer.token(iss=firebase_auth.ISSUER_PREFIX + 'other-project'))
+
+
+def test_expired_token(issuer, clock):
+    token = issuer.token(exp=NOW - firebase_auth.CLOCK_SKEW - 1)
+    with pytest.raises(firebase_auth.TokenError, match='expired'):
+        make_verifier(issuer.source, clock).verify(token)
+
+
+def test_expiry_allows_clock_skew(issuer, clock):
+    assert make_verifier(issuer.source, clock).verify(issuer.token(exp=NOW - 1))
+
+
+def test_issued_in_the_future(issuer, clock):
+    token = issuer.token(iat=NOW + firebase_auth.CLOCK_SKEW + 1)
+    with pytest.raises(firebase_auth.TokenError, match='future'):
+        make_verifier(issuer.source, clock).verify(token)
+
+
+def test_key_rotation(issuer, clock):
+    old_token = issuer.token()
+    verifier = make_verifier(issuer.source, clock)
+    assert verifier.verify(old_token)
+
+    issuer.rotate('key-2')
+    # A token naming a new kid refetches, once the minimum interval has passed.
+    clock.now += firebase_auth.MIN_REFRESH_INTERVAL
+    assert verifier.verify(issuer.token())['sub'] == 'user-1'
+    # key-1 is no longer published.
+    with pytest.raises(firebase_auth.TokenError, match='unknown key'):
+        make_verifier(issuer.source, clock).verify(old_token)
+
+
+def test_expired_keys_are_served_while_refreshing(issuer, clock):
+    source = CountingSource(issuer.source)
+    key_set = firebase_auth.KeySet(source, default_ttl=100, clock=clock)
+    verifier = firebase_auth.TokenVerifier(PROJECT_ID, key_set, clock=clock)
+    assert verifier.verify(issuer.token(sub='a'))
+    clock.now += 1000
+    assert verifier.verify(issuer.token(sub='b', iat=clock.now, exp=clock.now + 3600))
+
+
+def test_verified_token_cache_honours_exp(issuer, clock):
+    source = CountingSource(issuer.source)
+    verifier = make_verifier(source, clock)
+    token = issuer.token(exp=NOW + 100)
+    assert verifier.verify(token)
+    # Cached: not even a key lookup after the keys stop being published.
+    issuer.source.keys = {}
+    clock.now += firebase_auth.MIN_REFRESH_INTERVAL
+    assert verifier.verify(token)
+    clock.now = NOW + 100 + firebase_auth.CLOCK_SKEW
+    with pytest.raises(firebase_auth.TokenError):
+        verifier.verify(token)
+
+
+def test_unknown_kid_is_rate_limited_after_failed_fetch(issuer, clock):
+    source = CountingSource(issuer.source, failing=True)
+    key_set = firebase_auth.KeySet(source, clock=clock)
+    for _ in range(5):
+        assert key_set.get('random-kid') is None
+        clock.now += 1
+    assert source.fetches == 1
+
+
+def test_unknown_kid_is_rate_limited_once_keys_expired(issuer, clock):
+    source = CountingSource(issuer.source)
+    # Keys that expire within the refresh interval, e.g. a short max-age.
+    key_set = firebase_auth.KeySet(source, default_ttl=1, clock=clock)
+    assert key_set.get(issuer.kid) is not None
+    clock.now += firebase_auth.MIN_REFRESH_INTERVAL
+    for _ in range(5):
+        assert key_set.get('random-kid') is None
+        clock.now += 1
+    assert source.fetches == 2